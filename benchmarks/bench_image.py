@@ -0,0 +1,18 @@
+"""What the bot does with a photo before Gemini gets it."""
+
+from google.genai._transformers import pil_to_blob
+
+from service import decode_image
+
+
+def bench_decode_image(benchmark, photo: bytes):
+    benchmark(decode_image, photo)
+
+
+def bench_upload_encode(benchmark, photo: bytes):
+    """The SDK re-encodes the decoded image to JPEG inside generate_content, on the event loop."""
+    image = decode_image(photo)
+    benchmark(pil_to_blob, image)
+
+
+__all__ = []
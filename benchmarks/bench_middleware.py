@@ -0,0 +1,68 @@
+import datetime
+import logging
+from typing import Any, Callable, Coroutine
+
+from aiogram.types import Chat, Message, Update, User
+import pytest
+
+from database import DefaultDatabase
+from middleware.logging import LoggingMiddleware
+from middleware.user import CurrentUserMiddleware
+from repository import UserRepository
+from service import UserService
+
+USER_ID = 100500
+
+
+def make_update() -> Update:
+    return Update(
+        update_id=1,
+        message=Message(
+            message_id=1,
+            date=datetime.datetime.now(),
+            chat=Chat(id=USER_ID, type="private"),
+            from_user=User(id=USER_ID, is_bot=False, first_name="Bench", username="bench"),
+            text="👤 Профиль",
+        ),
+    )
+
+
+async def handler(update: Any, data: dict) -> bool:
+    return True
+
+
+@pytest.fixture(scope="module")
+def user_service(database: DefaultDatabase, logger: logging.Logger, run: Callable[[Coroutine], Any]) -> UserService:
+    service = UserService(UserRepository(database), logger)
+    run(service.get_or_create(id=str(USER_ID), username="bench"))
+    return service
+
+
+def bench_loop_overhead(benchmark, run):
+    """Cost of running a coroutine from a benchmark, included in every async benchmark."""
+
+    async def noop() -> None:
+        pass
+
+    benchmark(lambda: run(noop()))
+
+
+def bench_current_user_middleware(benchmark, run, user_service: UserService):
+    middleware = CurrentUserMiddleware(user_service=user_service)
+    update = make_update()
+    benchmark(lambda: run(middleware(handler, update, {})))
+
+
+def bench_logging_middleware(benchmark, run, logger: logging.Logger):
+    middleware = LoggingMiddleware(logger)
+    update = make_update()
+    benchmark(lambda: run(middleware(handler, update, {})))
+
+
+def bench_logging_middleware_sampled(benchmark, run, logger: logging.Logger):
+    middleware = LoggingMiddleware(logger, sample_rate=0.1)
+    update = make_update()
+    benchmark(lambda: run(middleware(handler, update, {})))
+
+
+__all__ = []
@@ -0,0 +1,45 @@
+from itertools import count
+import logging
+from typing import Any, Callable, Coroutine
+
+import pytest
+
+from database import DefaultDatabase
+from repository import UserRepository
+from service import UserService
+
+USER_ID = "200500"
+
+
+@pytest.fixture(scope="module")
+def repository(database: DefaultDatabase, run: Callable[[Coroutine], Any]) -> UserRepository:
+    repository = UserRepository(database)
+    run(UserService(repository, logging.getLogger("benchmarks")).get_or_create(id=USER_ID, username="bench"))
+    return repository
+
+
+def bench_get_one(benchmark, run, repository: UserRepository):
+    benchmark(lambda: run(repository.get_one(USER_ID)))
+
+
+def bench_get_or_create_existing(benchmark, run, repository: UserRepository, logger: logging.Logger):
+    service = UserService(repository, logger)
+    benchmark(lambda: run(service.get_or_create(id=USER_ID, username="bench")))
+
+
+def bench_create(benchmark, run, repository: UserRepository):
+    ids = count(300000)
+    benchmark(lambda: run(repository.create(str(next(ids)), "bench")))
+
+
+def bench_update_token_count(benchmark, run, repository: UserRepository):
+    tokens = count()
+    benchmark(lambda: run(repository.update_token_count(USER_ID, next(tokens))))
+
+
+def bench_update_username(benchmark, run, repository: UserRepository):
+    names = count()
+    benchmark(lambda: run(repository.update_username(USER_ID, f"bench_{next(names)}")))
+
+
+__all__ = []
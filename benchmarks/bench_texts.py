@@ -0,0 +1,37 @@
+import logging
+
+import pytest
+
+from handlers.image_processing import generate_style_list_text
+from keyboards import StyleSelectionKeyboard, TokenPurchaseKeyboard
+from service import GeminiImageService
+
+
+@pytest.fixture(scope="module")
+def image_service(logger: logging.Logger) -> GeminiImageService:
+    # The client is only created, no requests are made
+    return GeminiImageService("benchmark-key", logger)
+
+
+@pytest.mark.parametrize("style", ["anime", "unknown_style"])
+def bench_style_prompt(benchmark, image_service: GeminiImageService, style: str):
+    benchmark(image_service._get_style_prompt, style)
+
+
+def bench_custom_prompt(benchmark, image_service: GeminiImageService):
+    benchmark(image_service._get_style_prompt, "anime", "Make it look like a Van Gogh painting")
+
+
+def bench_style_selection_keyboard(benchmark):
+    benchmark(StyleSelectionKeyboard())
+
+
+def bench_token_purchase_keyboard(benchmark):
+    benchmark(TokenPurchaseKeyboard())
+
+
+def bench_style_list_text(benchmark):
+    benchmark(generate_style_list_text)
+
+
+__all__ = []
@@ -0,0 +1,86 @@
+"""Micro-benchmarks of hot paths.
+
+Run from the repository root:
+    pytest benchmarks --benchmark-autosave           # save a run to benchmarks/results with the commit id
+    pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:10%   # fail on a regression
+
+Baselines are the runs committed under benchmarks/results/<machine id>; a comparison needs one saved on the
+same kind of machine (OS, Python version and bitness), otherwise run with --benchmark-autosave first. Runs are
+committed for Linux with CPython 3.11 and with 3.13, the interpreter of the Docker image.
+"""
+
+import asyncio
+from io import BytesIO
+import logging
+from pathlib import Path
+import sys
+from typing import Any, Callable, Coroutine, Iterator
+
+from PIL import Image
+import pytest
+from pytest_benchmark.utils import get_machine_id
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+from database import create_database, DatabaseConfig, DefaultDatabase  # noqa: E402
+from database.sqlite import SqliteConfig  # noqa: E402
+
+RESULTS = Path(__file__).resolve().parent / "results"
+
+# Telegram's largest photo size, a downscaled phone photo and a phone original sent as a file
+PHOTO_SIZES = {"1280x960": (1280, 960), "2560x1920": (2560, 1920), "4032x3024": (4032, 3024)}
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    # Without a saved run pytest-benchmark only warns and the comparison passes
+    if config.getoption("benchmark_compare") is True and not any((RESULTS / get_machine_id()).glob("*.json")):
+        raise pytest.UsageError(
+            f"No baseline for {get_machine_id()} in {RESULTS}, save one with: pytest benchmarks --benchmark-autosave",
+        )
+
+
+@pytest.fixture(scope="session")
+def loop() -> Iterator[asyncio.AbstractEventLoop]:
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def run(loop: asyncio.AbstractEventLoop) -> Callable[[Coroutine], Any]:
+    """Runs a coroutine to completion; `bench_loop_overhead` measures what this adds."""
+    return loop.run_until_complete
+
+
+@pytest.fixture(scope="session")
+def database(run: Callable[[Coroutine], Any]) -> Iterator[DefaultDatabase]:
+    db = create_database(DatabaseConfig(backend="sqlite"), None, SqliteConfig(path=":memory:"))  # type: ignore
+    run(db.init_db())
+    yield db
+    run(db.close())
+
+
+@pytest.fixture(scope="session")
+def logger() -> logging.Logger:
+    # Middleware cost only, the logging pipeline has its own benchmark in logging_pipeline.py
+    logger = logging.getLogger("benchmarks")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def make_jpeg(size: tuple) -> bytes:
+    # Noise doesn't compress, so the JPEG is about as large as a real photo of this size
+    image = Image.effect_noise(size, 48).convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="session", params=list(PHOTO_SIZES), ids=list(PHOTO_SIZES))
+def photo(request: pytest.FixtureRequest) -> bytes:
+    return make_jpeg(PHOTO_SIZES[request.param])
+
+
+__all__ = []
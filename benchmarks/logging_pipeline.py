@@ -0,0 +1,69 @@
+"""Time a `logger.info` call costs the event loop with direct handlers and with the queue pipeline.
+
+Run from the repository root: python benchmarks/logging_pipeline.py [records]
+"""
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+from logger import build_handlers, get_logger, LoggerConfig, stop_logging  # noqa: E402
+
+
+async def log_records(logger: logging.Logger, records: int) -> float:
+    """Microseconds per record spent in the logging call."""
+    started = time.perf_counter()
+    for i in range(records):
+        logger.info("Update %d from user %d handled in %.3f s", i, 123456789, 0.0123)
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    return (time.perf_counter() - started) / records * 1e6
+
+
+def main(records: int) -> None:
+    with tempfile.TemporaryDirectory() as directory, Path(os.devnull).open("w") as console:
+        cfg = LoggerConfig(debug=False, file_path=os.path.join(directory, "direct.log"))
+        direct = logging.getLogger("benchmark.direct")
+        direct.setLevel(logging.INFO)
+        direct.propagate = False
+        for handler in build_handlers(cfg):
+            if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+                handler.setStream(console)
+            direct.addHandler(handler)
+
+        stderr, sys.stderr = sys.stderr, console
+        try:
+            cfg = LoggerConfig(debug=False, file_path=os.path.join(directory, "queued.log"))
+            queued = get_logger("benchmark.queued", cfg)
+            queued.propagate = False
+
+            direct_cost = asyncio.run(log_records(direct, records))
+            queued_cost = asyncio.run(log_records(queued, records))
+            drain_started = time.perf_counter()
+            stop_logging()
+            drain = time.perf_counter() - drain_started
+        finally:
+            sys.stderr = stderr
+
+        for handler in direct.handlers:
+            handler.close()
+
+    sys.stdout.write(
+        f"records:                {records}\n"
+        f"direct handlers:        {direct_cost:8.2f} us/record on the loop\n"
+        f"queue handler:          {queued_cost:8.2f} us/record on the loop\n"
+        f"background drain after: {drain * 1000:8.1f} ms\n",
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
+
+
+__all__ = []
@@ -1,6 +1,9 @@
 import asyncio
 from contextlib import suppress
+from functools import partial
 import logging
+import signal
+from typing import Awaitable, Callable
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
@@ -9,24 +12,89 @@ from aiogram.fsm.storage.redis import RedisStorage
 from redis.asyncio.client import Redis
 
 from config import Config, load_config
-from database import DefaultDatabase, PostgresDatabase
-from handlers import cleanup_old_payments, commands_router, image_processing_router, payments_router, user_router
+from database import create_database, DefaultDatabase
+from handlers import (
+    admin_router,
+    commands_router,
+    handle_payment_status,
+    image_processing_router,
+    payments_router,
+    stats_router,
+    user_router,
+)
 from keyboards import setup_menu
 from logger import get_logger
 from middleware import setup as setup_middlewares
-from repository import UserRepository
-from service import GeminiImageService, PaymentService, UserService
+from monitoring import (
+    FileSpanExporter,
+    instrument_database,
+    metrics_handler,
+    OtlpSpanExporter,
+    Profiler,
+    setup as setup_monitoring,
+    Tracer,
+    TracingRequestMiddleware,
+)
+from repository import PaymentRepository, UserRepository
+from runtime import StreamPublisherMiddleware, StreamWorker, UpdateStream
+from service import (
+    BroadcastService,
+    GeminiImageService,
+    PaymentPoller,
+    PaymentService,
+    POLL_SCHEDULE,
+    RECONCILE_SCHEDULE,
+    UserService,
+)
+from utils import SendQueueMiddleware
+from web import TelegramWebhook, WebServer, YooKassaWebhook
 
 
-async def periodic_cleanup(logger: logging.Logger):
-    """Периодическая очистка старых платежей"""
-    while True:
-        try:
-            await cleanup_old_payments()
-            await asyncio.sleep(30 * 60)  # Очищаем каждые пол часа
-        except Exception as e:
-            logger.error(f"Error in periodic cleanup: {e}")
-            await asyncio.sleep(30 * 60)
+async def on_startup(
+    broadcast_service: BroadcastService,
+    payment_poller: PaymentPoller,
+    payment_repository: PaymentRepository,
+    web_server: WebServer,
+    runtime_role: str,
+    logger: logging.Logger,
+) -> None:
+    """Start background work and resume the one interrupted by the previous shutdown."""
+    logger.debug("Starting HTTP server...")
+    try:
+        await web_server.start()
+    except Exception as e:
+        logger.error("Failed to start HTTP server: %s", str(e))
+
+    logger.debug("Starting payment poller...")
+    # Workers only poll payments they created, jobs for the whole bot run in the receiving process
+    payment_poller.start()
+    if runtime_role == "worker":
+        return
+
+    try:
+        for payment_id, created_at in await payment_repository.get_pending():
+            payment_poller.track(payment_id, created_at=created_at)
+    except Exception as e:
+        logger.error("Failed to load pending payments: %s", str(e))
+
+    logger.debug("Resuming interrupted broadcast...")
+    try:
+        await broadcast_service.resume()
+    except Exception as e:
+        logger.error("Failed to resume broadcast: %s", str(e))
+
+
+async def on_shutdown(
+    broadcast_service: BroadcastService,
+    payment_poller: PaymentPoller,
+    payment_service: PaymentService,
+    web_server: WebServer,
+) -> None:
+    """Stop background work, broadcast progress is kept for the next start."""
+    await web_server.stop()
+    await payment_poller.stop()
+    await payment_service.close()
+    await broadcast_service.stop()
 
 
 async def shutdown(
@@ -65,6 +133,243 @@ async def shutdown(
     logger.info("Bot shut down successfully.")
 
 
+def register_services(
+    dp: Dispatcher,
+    bot: Bot,
+    config: Config,
+    logger: logging.Logger,
+    db: DefaultDatabase,
+    redis: Redis,
+) -> None:
+    """Create repositories and services and make them available to handlers."""
+    dp.workflow_data["runtime_role"] = config.runtime.role
+
+    logger.debug("Registering repositories...")
+    user_repository = UserRepository(db)
+    payment_repository = PaymentRepository(redis)
+    dp.workflow_data["payment_repository"] = payment_repository
+
+    logger.debug("Registering services...")
+    user_service = UserService(user_repository, logger)
+    dp.workflow_data["user_service"] = user_service
+    image_service = GeminiImageService(config.gemini.api_key, logger)
+    dp.workflow_data["image_service"] = image_service
+    payment_service = PaymentService(
+        config.yookassa.shop_id,
+        config.yookassa.secret_key,
+        logger,
+        api_url=config.yookassa.api_url,
+        timeout=config.yookassa.timeout,
+        max_connections=config.yookassa.max_connections,
+    )
+    dp.workflow_data["payment_service"] = payment_service
+    on_payment_status = partial(
+        handle_payment_status,
+        bot=bot,
+        logger=logger,
+        user_service=user_service,
+        payment_repository=payment_repository,
+    )
+    # With webhooks enabled polling only reconciles notifications that never arrived
+    payment_poller = PaymentPoller(
+        payment_service,
+        on_status=on_payment_status,
+        logger=logger,
+        schedule=RECONCILE_SCHEDULE if config.yookassa.webhook_enabled else POLL_SCHEDULE,
+    )
+    dp.workflow_data["payment_poller"] = payment_poller
+    broadcast_service = BroadcastService(
+        bot,
+        user_service,
+        redis,
+        logger,
+        batch_size=config.broadcast.batch_size,
+    )
+    dp.workflow_data["broadcast_service"] = broadcast_service
+
+    register_endpoints(dp, bot, config, logger, on_payment_status)
+
+
+def register_endpoints(
+    dp: Dispatcher,
+    bot: Bot,
+    config: Config,
+    logger: logging.Logger,
+    on_payment_status: Callable[[str, dict], Awaitable[None]],
+) -> None:
+    """Create the HTTP server with webhook and metrics endpoints."""
+    logger.debug("Registering HTTP endpoints...")
+    web_server = WebServer(config.web.host, config.web.port, logger)
+    dp.workflow_data["web_server"] = web_server
+    if config.metrics.enabled:
+        web_server.add_route("GET", config.metrics.path, metrics_handler)
+
+    # Workers get updates from the stream and serve only metrics
+    if config.runtime.role == "worker":
+        return
+
+    if config.yookassa.webhook_enabled:
+        yookassa_webhook = YooKassaWebhook(
+            dp.workflow_data["payment_service"],
+            dp.workflow_data["payment_poller"],
+            on_status=on_payment_status,
+            logger=logger,
+            trusted_networks=config.yookassa.webhook_trusted_ips,
+            trust_forwarded=config.yookassa.webhook_trust_forwarded,
+            trusted_proxies=config.yookassa.webhook_trusted_proxies,
+            verify_with_api=config.yookassa.webhook_verify,
+        )
+        web_server.add_route("POST", config.yookassa.webhook_path, yookassa_webhook.handle)
+    if config.bot.mode == "webhook":
+        telegram_webhook = TelegramWebhook(
+            dp,
+            bot,
+            config.bot.webhook_secret,
+            logger,
+            max_concurrent_updates=config.dispatcher.max_concurrent_updates,
+            # The receiver answers Telegram only after the update is in the stream
+            handle_in_background=config.runtime.role != "receiver",
+        )
+        dp.workflow_data["telegram_webhook"] = telegram_webhook
+        web_server.add_route("POST", config.bot.webhook_path, telegram_webhook.handle)
+
+
+async def wait_for_signal() -> None:
+    """Wait for SIGINT or SIGTERM."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, config: Config, logger: logging.Logger) -> None:
+    """Receive updates over the webhook until SIGINT or SIGTERM, then finish the ones in progress."""
+    if not (config.bot.webhook_url and config.bot.webhook_secret):
+        logger.fatal("BOT_WEBHOOK_URL and BOT_WEBHOOK_SECRET are required in webhook mode")
+        return
+
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+    await dp.emit_startup(bot=bot, **workflow_data)
+    try:
+        # Every replica sets the same webhook, the load balancer spreads the requests
+        await bot.set_webhook(
+            url=config.bot.webhook_url + config.bot.webhook_path,
+            secret_token=config.bot.webhook_secret,
+            max_connections=config.bot.webhook_max_connections,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info("Receiving updates on %s%s", config.bot.webhook_url, config.bot.webhook_path)
+        await wait_for_signal()
+    finally:
+        await dp.workflow_data["telegram_webhook"].drain()
+        await dp.emit_shutdown(bot=bot, **workflow_data)
+
+
+async def run_worker(dp: Dispatcher, bot: Bot, config: Config, logger: logging.Logger, stream: UpdateStream) -> None:
+    """Handle updates of this worker's stream partitions until SIGINT or SIGTERM."""
+    worker = StreamWorker(
+        stream,
+        dp,
+        bot,
+        logger,
+        index=config.runtime.worker_index,
+        workers=config.runtime.workers,
+        max_concurrent=config.dispatcher.max_concurrent_updates,
+        max_chat_waiting=config.dispatcher.max_chat_waiting,
+    )
+    dp["stream_worker"] = worker
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+    await dp.emit_startup(bot=bot, **workflow_data)
+    worker_task = asyncio.create_task(worker.run())
+    signal_task = asyncio.create_task(wait_for_signal())
+    try:
+        await asyncio.wait([worker_task, signal_task], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        signal_task.cancel()
+        await worker.stop()
+        await dp.emit_shutdown(bot=bot, **workflow_data)
+    if worker_task.done() and not worker_task.cancelled():
+        worker_task.result()
+
+
+async def run(dp: Dispatcher, bot: Bot, config: Config, logger: logging.Logger, stream: UpdateStream) -> None:
+    """Receive and handle updates according to the runtime role and the bot mode."""
+    if config.runtime.role == "worker":
+        await run_worker(dp, bot, config, logger, stream)
+    elif config.bot.mode == "webhook":
+        await run_webhook(dp, bot, config, logger)
+    else:
+        # Polling stops fetching updates while all slots are busy. The receiver publishes updates
+        # one by one, so an update is in the stream before the next getUpdates confirms it
+        await dp.start_polling(
+            bot,
+            handle_as_tasks=config.runtime.role != "receiver",
+            tasks_concurrency_limit=config.dispatcher.max_concurrent_updates,
+        )
+
+
+def setup_tracing(dp: Dispatcher, bot: Bot, config: Config, logger: logging.Logger) -> None:
+    if not config.tracing.enabled:
+        return
+    exporters = []
+    if config.tracing.file_path:
+        exporters.append(FileSpanExporter(config.tracing.file_path))
+    if config.tracing.otlp_endpoint:
+        exporters.append(OtlpSpanExporter(config.tracing.otlp_endpoint, service_name=config.tracing.service_name))
+    tracer = Tracer(
+        exporters,
+        logger,
+        slowest=config.tracing.slowest,
+        flush_interval=config.tracing.flush_interval,
+    )
+    dp.workflow_data["tracer"] = tracer
+    dp.startup.register(tracer.start)
+    dp.shutdown.register(tracer.stop)
+    # Registered before the send queue, so Telegram call spans include waiting in it
+    bot.session.middleware(TracingRequestMiddleware())
+
+
+def setup_dispatcher(dp: Dispatcher, config: Config, logger: logging.Logger, redis: Redis) -> UpdateStream:
+    logger.debug("Registering routers...")
+    dp.include_router(admin_router)
+    dp.include_router(stats_router)
+    dp.include_router(commands_router)
+    dp.include_router(payments_router)
+    dp.include_router(user_router)
+    dp.include_router(image_processing_router)
+
+    logger.debug("Registering middlewares...")
+    setup_middlewares(
+        dp,
+        logger,
+        user_service=dp.workflow_data["user_service"],
+        redis=redis,
+        dispatcher_config=config.dispatcher,
+        throttling_config=config.throttling,
+        logger_config=config.logger,
+        tracer=dp.workflow_data.get("tracer"),
+        query_budget=config.database.query_budget,
+    )
+    if config.metrics.enabled:
+        setup_monitoring(
+            dp,
+            redis,
+            logger,
+            loop_lag_interval=config.metrics.loop_lag_interval,
+            loop_stall_threshold=config.metrics.loop_stall_threshold,
+            fsm_sample_interval=config.metrics.fsm_sample_interval,
+            # One process samples the shared storage
+            sample_fsm=config.runtime.role != "worker",
+        )
+    dp["profiler"] = Profiler(logger)
+    stream = UpdateStream(redis, config.runtime.partitions, maxlen=config.runtime.stream_maxlen)
+    if config.runtime.role == "receiver":
+        # Updates go to the stream before any middleware or handler
+        dp.update.outer_middleware(StreamPublisherMiddleware(stream, logger, retry=config.bot.mode != "webhook"))
+    return stream
+
+
 async def main() -> None:
     # Loading the config
     config: Config = load_config()
@@ -83,7 +388,8 @@ async def main() -> None:
     storage = RedisStorage(redis=redis)
 
     logger.debug("Connecting to the database...")
-    db = PostgresDatabase(config=config.postgres)
+    instrument_database()
+    db = create_database(config.database, config.postgres, config.sqlite)
     try:
         await db.init_db()
     except Exception as e:
@@ -97,6 +403,17 @@ async def main() -> None:
     except Exception as e:
         logger.fatal("Bot initialization failed: %s", str(e))
         return
+    setup_tracing(dp, bot, config, logger)
+    # Every process has its own queue, so the receiver and the workers split the limit for the whole bot
+    senders = 1 if config.runtime.role == "single" else config.runtime.workers + 1
+    send_queue = SendQueueMiddleware(
+        rate=config.send_queue.rate / senders,
+        chat_interval=config.send_queue.chat_interval,
+        max_retries=config.send_queue.max_retries,
+    )
+    bot.session.middleware(send_queue)
+    dp.workflow_data["send_queue"] = send_queue
+    dp.shutdown.register(send_queue.close)
     dp.workflow_data["logger"] = logger
     dp.workflow_data["database"] = db
 
@@ -106,37 +423,20 @@ async def main() -> None:
     except Exception as e:
         logger.fatal("Menu loading failed: %s", str(e))
 
-    logger.debug("Registering repositories...")
-    user_repository = UserRepository(db)
+    register_services(dp, bot, config, logger, db, redis)
 
-    logger.debug("Registering services...")
-    user_service = UserService(user_repository, logger)
-    dp.workflow_data["user_service"] = user_service
-    image_service = GeminiImageService(config.gemini.api_key, logger)
-    dp.workflow_data["image_service"] = image_service
-    payment_service = PaymentService(config.yookassa.shop_id, config.yookassa.secret_key, logger)
-    dp.workflow_data["payment_service"] = payment_service
-
-    logger.debug("Registering routers...")
-    dp.include_router(commands_router)
-    dp.include_router(payments_router)
-    dp.include_router(user_router)
-    dp.include_router(image_processing_router)
-
-    logger.debug("Registering middlewares...")
-    setup_middlewares(dp, logger, user_service=user_service)
+    stream = setup_dispatcher(dp, config, logger, redis)
 
-    logger.debug("Starting periodic cleanup task...")
-    cleanup_task = asyncio.create_task(periodic_cleanup(logger))
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
 
     # Graceful shutdown handling
     try:
         logger.info("Bot was started")
-        await dp.start_polling(bot)
+        await run(dp, bot, config, logger, stream)
     except Exception as e:
         logger.fatal("An error occurred: %s", e)
     finally:
-        cleanup_task.cancel()
         await shutdown(bot, dp, logger, redis, db)
 
 
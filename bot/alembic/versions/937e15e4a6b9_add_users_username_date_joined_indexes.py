@@ -0,0 +1,43 @@
+"""add_users_username_date_joined_indexes
+
+Revision ID: 937e15e4a6b9
+Revises: b3fbb7e2a3ab
+Create Date: 2026-10-19 12:10:42.318907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '937e15e4a6b9'
+down_revision: Union[str, None] = 'b3fbb7e2a3ab'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY does not lock writes, but can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_users_username'), 'users', ['username'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            op.f('ix_users_date_joined'), 'users', ['date_joined'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f('ix_users_date_joined'), table_name='users', postgresql_concurrently=True, if_exists=True,
+        )
+        op.drop_index(
+            op.f('ix_users_username'), table_name='users', postgresql_concurrently=True, if_exists=True,
+        )
@@ -1,4 +1,4 @@
-from config.config import Config, load_config, PAYMENT
+from config.config import Config, DispatcherConfig, load_config, PAYMENT, ThrottlingConfig, YOOKASSA_NETWORKS
 
 
-__all__ = ["Config", "load_config", "PAYMENT"]
+__all__ = ["Config", "DispatcherConfig", "ThrottlingConfig", "load_config", "PAYMENT", "YOOKASSA_NETWORKS"]
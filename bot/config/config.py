@@ -1,8 +1,8 @@
 from dataclasses import dataclass
 
-from environs import Env
+from environs import Env, validate
 
-from database import PostgresConfig
+from database import DatabaseConfig, PostgresConfig, SqliteConfig
 from logger import LoggerConfig
 
 
@@ -12,6 +12,17 @@ PAYMENT = {
     "maximum": {"token_count": 500, "price": 3990},
 }
 
+# https://yookassa.ru/developers/using-api/webhooks#ip
+YOOKASSA_NETWORKS = [
+    "185.71.76.0/27",
+    "185.71.77.0/27",
+    "77.75.153.0/25",
+    "77.75.156.11",
+    "77.75.156.35",
+    "77.75.154.128/25",
+    "2a02:5180::/32",
+]
+
 
 @dataclass
 class RedisConfig:
@@ -24,6 +35,11 @@ class RedisConfig:
 class BotConfig:
     bot_token: str
     debug: bool
+    mode: str
+    webhook_url: str
+    webhook_path: str
+    webhook_secret: str
+    webhook_max_connections: int
 
 
 @dataclass
@@ -35,6 +51,81 @@ class GeminiConfig:
 class YooKassaConfig:
     shop_id: str
     secret_key: str
+    api_url: str
+    timeout: float
+    max_connections: int
+    webhook_enabled: bool
+    webhook_path: str
+    webhook_trusted_ips: list[str]
+    webhook_trust_forwarded: bool
+    webhook_trusted_proxies: int
+    webhook_verify: bool
+
+
+@dataclass
+class WebConfig:
+    host: str
+    port: int
+
+
+@dataclass
+class BroadcastConfig:
+    batch_size: int
+
+
+@dataclass
+class SendQueueConfig:
+    rate: float
+    chat_interval: float
+    max_retries: int
+
+
+@dataclass
+class DispatcherConfig:
+    max_concurrent_updates: int
+    cheap_limit: int
+    expensive_limit: int
+    expensive_queue_size: int
+    ordered: bool
+    max_chat_waiting: int
+
+
+@dataclass
+class ThrottlingConfig:
+    enabled: bool
+    cheap_rate: float
+    cheap_burst: int
+    expensive_rate: float
+    expensive_burst: int
+    max_delay: float
+
+
+@dataclass
+class MetricsConfig:
+    enabled: bool
+    path: str
+    loop_lag_interval: float
+    loop_stall_threshold: float
+    fsm_sample_interval: float
+
+
+@dataclass
+class TracingConfig:
+    enabled: bool
+    file_path: str
+    otlp_endpoint: str
+    service_name: str
+    slowest: int
+    flush_interval: float
+
+
+@dataclass
+class RuntimeConfig:
+    role: str
+    partitions: int
+    workers: int
+    worker_index: int
+    stream_maxlen: int
 
 
 @dataclass
@@ -42,9 +133,19 @@ class Config:
     bot: BotConfig
     logger: LoggerConfig
     redis: RedisConfig
+    database: DatabaseConfig
     postgres: PostgresConfig
+    sqlite: SqliteConfig
     gemini: GeminiConfig
     yookassa: YooKassaConfig
+    web: WebConfig
+    broadcast: BroadcastConfig
+    send_queue: SendQueueConfig
+    dispatcher: DispatcherConfig
+    throttling: ThrottlingConfig
+    runtime: RuntimeConfig
+    metrics: MetricsConfig
+    tracing: TracingConfig
 
 
 def load_config(path: str | None = None) -> Config:
@@ -63,22 +164,52 @@ def load_config(path: str | None = None) -> Config:
         bot=BotConfig(
             bot_token=env("BOT_TOKEN", default="").replace("\\x3a", ":"),
             debug=env.bool("DEBUG", default=True),
+            mode=env("BOT_MODE", default="polling", validate=validate.OneOf(["polling", "webhook"])),
+            webhook_url=env("BOT_WEBHOOK_URL", default="").rstrip("/"),
+            webhook_path=env("BOT_WEBHOOK_PATH", default="/telegram/webhook"),
+            webhook_secret=env("BOT_WEBHOOK_SECRET", default=""),
+            webhook_max_connections=env.int("BOT_WEBHOOK_MAX_CONNECTIONS", default=40),
         ),
         logger=LoggerConfig(
             debug=env.bool("DEBUG", default=True),
             file_path=env("LOGGER_FILE_PATH", default="app.log"),
+            rotation=env("LOGGER_ROTATION", default="size", validate=validate.OneOf(["size", "time", "none"])),
+            max_bytes=env.int("LOGGER_MAX_BYTES", default=10 * 1024 * 1024),
+            backup_count=env.int("LOGGER_BACKUP_COUNT", default=5),
+            when=env("LOGGER_ROTATION_WHEN", default="midnight"),
+            json_format=env("LOGGER_FORMAT", default="text", validate=validate.OneOf(["text", "json"])) == "json",
+            sample_rate=env.float("LOGGER_SAMPLE_RATE", default=1.0),
+            slow_threshold=env.float("LOGGER_SLOW_THRESHOLD", default=1.0),
         ),
         redis=RedisConfig(
             host=env("REDIS_HOST", default="localhost"),
             port=env.int("REDIS_PORT", default=6379),
             db=env.int("REDIS_DB", default=0),
         ),
+        database=DatabaseConfig(
+            backend=env("DATABASE_BACKEND", default="postgres"),
+            query_budget=env.int("DATABASE_QUERY_BUDGET", default=10),
+        ),
         postgres=PostgresConfig(
             user=env("POSTGRES_USER", default=""),
             password=env("POSTGRES_PASSWORD", default=""),
             db_name=env("POSTGRES_DB", default=""),
             host=env("POSTGRES_HOST", default="localhost"),
             port=env.int("POSTGRES_PORT", default=5432),
+            pool_size=env.int("POSTGRES_POOL_SIZE", default=5),
+            max_overflow=env.int("POSTGRES_MAX_OVERFLOW", default=10),
+            pool_timeout=env.float("POSTGRES_POOL_TIMEOUT", default=30.0),
+            pool_recycle=env.int("POSTGRES_POOL_RECYCLE", default=1800),
+            pool_pre_ping=env.bool("POSTGRES_POOL_PRE_PING", default=True),
+            connect_timeout=env.float("POSTGRES_CONNECT_TIMEOUT", default=10.0),
+            command_timeout=env.float("POSTGRES_COMMAND_TIMEOUT", default=30.0),
+            statement_cache_size=env.int("POSTGRES_STATEMENT_CACHE_SIZE", default=100),
+            warmup_connections=env.int("POSTGRES_WARMUP_CONNECTIONS", default=5),
+            replica_hosts=env.list("POSTGRES_REPLICA_HOSTS", default=[]),
+            read_your_writes_window=env.float("POSTGRES_READ_YOUR_WRITES_WINDOW", default=5.0),
+        ),
+        sqlite=SqliteConfig(
+            path=env("SQLITE_PATH", default=":memory:"),
         ),
         gemini=GeminiConfig(
             api_key=env("GEMINI_API_KEY", default=""),
@@ -86,8 +217,67 @@ def load_config(path: str | None = None) -> Config:
         yookassa=YooKassaConfig(
             shop_id=env("YOOKASSA_SHOP_ID", default=""),
             secret_key=env("YOOKASSA_SECRET_KEY", default=""),
+            api_url=env("YOOKASSA_API_URL", default="https://api.yookassa.ru/v3"),
+            timeout=env.float("YOOKASSA_TIMEOUT", default=10.0),
+            max_connections=env.int("YOOKASSA_MAX_CONNECTIONS", default=20),
+            webhook_enabled=env.bool("YOOKASSA_WEBHOOK_ENABLED", default=False),
+            webhook_path=env("YOOKASSA_WEBHOOK_PATH", default="/yookassa/webhook"),
+            webhook_trusted_ips=env.list("YOOKASSA_WEBHOOK_TRUSTED_IPS", default=YOOKASSA_NETWORKS),
+            webhook_trust_forwarded=env.bool("YOOKASSA_WEBHOOK_TRUST_FORWARDED", default=False),
+            webhook_trusted_proxies=env.int("YOOKASSA_WEBHOOK_TRUSTED_PROXIES", default=1),
+            webhook_verify=env.bool("YOOKASSA_WEBHOOK_VERIFY", default=True),
+        ),
+        web=WebConfig(
+            host=env("WEB_HOST", default="0.0.0.0"),
+            port=env.int("WEB_PORT", default=8080),
+        ),
+        broadcast=BroadcastConfig(
+            batch_size=env.int("BROADCAST_BATCH_SIZE", default=500),
+        ),
+        send_queue=SendQueueConfig(
+            rate=env.float("SEND_RATE", default=25.0),
+            chat_interval=env.float("SEND_CHAT_INTERVAL", default=0.25),
+            max_retries=env.int("SEND_MAX_RETRIES", default=3),
+        ),
+        dispatcher=DispatcherConfig(
+            max_concurrent_updates=env.int("DISPATCHER_MAX_CONCURRENT_UPDATES", default=100),
+            cheap_limit=env.int("DISPATCHER_CHEAP_LIMIT", default=50),
+            expensive_limit=env.int("DISPATCHER_EXPENSIVE_LIMIT", default=10),
+            expensive_queue_size=env.int("DISPATCHER_EXPENSIVE_QUEUE_SIZE", default=20),
+            ordered=env.bool("DISPATCHER_ORDERED", default=True),
+            max_chat_waiting=env.int("DISPATCHER_MAX_CHAT_WAITING", default=3),
+        ),
+        throttling=ThrottlingConfig(
+            enabled=env.bool("THROTTLING_ENABLED", default=True),
+            cheap_rate=env.float("THROTTLING_CHEAP_RATE", default=2.0),
+            cheap_burst=env.int("THROTTLING_CHEAP_BURST", default=10),
+            expensive_rate=env.float("THROTTLING_EXPENSIVE_RATE", default=0.1),
+            expensive_burst=env.int("THROTTLING_EXPENSIVE_BURST", default=3),
+            max_delay=env.float("THROTTLING_MAX_DELAY", default=2.0),
+        ),
+        runtime=RuntimeConfig(
+            role=env("RUNTIME_ROLE", default="single", validate=validate.OneOf(["single", "receiver", "worker"])),
+            partitions=env.int("RUNTIME_PARTITIONS", default=16),
+            workers=env.int("RUNTIME_WORKERS", default=1),
+            worker_index=env.int("RUNTIME_WORKER_INDEX", default=0),
+            stream_maxlen=env.int("RUNTIME_STREAM_MAXLEN", default=100_000),
+        ),
+        metrics=MetricsConfig(
+            enabled=env.bool("METRICS_ENABLED", default=True),
+            path=env("METRICS_PATH", default="/metrics"),
+            loop_lag_interval=env.float("METRICS_LOOP_LAG_INTERVAL", default=0.5),
+            loop_stall_threshold=env.float("METRICS_LOOP_STALL_THRESHOLD", default=0.5),
+            fsm_sample_interval=env.float("METRICS_FSM_SAMPLE_INTERVAL", default=60.0),
+        ),
+        tracing=TracingConfig(
+            enabled=env.bool("TRACING_ENABLED", default=False),
+            file_path=env("TRACING_FILE_PATH", default=""),
+            otlp_endpoint=env("TRACING_OTLP_ENDPOINT", default=""),
+            service_name=env("TRACING_SERVICE_NAME", default="change_my_image_bot"),
+            slowest=env.int("TRACING_SLOWEST", default=20),
+            flush_interval=env.float("TRACING_FLUSH_INTERVAL", default=5.0),
         ),
     )
 
 
-__all__ = ["Config", "load_config", "PAYMENT"]
+__all__ = ["Config", "DispatcherConfig", "ThrottlingConfig", "load_config", "PAYMENT", "YOOKASSA_NETWORKS"]
@@ -1,5 +1,18 @@
-from database.db import Base, DefaultDatabase
+from database.db import Base, DefaultDatabase, PoolStats, ReadYourWritesGuard
+from database.factory import create_database, DatabaseConfig
 from database.postgres import Database as PostgresDatabase, PostgresConfig
+from database.sqlite import Database as SqliteDatabase, SqliteConfig
 
 
-__all__ = ["Base", "DefaultDatabase", "PostgresDatabase", "PostgresConfig"]
+__all__ = [
+    "Base",
+    "DefaultDatabase",
+    "PoolStats",
+    "ReadYourWritesGuard",
+    "PostgresDatabase",
+    "PostgresConfig",
+    "SqliteDatabase",
+    "SqliteConfig",
+    "DatabaseConfig",
+    "create_database",
+]
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from contextlib import _AsyncGeneratorContextManager
-from typing import Any
+from dataclasses import dataclass
+import time
+from typing import Any, Dict, Optional
 
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -8,6 +10,45 @@ from sqlalchemy.ext.declarative import declarative_base
 Base = declarative_base()
 
 
+@dataclass
+class PoolStats:
+    """Snapshot of the connection pool state"""
+
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    acquired: int
+    wait_time_total: float
+    wait_time_max: float
+
+    @property
+    def wait_time_avg(self) -> float:
+        return self.wait_time_total / self.acquired if self.acquired else 0.0
+
+
+class ReadYourWritesGuard:
+    """Remembers recently written keys so their reads can be pinned to the primary"""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._deadlines: Dict[str, float] = {}
+        self._next_prune = 0.0
+
+    def mark(self, key: str) -> None:
+        now = time.monotonic()
+        self._deadlines[key] = now + self.window
+        if now >= self._next_prune:
+            self._next_prune = now + self.window
+            self._deadlines = {k: deadline for k, deadline in self._deadlines.items() if deadline > now}
+
+    def is_fresh(self, key: Optional[str]) -> bool:
+        if key is None:
+            return False
+        deadline = self._deadlines.get(key)
+        return deadline is not None and deadline > time.monotonic()
+
+
 class DefaultDatabase(ABC):
     """Abstract Database class"""
 
@@ -20,12 +61,28 @@ class DefaultDatabase(ABC):
         """Deleting all tables from the database."""
 
     @abstractmethod
-    def get_session(self) -> _AsyncGeneratorContextManager[Any, None]:
-        """Context manager for sessions."""
+    def get_session(
+        self,
+        read_only: bool = False,
+        key: Optional[str] = None,
+    ) -> _AsyncGeneratorContextManager[Any, None]:
+        """Context manager for sessions.
+
+        Args:
+            read_only (bool, optional): The session only reads and may be served by a replica. Defaults to False.
+            key (str | None, optional): Key of the entity being read, used for read-your-writes. Defaults to None.
+        """
+
+    def mark_written(self, key: str) -> None:  # noqa: B027
+        """Notify the database that the entity with the given key was just written."""
+
+    @abstractmethod
+    def get_pool_stats(self) -> PoolStats:
+        """Current connection pool statistics."""
 
     @abstractmethod
     async def close(self):
         """Close all database connections and cleanup."""
 
 
-__all__ = ["Base", "DefaultDatabase"]
+__all__ = ["Base", "DefaultDatabase", "PoolStats", "ReadYourWritesGuard"]
@@ -0,0 +1,24 @@
+from dataclasses import dataclass
+
+from database.db import DefaultDatabase
+from database.postgres import Database as PostgresDatabase, PostgresConfig
+from database.sqlite import Database as SqliteDatabase, SqliteConfig
+
+
+@dataclass
+class DatabaseConfig:
+    backend: str
+    # Statements per update above which a warning with the statement list is logged, 0 disables
+    query_budget: int = 0
+
+
+def create_database(config: DatabaseConfig, postgres: PostgresConfig, sqlite: SqliteConfig) -> DefaultDatabase:
+    """Create the database of the configured backend ("postgres" or "sqlite")."""
+    if config.backend == "postgres":
+        return PostgresDatabase(config=postgres)
+    if config.backend == "sqlite":
+        return SqliteDatabase(config=sqlite)
+    raise ValueError(f"Unknown database backend: {config.backend}")
+
+
+__all__ = ["DatabaseConfig", "create_database"]
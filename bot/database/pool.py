@@ -0,0 +1,42 @@
+import time
+from typing import Sequence
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from database.db import PoolStats
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that keeps track of how long callers wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquired = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait_time = time.perf_counter() - start
+            self.acquired += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+
+def pool_stats(pools: Sequence[TimedQueuePool]) -> PoolStats:
+    """Statistics summed over the given pools."""
+    return PoolStats(
+        size=sum(pool.size() for pool in pools),
+        checked_in=sum(pool.checkedin() for pool in pools),
+        checked_out=sum(pool.checkedout() for pool in pools),
+        overflow=sum(max(pool.overflow(), 0) for pool in pools),
+        acquired=sum(pool.acquired for pool in pools),
+        wait_time_total=sum(pool.wait_time_total for pool in pools),
+        wait_time_max=max(pool.wait_time_max for pool in pools),
+    )
+
+
+__all__ = ["TimedQueuePool", "pool_stats"]
@@ -1,10 +1,15 @@
+import asyncio
 from contextlib import asynccontextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from itertools import cycle
+from typing import List, Optional
 
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-from database import Base, DefaultDatabase
+from database import Base, DefaultDatabase, PoolStats, ReadYourWritesGuard
+from database.pool import pool_stats, TimedQueuePool
 
 
 @dataclass
@@ -14,9 +19,30 @@ class PostgresConfig:
     db_name: str
     host: str
     port: int
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    connect_timeout: float = 10.0
+    command_timeout: float = 30.0
+    statement_cache_size: int = 100
+    warmup_connections: int = 5
+    replica_hosts: List[str] = field(default_factory=list)
+    read_your_writes_window: float = 5.0
 
-    def get_database_url(self) -> str:
-        return f"postgresql+asyncpg://{self.user}:{self.password}@{self.host}:{self.port}/{self.db_name}"
+    def get_database_url(self, host: Optional[str] = None, port: Optional[int] = None) -> str:
+        host = host or self.host
+        port = port or self.port
+        return f"postgresql+asyncpg://{self.user}:{self.password}@{host}:{port}/{self.db_name}"
+
+    def get_replica_urls(self) -> List[str]:
+        """Replica hosts are given as "host" or "host:port"."""
+        urls = []
+        for replica in self.replica_hosts:
+            host, _, port = replica.partition(":")
+            urls.append(self.get_database_url(host, int(port) if port else None))
+        return urls
 
 
 class Database(DefaultDatabase):
@@ -24,16 +50,51 @@ class Database(DefaultDatabase):
 
     def __init__(self, config: PostgresConfig):
         self.config = config
-        self.engine = create_async_engine(
-            config.get_database_url(),
+        self.engine = self._create_engine(config.get_database_url())
+        self.async_session = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)  # type: ignore
+
+        self.replica_engines = [self._create_engine(url) for url in config.get_replica_urls()]
+        self.replica_sessions = [
+            sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)  # type: ignore
+            for engine in self.replica_engines
+        ]
+        self._replica_cycle = cycle(self.replica_sessions)
+        self.guard = ReadYourWritesGuard(config.read_your_writes_window)
+
+    def _create_engine(self, url: str):
+        return create_async_engine(
+            url,
             echo=False,
+            poolclass=TimedQueuePool,
+            pool_size=self.config.pool_size,
+            max_overflow=self.config.max_overflow,
+            pool_timeout=self.config.pool_timeout,
+            pool_recycle=self.config.pool_recycle,
+            pool_pre_ping=self.config.pool_pre_ping,
+            connect_args={
+                "timeout": self.config.connect_timeout,
+                "command_timeout": self.config.command_timeout,
+                "statement_cache_size": self.config.statement_cache_size,
+                "prepared_statement_cache_size": self.config.statement_cache_size,
+            },
         )
-        self.async_session = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)  # type: ignore
 
     async def init_db(self):
-        """Creating all tables in the database."""
+        """Creating all tables in the database and warming up the pool."""
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+        await self.warmup()
+
+    async def warmup(self):
+        """Open pool connections in advance so the first requests don't pay connect latency."""
+        count = min(self.config.warmup_connections, self.config.pool_size)
+
+        async def ping(engine):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        # Connections are held concurrently, otherwise the pool would reuse a single one
+        await asyncio.gather(*(ping(engine) for engine in self._engines() for _ in range(count)))
 
     async def drop_db(self):
         """Deleting all tables from the database."""
@@ -41,14 +102,34 @@ class Database(DefaultDatabase):
             await conn.run_sync(Base.metadata.drop_all)
 
     @asynccontextmanager
-    async def get_session(self):
-        """Context manager for sessions."""
-        async with self.async_session() as session:  # type: ignore
+    async def get_session(self, read_only: bool = False, key: Optional[str] = None):
+        """Context manager for sessions.
+
+        Read-only sessions go to a replica unless the key was written recently.
+        """
+        async_session = self.async_session
+        if read_only and self.replica_sessions and not self.guard.is_fresh(key):
+            async_session = next(self._replica_cycle)
+
+        async with async_session() as session:  # type: ignore
             yield session
 
+    def mark_written(self, key: str) -> None:
+        """Pin reads of the key to the primary for the read-your-writes window."""
+        if self.replica_sessions:
+            self.guard.mark(key)
+
+    def get_pool_stats(self) -> PoolStats:
+        """Connection pool statistics summed over the primary and the replicas."""
+        return pool_stats([engine.pool for engine in self._engines()])  # type: ignore
+
+    def _engines(self):
+        return [self.engine, *self.replica_engines]
+
     async def close(self):
         """Close all database connections and cleanup."""
-        await self.engine.dispose()
+        for engine in self._engines():
+            await engine.dispose()
 
 
 __all__ = ["Database", "PostgresConfig"]
@@ -0,0 +1,73 @@
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, DefaultDatabase, PoolStats
+from database.pool import pool_stats, TimedQueuePool
+
+
+@dataclass
+class SqliteConfig:
+    path: str = ":memory:"
+
+    def get_database_url(self) -> str:
+        if self.path == ":memory:":
+            return "sqlite+aiosqlite://"
+        return f"sqlite+aiosqlite:///{self.path}"
+
+
+class Database(DefaultDatabase):
+    """SQLite Database class for local runs, benchmarks and tests.
+
+    All sessions share a single connection, which also keeps an in-memory database alive.
+    """
+
+    def __init__(self, config: SqliteConfig):
+        self.config = config
+        self.engine = create_async_engine(
+            config.get_database_url(),
+            echo=False,
+            poolclass=TimedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+        )
+        event.listen(self.engine.sync_engine, "connect", self._on_connect)
+        self.async_session = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)  # type: ignore
+
+    @staticmethod
+    def _on_connect(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    async def init_db(self):
+        """Creating all tables in the database."""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def drop_db(self):
+        """Deleting all tables from the database."""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+
+    @asynccontextmanager
+    async def get_session(self, read_only: bool = False, key: Optional[str] = None):
+        """Context manager for sessions."""
+        async with self.async_session() as session:  # type: ignore
+            yield session
+
+    def get_pool_stats(self) -> PoolStats:
+        """Current connection pool statistics."""
+        return pool_stats([self.engine.pool])  # type: ignore
+
+    async def close(self):
+        """Close all database connections and cleanup."""
+        await self.engine.dispose()
+
+
+__all__ = ["Database", "SqliteConfig"]
@@ -1,6 +1,16 @@
+from handlers.admin import router as admin_router
 from handlers.commands import router as commands_router
 from handlers.image_processing import router as image_processing_router
-from handlers.payments import cleanup_old_payments, router as payments_router
+from handlers.payments import handle_payment_status, router as payments_router
+from handlers.stats import router as stats_router
 from handlers.user import router as user_router
 
-__all__ = ["commands_router", "payments_router", "user_router", "cleanup_old_payments", "image_processing_router"]
+__all__ = [
+    "admin_router",
+    "commands_router",
+    "payments_router",
+    "stats_router",
+    "user_router",
+    "handle_payment_status",
+    "image_processing_router",
+]
@@ -0,0 +1,188 @@
+import asyncio
+from contextvars import Context
+from logging import Logger
+from typing import Optional, Set
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile, Message
+
+from filters import IsSuperAdminFilter
+from monitoring import format_trace, Profiler, QUERY_STATS, Tracer
+from service import BroadcastService
+
+router = Router()
+router.message.filter(IsSuperAdminFilter())
+
+PROFILE_DURATION = 30
+MAX_PROFILE_DURATION = 300
+# Запущенные профили, ссылка не дает сборщику мусора удалить задачу
+_profile_tasks: Set[asyncio.Task] = set()
+
+
+def profile_duration(command: CommandObject) -> Optional[int]:
+    """Длительность профилирования в секундах из аргумента команды, None при неверном аргументе"""
+    if not command.args:
+        return PROFILE_DURATION
+    if not command.args.strip().isdigit():
+        return None
+    duration = int(command.args.strip())
+    return duration if 0 < duration <= MAX_PROFILE_DURATION else None
+
+
+@router.message(Command("broadcast"), F.reply_to_message)
+async def start_broadcast(message: Message, broadcast_service: BroadcastService):
+    """Запускает рассылку сообщения, на которое ответил администратор"""
+    if broadcast_service.is_running or await broadcast_service.is_sent_elsewhere():
+        await message.answer("⏳ Рассылка уже идет. Статус: /broadcast_status")
+        return
+
+    progress = await broadcast_service.get_progress()
+    if progress:
+        await message.answer(
+            f"⏸ Есть незавершенная рассылка, обработано получателей: {progress.processed}.\n"
+            "Продолжить ее: /broadcast_resume\nОтменить: /broadcast_cancel",
+        )
+        return
+
+    started = await broadcast_service.start(
+        admin_chat_id=message.chat.id,
+        from_chat_id=message.chat.id,
+        message_id=message.reply_to_message.message_id,  # type: ignore
+    )
+    if not started:
+        await message.answer("⚠️ Не удалось запустить рассылку: ее уже запустили. Статус: /broadcast_status")
+        return
+    await message.answer("📣 Рассылка запущена. Отчет придет по завершении.\nСтатус: /broadcast_status")
+
+
+@router.message(Command("broadcast"))
+async def broadcast_help(message: Message):
+    await message.answer("ℹ️ Ответьте командой /broadcast на сообщение, которое нужно разослать всем пользователям.")
+
+
+@router.message(Command("broadcast_resume"))
+async def resume_broadcast(message: Message, broadcast_service: BroadcastService):
+    """Продолжает прерванную рассылку"""
+    if await broadcast_service.resume():
+        await message.answer("⏯ Рассылка продолжена. Статус: /broadcast_status")
+    else:
+        await message.answer(
+            "📭 Нечего продолжать: прерванной рассылки нет или она уже идет. Статус: /broadcast_status",
+        )
+
+
+@router.message(Command("broadcast_cancel"))
+async def cancel_broadcast(message: Message, broadcast_service: BroadcastService):
+    """Отменяет незавершенную рассылку"""
+    if await broadcast_service.cancel():
+        await message.answer("🗑 Рассылка отменена.")
+    else:
+        await message.answer("⚠️ Рассылку отправляет другой процесс бота, отменить ее отсюда нельзя.")
+
+
+@router.message(Command("broadcast_status"))
+async def broadcast_status(message: Message, broadcast_service: BroadcastService):
+    """Показывает прогресс текущей рассылки"""
+    progress = await broadcast_service.get_progress()
+    if not progress:
+        await message.answer("📭 Активных рассылок нет.")
+        return
+
+    if broadcast_service.is_running or await broadcast_service.is_sent_elsewhere():
+        state = "идет"
+    else:
+        state = "прервана, /broadcast_resume продолжит ее, /broadcast_cancel отменит"
+    await message.answer(
+        f"📣 <b>Рассылка {state}</b>\n\n"
+        f"✅ Доставлено: {progress.sent}\n"
+        f"🚫 Заблокировали бота: {progress.blocked}\n"
+        f"❌ Ошибки: {progress.failed}\n"
+        f"⚡ Скорость: {progress.throughput:.1f} сообщ./с",
+    )
+
+
+@router.message(Command("traces"))
+async def slowest_traces(message: Message, tracer: Optional[Tracer] = None):
+    """Отправляет самые медленные трассировки обновлений"""
+    if tracer is None:
+        await message.answer("ℹ️ Трассировка выключена. Включите ее настройкой TRACING_ENABLED.")
+        return
+
+    traces = tracer.slowest()
+    if not traces:
+        await message.answer("📭 Трассировок пока нет.")
+        return
+
+    report = "\n\n".join(format_trace(trace) for trace in traces)
+    await message.answer_document(
+        BufferedInputFile(report.encode(), filename="slowest_traces.txt"),
+        caption=f"🐢 Самые медленные обновления: {len(traces)}",
+    )
+
+
+@router.message(Command("querystats"))
+async def query_stats(message: Message, command: CommandObject):
+    """Отправляет статистику SQL-запросов по отпечаткам, /querystats reset сбрасывает ее"""
+    if command.args and command.args.strip() == "reset":
+        QUERY_STATS.reset()
+        await message.answer("🧹 Статистика запросов сброшена.")
+        return
+
+    top = QUERY_STATS.top(limit=50)
+    if not top:
+        await message.answer("📭 Запросов пока не было.")
+        return
+
+    lines = [f"{'count':>8} {'total ms':>10} {'avg ms':>8} {'max ms':>8}  statement"]
+    for statement, stats in top:
+        timing = f"{stats.total * 1000:>10.1f} {stats.avg * 1000:>8.2f} {stats.max * 1000:>8.2f}"
+        lines.append(f"{stats.count:>8} {timing}  {statement}")
+    total = sum(stats.count for stats in QUERY_STATS.statements.values())
+    await message.answer_document(
+        BufferedInputFile("\n".join(lines).encode(), filename="query_stats.txt"),
+        caption=f"🗄 SQL-запросы: {total}, отпечатков: {len(QUERY_STATS.statements)}\nСброс: /querystats reset",
+    )
+
+
+async def send_profile(message: Message, kind: str, duration: int, profiler: Profiler, logger: Logger) -> None:
+    """Снимает профиль и отправляет его администратору файлом"""
+    try:
+        if kind == "profile_cpu":
+            report = await profiler.cpu(duration)
+            document = BufferedInputFile(report.encode(), filename="cpu_profile.collapsed")
+            caption = "🔥 Стеки в формате flamegraph.pl, откройте в speedscope.app или flamegraph.pl"
+        else:
+            report = await profiler.memory(duration)
+            document = BufferedInputFile(report.encode(), filename="memory_profile.txt")
+            caption = f"🧠 Рост выделенной памяти за {duration} с"
+        await message.answer_document(document, caption=caption)
+    except Exception as e:
+        logger.exception(f"Profiling failed: {e}")
+        await message.answer("❌ Профилирование не удалось, подробности в логах.")
+
+
+@router.message(Command("profile_cpu", "profile_mem"))
+async def profile(message: Message, command: CommandObject, profiler: Profiler, logger: Logger):
+    """Запускает профилирование процесса бота в фоне, /profile_cpu 60 задает длительность в секундах"""
+    duration = profile_duration(command)
+    if duration is None:
+        await message.answer(
+            f"ℹ️ Укажите длительность в секундах от 1 до {MAX_PROFILE_DURATION}, например /{command.command} 60",
+        )
+        return
+    if profiler.is_running or _profile_tasks:
+        await message.answer("⏳ Профилирование уже идет, дождитесь результата.")
+        return
+
+    # Профиль снимается в отдельной задаче вне контекста обновления, чтобы не держать очередь чата и слоты
+    task = asyncio.create_task(
+        send_profile(message, command.command, duration, profiler, logger),
+        context=Context(),
+    )
+    _profile_tasks.add(task)
+    task.add_done_callback(_profile_tasks.discard)
+    await message.answer(f"🔬 Профилирование запущено на {duration} с, результат придет файлом.")
+
+
+__all__ = ["router"]
@@ -14,6 +14,7 @@ from aiogram.types import (
 
 from keyboards import STYLE_NAMES, StyleSelectionKeyboard, TokenPurchaseKeyboard
 from models import User
+from monitoring import span
 from service import GeminiImageService, UserService
 from states import ImageProcessing
 
@@ -137,11 +138,11 @@ async def process_style_selection(
         await callback.answer()
         return
 
-    # Списываем токен
-    updated_user = await user_service.repo.update_token_count(current_user.id, current_user.token_count - 1)
+    # Списываем токен одним UPDATE: баланс из middleware мог устареть, а параллельное списание не уведет его в минус
+    updated_user = await user_service.add_tokens(current_user.id, -1)
 
     if not updated_user:
-        error_text = "❌ Ошибка при списании токена. Попробуйте позже."
+        error_text = "❌ Не удалось списать токен: недостаточно токенов или ошибка. Попробуйте позже."
         await callback.message.edit_text(error_text)  # type: ignore
         await callback.answer()
         return
@@ -163,7 +164,8 @@ async def process_style_selection(
 
     try:
         file = await bot.get_file(photo_file_id)
-        file_data = await bot.download_file(str(file.file_path))
+        with span("telegram.download_file"):
+            file_data = await bot.download_file(str(file.file_path))
         if not file_data:
             raise ValueError("Ошибка: не удалось получить данные изображения (пустой файл).")
 
@@ -194,7 +196,7 @@ async def process_style_selection(
             await callback.message.delete()  # type: ignore
         else:
             # Возвращаем токен при ошибке
-            await user_service.repo.update_token_count(current_user.id, updated_user.token_count + 1)
+            await user_service.add_tokens(current_user.id, 1)
 
             error_text = (
                 "❌ <b>Ошибка преобразования</b>\n\n"
@@ -212,7 +214,7 @@ async def process_style_selection(
             await callback.answer()
     except Exception as e:
         # Возвращаем токен при ошибке
-        await user_service.repo.update_token_count(current_user.id, updated_user.token_count + 1)
+        await user_service.add_tokens(current_user.id, 1)
         logger.error(f"Ошибка при обработке изображения: {e}")
 
         error_text = (
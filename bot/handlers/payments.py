@@ -1,6 +1,6 @@
-import asyncio
-from datetime import datetime, timedelta
 from logging import Logger
+import time
+from typing import Optional
 
 from aiogram import Bot, F, Router
 from aiogram.fsm.context import FSMContext
@@ -8,13 +8,15 @@ from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMar
 
 from keyboards import ProfileKeyboard, RequestPhoneNumberKeyboard, TokenPurchaseKeyboard
 from models import User
-from service import PaymentService, UserService
+from repository import PaymentRepository
+from service import PaymentPoller, PaymentService, UserService
 from states import ImageProcessing
+from utils import PRIORITY_HIGH, send_priority
 
 router = Router()
 
-# Словарь для отслеживания активных платежей
-active_payments = {}
+# Платеж старше получаса мог истечь в ЮKassa, к тому же планировщик проверяет его все реже
+PAYMENT_REUSE_WINDOW = 30 * 60
 
 
 async def phone_required(event, current_user: User) -> bool:
@@ -60,14 +62,27 @@ async def process_contact(message: Message, current_user: User, user_service: Us
         )
 
 
+async def find_pending_payment(
+    payment_repository: PaymentRepository,
+    user_id: str,
+    tokens: int,
+    amount: int,
+) -> Optional[dict]:
+    """Неоплаченный платеж пользователя за тот же пакет, пока его еще проверяет планировщик"""
+    for payment in await payment_repository.get_user_pending(user_id):
+        is_fresh = time.time() - payment["created_at"] < PAYMENT_REUSE_WINDOW
+        if is_fresh and payment["confirmation_url"] and (payment["tokens"], payment["amount"]) == (tokens, amount):
+            return payment
+    return None
+
+
 @router.callback_query(F.data.startswith("buy_tokens_"))
 async def process_token_purchase(
     callback: CallbackQuery,
     current_user: User,
     payment_service: PaymentService,
-    logger: Logger,
-    user_service: UserService,
-    bot: Bot,
+    payment_poller: PaymentPoller,
+    payment_repository: PaymentRepository,
     state: FSMContext,
 ):
     if await phone_required(callback.message, current_user):
@@ -78,30 +93,35 @@ async def process_token_purchase(
     tokens = int(data_parts[2])
     amount = int(data_parts[3])
 
-    # Создаем платеж через ЮKassa
-    payment_data = await payment_service.create_payment(
-        amount=amount,
-        description=f"Покупка {tokens} токенов",
-        user_id=current_user.id,
-        phone_number=current_user.phone_number,
-    )
+    # Повторный выбор того же пакета возвращает неоплаченный платеж, а не создает второй
+    payment_data = await find_pending_payment(payment_repository, current_user.id, tokens, amount)
+    if payment_data:
+        payment_poller.track(payment_data["payment_id"], created_at=payment_data["created_at"])
+    else:
+        # Создаем платеж через ЮKassa
+        payment_data = await payment_service.create_payment(
+            amount=amount,
+            description=f"Покупка {tokens} токенов",
+            user_id=current_user.id,
+            phone_number=current_user.phone_number,
+        )
+        if payment_data:
+            # Сохраняем информацию о платеже для отслеживания
+            await payment_repository.create(
+                payment_data["payment_id"],
+                user_id=current_user.id,
+                tokens=tokens,
+                amount=amount,
+                confirmation_url=payment_data["confirmation_url"],
+            )
+
+            # Передаем платеж общему планировщику проверок
+            payment_poller.track(payment_data["payment_id"])
 
     if payment_data:
         await state.update_data(active_payment_url=payment_data["confirmation_url"])
         payment_id = payment_data["payment_id"]
 
-        # Сохраняем информацию о платеже для отслеживания
-        active_payments[payment_id] = {
-            "user_id": current_user.id,
-            "tokens": tokens,
-            "amount": amount,
-            "created_at": datetime.now(),
-            "status": "pending",
-        }
-
-        # Запускаем фоновую задачу для отслеживания платежа
-        asyncio.create_task(track_payment_background(logger, payment_id, payment_service, bot, user_service))
-
         payment_text = (
             f"💳 <b>Оплата токенов</b>\n\n"
             f"Пакет: {tokens} токенов\n"
@@ -133,92 +153,85 @@ async def process_token_purchase(
     await callback.answer()
 
 
-async def track_payment_background(
-    logger: Logger,
+async def handle_payment_status(
     payment_id: str,
-    payment_service: PaymentService,
+    payment_status: dict,
     bot: Bot,
+    logger: Logger,
     user_service: UserService,
+    payment_repository: PaymentRepository,
 ):
-    """Фоновая задача для отслеживания платежа"""
-    sleep_time = 5
-    max_attempts = 60 * 60 / sleep_time + 60  # Проверяем в течение 60 минут + минута
-    attempt = 0
-
-    while attempt < max_attempts:
-        try:
-            payment_status = await payment_service.check_payment(payment_id)
-
-            if payment_status and payment_status.get("paid"):
-                await process_successful_payment(payment_id, bot, logger, user_service)
-                break
-            if payment_status and payment_status.get("status") == "cancelled":
-                await process_cancelled_payment(logger, payment_id, bot)
-                break
-
-            await asyncio.sleep(sleep_time)
-            attempt += 1
-
-        except Exception as e:
-            logger.error(f"Error tracking payment {payment_id}: {e}")
-            await asyncio.sleep(sleep_time)
-            attempt += 1
+    """Обрабатывает окончательный статус платежа"""
+    if payment_status.get("paid"):
+        await process_successful_payment(payment_id, bot, logger, user_service, payment_repository)
+    elif payment_status.get("status") in ("canceled", "cancelled"):
+        await process_cancelled_payment(logger, payment_id, bot, payment_repository)
 
-    if attempt >= max_attempts and payment_id in active_payments:
-        active_payments[payment_id]["status"] = "cancelled"
 
-
-async def process_successful_payment(payment_id: str, bot: Bot, logger: Logger, user_service: UserService):
-    """Обрабатывает успешный платеж"""
-    if payment_id not in active_payments:
+async def process_successful_payment(
+    payment_id: str,
+    bot: Bot,
+    logger: Logger,
+    user_service: UserService,
+    payment_repository: PaymentRepository,
+):
+    """Обрабатывает успешный платеж, если токены не зачислены, выбрасывает RuntimeError"""
+    payment_info = await payment_repository.get(payment_id)
+    if not payment_info:
         return
 
-    payment_info = active_payments[payment_id]
-    if payment_info["status"] != "pending":
+    # Токены зачисляет только тот, кто первым сменил статус, в том числе на другой реплике
+    if not await payment_repository.transition(payment_id, "pending", "completed"):
         return
 
+    completed = False
     try:
         # Добавляем токены пользователю
         user_id = payment_info["user_id"]
         tokens = payment_info["tokens"]
 
-        current_user = await user_service.get_one(user_id)
-        if current_user:
-            updated_user = await user_service.update_token_count(user_id, current_user.token_count + tokens)
-
-            if updated_user:
-                # Отправляем уведомление пользователю
-                success_text = (
-                    f"✅ <b>Платеж успешно обработан!</b>\n\n"
-                    f"💰 Зачислено токенов: {tokens}\n"
-                    f"💳 Ваш баланс: {updated_user.token_count} токенов\n\n"
-                    f"🎉 Спасибо за покупку!\n"
-                    f"Теперь вы можете генерировать изображения."
-                )
-
-                try:
+        # Начисление одним UPDATE на основной базе, без чтения баланса с реплики
+        updated_user = await user_service.add_tokens(user_id, tokens)
+        if updated_user:
+            completed = True
+
+            # Отправляем уведомление пользователю
+            success_text = (
+                f"✅ <b>Платеж успешно обработан!</b>\n\n"
+                f"💰 Зачислено токенов: {tokens}\n"
+                f"💳 Ваш баланс: {updated_user.token_count} токенов\n\n"
+                f"🎉 Спасибо за покупку!\n"
+                f"Теперь вы можете генерировать изображения."
+            )
+
+            try:
+                # Payment confirmations go ahead of menus and broadcasts in the send queue
+                with send_priority(PRIORITY_HIGH):
                     await bot.send_message(chat_id=user_id, text=success_text)
-                except Exception as e:
-                    logger.error(f"Failed to send success notification to user {user_id}: {e}")
-
-                # Помечаем платеж как обработанный
-                active_payments[payment_id]["status"] = "completed"
-                logger.info(f"Payment {payment_id} processed successfully for user {user_id}")
-            else:
-                logger.error(f"Failed to add tokens for payment {payment_id}")
+            except Exception as e:
+                logger.error(f"Failed to send success notification to user {user_id}: {e}")
+
+            logger.info(f"Payment {payment_id} processed successfully for user {user_id}")
         else:
-            logger.error(f"User {user_id} not found for payment {payment_id}")
+            logger.error(f"Failed to add tokens for payment {payment_id} to user {user_id}")
 
     except Exception as e:
         logger.error(f"Error processing successful payment {payment_id}: {e}")
 
+    if not completed:
+        # Токены не зачислены, возвращаем платеж в ожидание, его обработает следующая проверка или уведомление
+        await payment_repository.transition(payment_id, "completed", "pending")
+        raise RuntimeError(f"Tokens for payment {payment_id} were not credited")
 
-async def process_cancelled_payment(logger: Logger, payment_id: str, bot: Bot):
+
+async def process_cancelled_payment(logger: Logger, payment_id: str, bot: Bot, payment_repository: PaymentRepository):
     """Обрабатывает отмененный платеж"""
-    if payment_id not in active_payments:
+    payment_info = await payment_repository.get(payment_id)
+    if not payment_info:
         return
 
-    payment_info = active_payments[payment_id]
+    if not await payment_repository.transition(payment_id, "pending", "cancelled"):
+        return
 
     try:
         user_id = payment_info["user_id"]
@@ -230,13 +243,11 @@ async def process_cancelled_payment(logger: Logger, payment_id: str, bot: Bot):
         )
 
         try:
-            await bot.send_message(chat_id=user_id, text=cancel_text)
+            with send_priority(PRIORITY_HIGH):
+                await bot.send_message(chat_id=user_id, text=cancel_text)
         except Exception as e:
             logger.error(f"Failed to send cancel notification to user {user_id}: {e}")
 
-        # Помечаем платеж как отмененный
-        active_payments[payment_id]["status"] = "cancelled"
-
     except Exception as e:
         logger.error(f"Error processing cancelled payment {payment_id}: {e}")
 
@@ -246,9 +257,8 @@ async def check_payment_status(
     callback: CallbackQuery,
     current_user: User,
     user_service: UserService,
-    payment_service: PaymentService,
-    bot: Bot,
-    logger: Logger,
+    payment_poller: PaymentPoller,
+    payment_repository: PaymentRepository,
     state: FSMContext,
 ):
     """Проверяет статус платежа вручную"""
@@ -257,8 +267,8 @@ async def check_payment_status(
     tokens = int(data_parts[3])
 
     # Проверяем, не был ли платеж уже обработан в фоне
-    if payment_id in active_payments:
-        payment_info = active_payments[payment_id]
+    payment_info = await payment_repository.get(payment_id)
+    if payment_info:
         if payment_info["status"] == "completed":
             success_text = (
                 "✅ <b>Платеж уже обработан!</b>\n\n"
@@ -277,12 +287,10 @@ async def check_payment_status(
             await callback.answer("Платеж отменен")
             return
 
-    # Проверяем статус платежа в реальном времени
-    payment_status = await payment_service.check_payment(payment_id)
+    # Проверяем статус платежа в реальном времени, окончательный статус обработает планировщик
+    payment_status = await payment_poller.check_now(payment_id)
 
     if payment_status and payment_status["paid"]:
-        await process_successful_payment(payment_id, bot, logger, user_service)
-
         updated_user = await user_service.get_one(current_user.id)
 
         success_text = (
@@ -345,19 +353,4 @@ async def process_image_payment(callback: CallbackQuery, state: FSMContext, curr
     await callback.answer("Генерация началась!")
 
 
-# Функция для очистки старых платежей (вызывать периодически)
-async def cleanup_old_payments():
-    """Очищает информацию о старых платежах"""
-    current_time = datetime.now()
-    expired_payments = []
-
-    for payment_id, payment_info in active_payments.items():
-        # Удаляем платежи старше полутора часов
-        if current_time - payment_info["created_at"] > timedelta(minutes=90):
-            expired_payments.append(payment_id)
-
-    for payment_id in expired_payments:
-        del active_payments[payment_id]
-
-
-__all__ = ["router", "cleanup_old_payments"]
+__all__ = ["router", "handle_payment_status"]
@@ -0,0 +1,64 @@
+from typing import Optional
+
+from aiogram import F, Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from database import DefaultDatabase
+from filters import IsAdminFilter
+from keyboards import STYLE_NAMES
+from middleware import ConcurrencyMiddleware
+from monitoring import UpdateRateMiddleware
+from repository import PaymentRepository
+from service import GeminiImageService
+
+router = Router()
+router.message.filter(IsAdminFilter())
+
+
+def generation_times_text(image_service: GeminiImageService) -> str:
+    """Время генерации по стилям за окно статистики"""
+    lines = []
+    for style, sample in image_service.stats.durations.items():
+        percentiles = sample.percentiles(50, 95)
+        if percentiles:
+            p50, p95 = percentiles
+            name = STYLE_NAMES.get(style, "✍️ Другое")
+            lines.append(f"{name}: p50 {p50:.1f} с, p95 {p95:.1f} с ({len(sample.values())})")
+    return "\n".join(lines) or "нет генераций"
+
+
+@router.message(Command("stats"))
+@router.message(F.text == "📊 Статистика")
+async def show_stats(
+    message: Message,
+    image_service: GeminiImageService,
+    payment_repository: PaymentRepository,
+    database: DefaultDatabase,
+    concurrency: Optional[ConcurrencyMiddleware] = None,
+    update_rate: Optional[UpdateRateMiddleware] = None,
+):
+    """Показывает состояние этого процесса бота: генерации, платежи, базу данных и поток обновлений"""
+    generations = image_service.stats
+    window_minutes = generations.window // 60
+    queued = concurrency.stats().expensive.waiting if concurrency else 0
+    pool = database.get_pool_stats()
+    pending_payments = await payment_repository.count_pending()
+    updates_per_second = update_rate.updates.rate() if update_rate else 0.0
+
+    stats_text = (
+        f"📊 <b>Статистика</b>\n\n"
+        f"🎨 Генерации: {generations.active} идут, {queued} в очереди\n"
+        f"🤖 Gemini за {window_minutes} мин: {generations.requests.total()} запросов, "
+        f"{generations.requests.rate() * 60:.1f}/мин, ошибок {generations.error_rate:.0%}\n\n"
+        f"⏱ <b>Время генерации за {window_minutes} мин</b>\n"
+        f"{generation_times_text(image_service)}\n\n"
+        f"💳 Ожидают оплаты: {pending_payments}\n"
+        f"🗄 Соединения БД: {pool.checked_out} занято, {pool.checked_in} свободно, "
+        f"ожидание в среднем {pool.wait_time_avg * 1000:.1f} мс\n"
+        f"📨 Обновления: {updates_per_second:.2f}/с за минуту"
+    )
+    await message.answer(stats_text)
+
+
+__all__ = ["router"]
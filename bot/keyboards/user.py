@@ -25,6 +25,8 @@ class MainUserKeyboard:
             [KeyboardButton(text="🎨 Изменить изображение")],
             [KeyboardButton(text="👤 Профиль"), KeyboardButton(text="💰 Баланс токенов")],
         ]
+        if is_admin:
+            buttons.append([KeyboardButton(text="📊 Статистика")])
         return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
 
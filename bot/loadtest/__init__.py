@@ -0,0 +1,19 @@
+from loadtest.backends import CountingRedis, Latency, make_photo, StubImageService
+from loadtest.runner import format_report, LevelReport, LoadTest
+from loadtest.scenarios import run_user, session_steps, UpdateFactory
+from loadtest.telegram import FakeTelegramSession
+
+
+__all__ = [
+    "LoadTest",
+    "LevelReport",
+    "format_report",
+    "FakeTelegramSession",
+    "StubImageService",
+    "CountingRedis",
+    "Latency",
+    "make_photo",
+    "UpdateFactory",
+    "session_steps",
+    "run_user",
+]
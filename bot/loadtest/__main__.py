@@ -0,0 +1,82 @@
+"""Capacity test of the bot with fake Telegram, Gemini and YooKassa.
+
+Usage (from the bot directory, with Redis running):
+    python -m loadtest --users 10,50,100 --sessions 2 --image-latency 8:0.4 --json loadtest.json
+
+Each level runs the given number of concurrent users through the scripted visits and prints updates per second,
+p50/p95/p99 per handler and per step, and database, Redis and Telegram operation counts. Use a Redis database
+the bot doesn't use: user ids of the test start at 9000000000.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from pathlib import Path
+import sys
+
+from config import load_config
+from loadtest.backends import Latency
+from loadtest.runner import format_report, LoadTest
+from logger import get_logger, stop_logging
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the bot with fake external services")
+    parser.add_argument("--users", default="10,50,100", help="comma separated numbers of concurrent users")
+    parser.add_argument("--sessions", type=int, default=1, help="visits per user")
+    parser.add_argument("--think-time", type=float, default=1.0, help="maximum pause between taps, seconds")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--telegram-latency", type=Latency.parse, default=Latency(0.05, 0.3), help="median[:sigma]")
+    parser.add_argument("--image-latency", type=Latency.parse, default=Latency(8.0, 0.4), help="median[:sigma]")
+    parser.add_argument("--image-error-rate", type=float, default=0.02)
+    parser.add_argument(
+        "--image-blocking",
+        action="store_true",
+        help="hold the event loop during image generation like the synchronous Gemini client",
+    )
+    parser.add_argument("--yookassa-latency", type=float, default=0.1)
+    parser.add_argument("--use-config-database", action="store_true", help="use the database from .env")
+    parser.add_argument("--json", help="write the reports to this file")
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+    config = load_config()
+    logger = get_logger("loadtest", config.logger)
+    # Request lines of every update would drown the report
+    logger.setLevel(logging.WARNING)
+
+    load_test = LoadTest(
+        config,
+        redis_url=args.redis_url,
+        logger=logger,
+        telegram_latency=args.telegram_latency,
+        image_latency=args.image_latency,
+        image_error_rate=args.image_error_rate,
+        image_blocking=args.image_blocking,
+        yookassa_latency=args.yookassa_latency,
+        use_config_database=args.use_config_database,
+    )
+    reports = []
+    await load_test.setup()
+    try:
+        for users in (int(value) for value in args.users.split(",")):
+            report = await load_test.run_level(users, sessions=args.sessions, think_time=args.think_time)
+            reports.append(report.as_dict())
+            sys.stdout.write(format_report(report) + "\n\n")
+            sys.stdout.flush()
+    finally:
+        await load_test.teardown()
+        stop_logging()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
+
+__all__ = []
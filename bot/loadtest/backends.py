@@ -0,0 +1,90 @@
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from io import BytesIO
+import math
+import random
+import time
+from typing import Any, Optional
+
+from PIL import Image
+from redis.asyncio.client import Pipeline, Redis
+
+
+@dataclass
+class Latency:
+    """Log-normal latency given by its median in seconds and the sigma of the underlying normal."""
+
+    median: float
+    sigma: float = 0.0
+
+    def sample(self) -> float:
+        if not self.median:
+            return 0.0
+        return self.median * math.exp(random.gauss(0.0, self.sigma)) if self.sigma else self.median
+
+    @classmethod
+    def parse(cls, value: str) -> "Latency":
+        """`8` is a constant 8 s, `8:0.5` a log-normal latency with a median of 8 s."""
+        median, _, sigma = value.partition(":")
+        return cls(float(median), float(sigma or 0.0))
+
+
+def make_photo(width: int = 1280, height: int = 960) -> bytes:
+    """A JPEG of the size Telegram sends for a typical phone photo."""
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class StubImageService:
+    """Stands in for GeminiImageService: waits a sampled latency and returns the input image.
+
+    With `blocking` the wait holds the event loop, as the synchronous Gemini client does.
+    """
+
+    def __init__(self, latency: Latency, error_rate: float = 0.0, blocking: bool = False):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.blocking = blocking
+        self.calls = 0
+        self.failures = 0
+
+    async def transform_image(
+        self,
+        image_bytes: bytes,
+        style: str,
+        custom_prompt: Optional[str] = None,
+    ) -> Optional[bytes]:
+        self.calls += 1
+        delay = self.latency.sample()
+        if self.blocking:
+            time.sleep(delay)
+        else:
+            await asyncio.sleep(delay)
+        if random.random() < self.error_rate:
+            self.failures += 1
+            return None
+        return image_bytes
+
+
+class CountingRedis(Redis):
+    """Redis client counting commands by name; a pipeline counts as one PIPELINE round trip."""
+
+    commands: Counter
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.commands = Counter()
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        self.commands[str(args[0]).upper()] += 1
+        return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Any = None) -> Pipeline:
+        self.commands["PIPELINE"] += 1
+        return super().pipeline(transaction=transaction, shard_hint=shard_hint)
+
+
+__all__ = ["Latency", "StubImageService", "CountingRedis", "make_photo"]
@@ -0,0 +1,307 @@
+import asyncio
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from functools import partial
+import logging
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.types import TelegramObject, Update
+from aiohttp import web
+
+from config import Config
+from database import create_database, DatabaseConfig, DefaultDatabase
+from database.sqlite import SqliteConfig
+from handlers import (
+    admin_router,
+    commands_router,
+    handle_payment_status,
+    image_processing_router,
+    payments_router,
+    stats_router,
+    user_router,
+)
+from loadtest.backends import CountingRedis, Latency, make_photo, StubImageService
+from loadtest.scenarios import run_user, UpdateFactory
+from loadtest.telegram import FakeTelegramSession
+from middleware import setup as setup_middlewares
+from monitoring import instrument_database, QUERY_STATS
+from repository import PaymentRepository, UserRepository
+from service import PaymentPoller, PaymentService, UserService
+from utils import SendQueueMiddleware
+from web.fake_yookassa import FakeYooKassa
+
+
+def percentile(values: List[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+@dataclass
+class LevelReport:
+    users: int
+    elapsed: float
+    updates: int = 0
+    errors: int = 0
+    handlers: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    steps: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    db_statements: int = 0
+    redis_commands: Counter = field(default_factory=Counter)
+    telegram_calls: Counter = field(default_factory=Counter)
+    image_calls: int = 0
+    image_failures: int = 0
+
+    @property
+    def throughput(self) -> float:
+        return self.updates / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        def summary(durations: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+            return {
+                name: {
+                    "count": len(values),
+                    "p50_ms": percentile(values, 50) * 1000,
+                    "p95_ms": percentile(values, 95) * 1000,
+                    "p99_ms": percentile(values, 99) * 1000,
+                }
+                for name, values in sorted(durations.items())
+            }
+
+        return {
+            "users": self.users,
+            "elapsed_s": self.elapsed,
+            "updates": self.updates,
+            "updates_per_s": self.throughput,
+            "errors": self.errors,
+            "handlers": summary(self.handlers),
+            "steps": summary(self.steps),
+            "db_statements": self.db_statements,
+            "redis_commands": dict(self.redis_commands),
+            "telegram_calls": dict(self.telegram_calls),
+            "image_calls": self.image_calls,
+            "image_failures": self.image_failures,
+        }
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """Records handler run times and failures of the current level by handler name.
+
+    Failures are counted here: LoggingMiddleware logs handler exceptions and doesn't pass them on.
+    """
+
+    def __init__(self):
+        self.report: Optional[LevelReport] = None
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            if self.report is not None:
+                self.report.errors += 1
+            raise
+        finally:
+            handler_object = data.get("handler")
+            if self.report is not None and handler_object is not None:
+                name = getattr(handler_object.callback, "__name__", "unknown")
+                self.report.handlers[name].append(time.perf_counter() - started)
+
+
+class LoadTest:
+    """Feeds scripted users through the real dispatcher with routers and middlewares.
+
+    Telegram, Gemini and YooKassa are replaced by local fakes, Redis and the database are real: an in-memory
+    SQLite by default. User ids start at `first_user_id` and grow with each level, so every level signs up
+    new users.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        redis_url: str,
+        logger: logging.Logger,
+        telegram_latency: Latency,
+        image_latency: Latency,
+        image_error_rate: float = 0.0,
+        image_blocking: bool = False,
+        yookassa_latency: float = 0.1,
+        use_config_database: bool = False,
+        first_user_id: int = 9_000_000_000,
+    ):
+        self.config = config
+        self.redis_url = redis_url
+        self.logger = logger
+        self.session = FakeTelegramSession(telegram_latency, make_photo())
+        self.image_service = StubImageService(image_latency, error_rate=image_error_rate, blocking=image_blocking)
+        self.yookassa = FakeYooKassa(latency=yookassa_latency)
+        self.use_config_database = use_config_database
+        self.next_user_id = first_user_id
+        self.timing = HandlerTimingMiddleware()
+        self.bot: Optional[Bot] = None
+        self.dp: Optional[Dispatcher] = None
+        self.redis: Optional[CountingRedis] = None
+        self.db: Optional[DefaultDatabase] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _start_yookassa(self) -> str:
+        self._runner = web.AppRunner(self.yookassa.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore
+        return f"http://127.0.0.1:{port}/v3"
+
+    async def setup(self) -> None:
+        config = self.config
+        instrument_database()
+        self.redis = CountingRedis.from_url(self.redis_url)
+        await self.redis.ping()
+        if self.use_config_database:
+            self.db = create_database(config.database, config.postgres, config.sqlite)
+        else:
+            database = DatabaseConfig(backend="sqlite", query_budget=config.database.query_budget)
+            self.db = create_database(database, config.postgres, SqliteConfig(path=":memory:"))
+        await self.db.init_db()
+
+        bot = Bot(
+            token="123456:loadtest",
+            session=self.session,
+            default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+        )
+        bot.session.middleware(
+            SendQueueMiddleware(
+                rate=config.send_queue.rate,
+                chat_interval=config.send_queue.chat_interval,
+                max_retries=config.send_queue.max_retries,
+            ),
+        )
+        dp = Dispatcher(storage=RedisStorage(redis=self.redis))
+        dp.workflow_data["logger"] = self.logger
+        dp.workflow_data["database"] = self.db
+
+        user_service = UserService(UserRepository(self.db), self.logger)
+        payment_repository = PaymentRepository(self.redis)
+        payment_service = PaymentService("shop", "secret", self.logger, api_url=await self._start_yookassa())
+        payment_poller = PaymentPoller(
+            payment_service,
+            on_status=partial(
+                handle_payment_status,
+                bot=bot,
+                logger=self.logger,
+                user_service=user_service,
+                payment_repository=payment_repository,
+            ),
+            logger=self.logger,
+        )
+        dp.workflow_data.update(
+            user_service=user_service,
+            image_service=self.image_service,
+            payment_service=payment_service,
+            payment_poller=payment_poller,
+            payment_repository=payment_repository,
+            runtime_role="single",
+        )
+
+        routers = (admin_router, stats_router, commands_router, payments_router, user_router, image_processing_router)
+        for router in routers:
+            dp.include_router(router)
+        setup_middlewares(
+            dp,
+            self.logger,
+            user_service=user_service,
+            redis=self.redis,
+            dispatcher_config=config.dispatcher,
+            throttling_config=config.throttling,
+            logger_config=config.logger,
+            query_budget=config.database.query_budget,
+        )
+        dp.message.middleware(self.timing)
+        dp.callback_query.middleware(self.timing)
+
+        payment_poller.start()
+        self.bot, self.dp = bot, dp
+
+    async def teardown(self) -> None:
+        if self.dp:
+            await self.dp.workflow_data["payment_poller"].stop()
+            await self.dp.workflow_data["payment_service"].close()
+            await self.dp.storage.close()
+        if self._runner:
+            await self._runner.cleanup()
+        if self.db:
+            await self.db.close()
+
+    async def run_level(self, users: int, sessions: int, think_time: float) -> LevelReport:
+        bot, dp, redis = self.bot, self.dp, self.redis
+        assert bot and dp and redis, "setup() must be called first"
+
+        report = LevelReport(users=users, elapsed=0.0)
+        self.timing.report = report
+        factory = UpdateFactory(bot)
+        db_before = sum(stats.count for stats in QUERY_STATS.statements.values())
+        redis_before, telegram_before = Counter(redis.commands), Counter(self.session.calls)
+        image_before = self.image_service.calls
+        image_failures_before = self.image_service.failures
+
+        async def feed(step: str, update: Update) -> None:
+            started = time.perf_counter()
+            try:
+                await dp.feed_update(bot, update)
+            except Exception as e:
+                report.errors += 1
+                self.logger.debug("Update %d failed: %s", update.update_id, e)
+            report.updates += 1
+            report.steps[step].append(time.perf_counter() - started)
+
+        user_ids = range(self.next_user_id, self.next_user_id + users)
+        self.next_user_id += users
+        started = time.perf_counter()
+        await asyncio.gather(*(run_user(factory, user_id, sessions, think_time, feed) for user_id in user_ids))
+        report.elapsed = time.perf_counter() - started
+
+        report.db_statements = sum(stats.count for stats in QUERY_STATS.statements.values()) - db_before
+        report.redis_commands = Counter(redis.commands) - redis_before
+        report.telegram_calls = Counter(self.session.calls) - telegram_before
+        report.image_calls = self.image_service.calls - image_before
+        report.image_failures = self.image_service.failures - image_failures_before
+        self.timing.report = None
+        return report
+
+
+def format_report(report: LevelReport) -> str:
+    lines = [
+        f"=== {report.users} users: {report.updates} updates in {report.elapsed:.1f} s, "
+        f"{report.throughput:.1f} updates/s, {report.errors} errors",
+        f"{'handler':<32} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}",
+    ]
+    for title, durations in (("", report.handlers), ("step ", report.steps)):
+        for name, values in sorted(durations.items()):
+            lines.append(
+                f"{title + name:<32} {len(values):>6} {percentile(values, 50) * 1000:>9.1f} "
+                f"{percentile(values, 95) * 1000:>9.1f} {percentile(values, 99) * 1000:>9.1f}",
+            )
+    per_update = max(report.updates, 1)
+    redis_total = sum(report.redis_commands.values())
+    telegram_total = sum(report.telegram_calls.values())
+    lines.append(
+        f"DB statements: {report.db_statements} ({report.db_statements / per_update:.2f}/update), "
+        f"Redis commands: {redis_total} ({redis_total / per_update:.2f}/update), "
+        f"Telegram calls: {telegram_total}, image calls: {report.image_calls} ({report.image_failures} failed)",
+    )
+    lines.append("Redis: " + ", ".join(f"{name} {count}" for name, count in report.redis_commands.most_common(8)))
+    return "\n".join(lines)
+
+
+__all__ = ["LoadTest", "LevelReport", "HandlerTimingMiddleware", "format_report", "percentile"]
@@ -0,0 +1,112 @@
+import asyncio
+import itertools
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from aiogram import Bot
+from aiogram.types import Update
+
+from config import PAYMENT
+from keyboards import STYLE_NAMES
+
+
+class UpdateFactory:
+    """Builds updates as Telegram would send them from a private chat."""
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    @staticmethod
+    def _user(user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": "Load", "username": f"load_{user_id}"}
+
+    def _message(self, user_id: int, **content: Any) -> Dict[str, Any]:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            **content,
+        }
+
+    def _update(self, **content: Any) -> Update:
+        return Update.model_validate({"update_id": next(self._update_ids), **content}, context={"bot": self.bot})
+
+    def text(self, user_id: int, text: str) -> Update:
+        return self._update(message=self._message(user_id, text=text))
+
+    def photo(self, user_id: int) -> Update:
+        sizes = [
+            {
+                "file_id": f"photo-{user_id}-{width}",
+                "file_unique_id": f"{user_id}-{width}",
+                "width": width,
+                "height": height,
+            }
+            for width, height in ((320, 240), (800, 600), (1280, 960))
+        ]
+        return self._update(message=self._message(user_id, photo=sizes))
+
+    def contact(self, user_id: int) -> Update:
+        contact = {"phone_number": f"+7900{user_id % 10_000_000:07d}", "first_name": "Load", "user_id": user_id}
+        return self._update(message=self._message(user_id, contact=contact))
+
+    def callback(self, user_id: int, data: str) -> Update:
+        message = self._message(user_id, text="menu")
+        message["from"] = {"id": self.bot.id, "is_bot": True, "first_name": "bot"}
+        return self._update(
+            callback_query={
+                "id": str(next(self._update_ids)),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": message,
+            },
+        )
+
+
+Step = Tuple[str, Callable[[UpdateFactory, int], Update]]
+
+
+def session_steps(first: bool) -> List[Step]:
+    """One visit: open the bot, transform a photo, look at the balance and start buying tokens."""
+    package = PAYMENT["cheapest"]
+    steps: List[Step] = [
+        ("start", lambda f, user_id: f.text(user_id, "/start")),
+        ("image_menu", lambda f, user_id: f.text(user_id, "🎨 Изменить изображение")),
+        ("photo", lambda f, user_id: f.photo(user_id)),
+        ("style", lambda f, user_id: f.callback(user_id, f"style_{random.choice(list(STYLE_NAMES))}")),
+        ("balance", lambda f, user_id: f.text(user_id, "💰 Баланс токенов")),
+        ("buy_menu", lambda f, user_id: f.callback(user_id, "buy_tokens")),
+    ]
+    if first:
+        # The first purchase asks for a phone number
+        steps.append(("contact", lambda f, user_id: f.contact(user_id)))
+    steps.append(
+        (
+            "purchase",
+            lambda f, user_id: f.callback(user_id, f"buy_tokens_{package['token_count']}_{package['price']}"),
+        ),
+    )
+    return steps
+
+
+async def run_user(
+    factory: UpdateFactory,
+    user_id: int,
+    sessions: int,
+    think_time: float,
+    feed: Callable[[str, Update], Awaitable[None]],
+) -> None:
+    """Goes through the steps like a person waiting for each answer before the next tap."""
+    for session in range(sessions):
+        for step, build in session_steps(first=session == 0):
+            await feed(step, build(factory, user_id))
+            if think_time:
+                await asyncio.sleep(random.uniform(0.0, think_time))
+
+
+__all__ = ["UpdateFactory", "session_steps", "run_user"]
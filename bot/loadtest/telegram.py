@@ -0,0 +1,90 @@
+import asyncio
+from collections import Counter
+import json
+import time
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from loadtest.backends import Latency
+
+MESSAGE_METHODS = {
+    "SendMessage",
+    "SendPhoto",
+    "SendDocument",
+    "EditMessageText",
+    "EditMessageCaption",
+    "EditMessageReplyMarkup",
+}
+
+
+class FakeTelegramSession(BaseSession):
+    """Answers Bot API calls locally after a sampled latency.
+
+    Responses go through the regular response parsing, so the bot pays the same decoding cost as with
+    the real API. Downloaded files are `photo` bytes.
+    """
+
+    def __init__(self, latency: Latency, photo: bytes):
+        super().__init__()
+        self.latency = latency
+        self.photo = photo
+        self.calls: Counter = Counter()
+        self._message_ids = 0
+
+    def _result(self, bot: Bot, method: TelegramMethod) -> Any:
+        name = type(method).__name__
+        if name in MESSAGE_METHODS:
+            self._message_ids += 1
+            return {
+                "message_id": getattr(method, "message_id", None) or self._message_ids,
+                "date": int(time.time()),
+                "chat": {"id": getattr(method, "chat_id", None) or 0, "type": "private"},
+                "from": {"id": bot.id, "is_bot": True, "first_name": "bot"},
+                "text": getattr(method, "text", None) or "",
+            }
+        if name == "GetFile":
+            return {
+                "file_id": method.file_id,  # type: ignore
+                "file_unique_id": method.file_id,  # type: ignore
+                "file_size": len(self.photo),
+                "file_path": f"photos/{method.file_id}.jpg",  # type: ignore
+            }
+        if name == "GetMe":
+            return {"id": bot.id, "is_bot": True, "first_name": "bot", "username": "loadtest_bot"}
+        return True
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        timeout: Optional[int] = None,
+    ) -> TelegramType:
+        self.calls[type(method).__name__] += 1
+        await asyncio.sleep(self.latency.sample())
+        content = json.dumps({"ok": True, "result": self._result(bot, method)})
+        response = self.check_response(bot=bot, method=method, status_code=200, content=content)
+        return response.result  # type: ignore
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: Optional[Dict[str, Any]] = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        self.calls["download_file"] += 1
+        await asyncio.sleep(self.latency.sample())
+        for start in range(0, len(self.photo), chunk_size):
+            end = start + chunk_size
+            yield self.photo[start:end]
+
+    async def close(self) -> None:
+        pass
+
+
+__all__ = ["FakeTelegramSession"]
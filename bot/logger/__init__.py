@@ -1,4 +1,4 @@
-from logger.logger import get_logger, LoggerConfig
+from logger.logger import build_handlers, get_logger, LoggerConfig, stop_logging
 
 
-__all__ = ["get_logger", "LoggerConfig"]
+__all__ = ["get_logger", "stop_logging", "build_handlers", "LoggerConfig"]
@@ -1,5 +1,11 @@
+import atexit
 from dataclasses import dataclass
+from datetime import datetime, timezone
+import json
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+import queue
+from typing import List
 
 from colorlog import ColoredFormatter
 
@@ -8,6 +14,15 @@ from colorlog import ColoredFormatter
 class LoggerConfig:
     debug: bool
     file_path: str
+    # size, time or none
+    rotation: str = "size"
+    max_bytes: int = 10 * 1024 * 1024
+    backup_count: int = 5
+    when: str = "midnight"
+    json_format: bool = False
+    # Share of fast handled updates logged; slow and failed ones are always logged
+    sample_rate: float = 1.0
+    slow_threshold: float = 1.0
 
 
 class ConditionalColoredFormatter(ColoredFormatter):
@@ -15,18 +30,134 @@ class ConditionalColoredFormatter(ColoredFormatter):
 
     def format(self, record):
         if record.levelno >= logging.WARNING:
-            extra_info = f"\t[File: {record.filename}:{record.lineno}]"
-            record.msg += extra_info
+            # The record is shared by all handlers, so the suffix goes to a copy
+            record = logging.makeLogRecord(record.__dict__)
+            record.msg = f"{record.msg}\t[File: {record.filename}:{record.lineno}]"
 
         return super().format(record)
 
 
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the fields passed as `extra={"fields": {...}}`."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.levelno >= logging.WARNING:
+            entry["file"] = f"{record.filename}:{record.lineno}"
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# Arguments that can't change before the listener thread formats the message
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+
+class _LazyQueueHandler(QueueHandler):
+    """Puts records to the queue, the listener thread formats them.
+
+    What could change before then is rendered here: tracebacks, whose frames move on, and messages with
+    arguments other than plain values, e.g. lists or ORM objects that may be modified or detached.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        args = record.args.values() if isinstance(record.args, dict) else record.args or ()
+        if not all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+
+
+_listeners: List[QueueListener] = []
+
+
+def stop_logging() -> None:
+    """Writes out the queued records and stops the background threads."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(stop_logging)
+
+
+def _build_file_handler(cfg: LoggerConfig) -> logging.Handler:
+    if cfg.rotation == "size":
+        return RotatingFileHandler(
+            cfg.file_path,
+            maxBytes=cfg.max_bytes,
+            backupCount=cfg.backup_count,
+            encoding="utf-8",
+        )
+    if cfg.rotation == "time":
+        return TimedRotatingFileHandler(cfg.file_path, when=cfg.when, backupCount=cfg.backup_count, encoding="utf-8")
+    return logging.FileHandler(cfg.file_path, encoding="utf-8")
+
+
+def build_handlers(cfg: LoggerConfig) -> List[logging.Handler]:
+    """Console and file handlers doing the actual formatting and I/O."""
+    level = logging.DEBUG if cfg.debug else logging.INFO
+
+    console_formatter = ConditionalColoredFormatter(
+        "%(blue)s%(asctime)s\t%(log_color)s[%(levelname)-8s]%(reset)s\t%(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        log_colors={
+            "DEBUG": "cyan",
+            "INFO": "green",
+            "WARNING": "yellow",
+            "ERROR": "red",
+            "CRITICAL": "red,bg_black",
+        },
+    )
+
+    if cfg.json_format:
+        console_formatter = JsonFormatter()
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(level=level)
+    console_handler.setFormatter(console_formatter)
+    handlers: List[logging.Handler] = [console_handler]
+
+    # Configuring the log file
+    if cfg.file_path:
+        file_formatter = logging.Formatter(
+            "%(asctime)s    [%(levelname)-8s]    %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
+
+        if cfg.json_format:
+            file_formatter = JsonFormatter()
+
+        file_handler = _build_file_handler(cfg)
+        file_handler.setLevel(logging.INFO)
+        file_handler.setFormatter(file_formatter)
+        handlers.append(file_handler)
+
+    return handlers
+
+
 def get_logger(name: str, cfg: LoggerConfig) -> logging.Logger:
     """Get the configured logger.
 
+    Records are only put to a queue on the calling thread; formatting, console output
+    and file writes with rotation happen on a background thread.
+
     Args:
         name (str): The name of the logger
-        level (int): Logging level. Defaults to logging.DEBUG.
+        cfg (LoggerConfig): Logging settings
 
     Returns:
         logging.Logger: The configured logger
@@ -38,38 +169,14 @@ def get_logger(name: str, cfg: LoggerConfig) -> logging.Logger:
     logger.setLevel(level)
 
     if not logger.hasHandlers():
-        console_formatter = ConditionalColoredFormatter(
-            "%(blue)s%(asctime)s\t%(log_color)s[%(levelname)-8s]%(reset)s\t%(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-            log_colors={
-                "DEBUG": "cyan",
-                "INFO": "green",
-                "WARNING": "yellow",
-                "ERROR": "red",
-                "CRITICAL": "red,bg_black",
-            },
-        )
-
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(level=level)
-        console_handler.setFormatter(console_formatter)
-
-        logger.addHandler(console_handler)
-
-        # Configuring the log file
-        if cfg.file_path:
-            file_formatter = logging.Formatter(
-                "%(asctime)s    [%(levelname)-8s]    %(message)s",
-                datefmt="%Y-%m-%d %H:%M:%S",
-            )
-
-            file_handler = logging.FileHandler(cfg.file_path, encoding="utf-8")
-            file_handler.setLevel(logging.INFO)
-            file_handler.setFormatter(file_formatter)
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        listener = QueueListener(records, *build_handlers(cfg), respect_handler_level=True)
+        listener.start()
+        _listeners.append(listener)
 
-            logger.addHandler(file_handler)
+        logger.addHandler(_LazyQueueHandler(records))
 
     return logger
 
 
-__all__ = ["get_logger"]
+__all__ = ["get_logger", "stop_logging", "build_handlers", "ConditionalColoredFormatter", "JsonFormatter"]
@@ -1,15 +1,84 @@
 from logging import Logger
+from typing import Optional
 
 from aiogram import Dispatcher
+from redis.asyncio.client import Redis
 
-from middleware.logging import LoggingMiddleware
+from config import DispatcherConfig, ThrottlingConfig
+from logger import LoggerConfig
+from middleware.concurrency import ConcurrencyMiddleware, ConcurrencyStats
+from middleware.logging import HandlerNameMiddleware, LoggingMiddleware
+from middleware.ordering import ChatOrderMiddleware, OrderingStats
+from middleware.throttling import Bucket, ThrottlingMiddleware, ThrottlingStats
 from middleware.user import CurrentUserMiddleware
+from monitoring import Tracer, UpdateRateMiddleware
 from service import UserService
 
 
-def setup(dispatcher: Dispatcher, logger: Logger, user_service: UserService):
+def setup(
+    dispatcher: Dispatcher,
+    logger: Logger,
+    user_service: UserService,
+    redis: Redis,
+    dispatcher_config: DispatcherConfig,
+    throttling_config: ThrottlingConfig,
+    logger_config: LoggerConfig,
+    tracer: Optional[Tracer] = None,
+    query_budget: int = 0,
+):
+    # Outer, so throttled updates count too
+    update_rate = UpdateRateMiddleware()
+    dispatcher["update_rate"] = update_rate
+    dispatcher.update.outer_middleware(update_rate)
+
+    # Ordering goes first so a chat's updates reach throttling, and wait out its deferral, in arrival order.
+    # Waiting updates still hold a polling slot, so waiters per chat are capped. Throttling goes next so excess
+    # updates are dropped before any other work. Limits go next so waiting updates don't take ConcurrencyMiddleware
+    # slots or hold database connections
+    if dispatcher_config.ordered:
+        ordering = ChatOrderMiddleware(max_waiting=dispatcher_config.max_chat_waiting)
+        dispatcher["ordering"] = ordering
+        dispatcher.update.middleware(ordering)
+
+    if throttling_config.enabled:
+        throttling = ThrottlingMiddleware(
+            redis,
+            cheap=Bucket(throttling_config.cheap_rate, throttling_config.cheap_burst),
+            expensive=Bucket(throttling_config.expensive_rate, throttling_config.expensive_burst),
+            max_delay=throttling_config.max_delay,
+        )
+        dispatcher["throttling"] = throttling
+        dispatcher.update.middleware(throttling)
+
+    concurrency = ConcurrencyMiddleware(
+        cheap_limit=dispatcher_config.cheap_limit,
+        expensive_limit=dispatcher_config.expensive_limit,
+        expensive_queue_size=dispatcher_config.expensive_queue_size,
+    )
+    dispatcher["concurrency"] = concurrency
+    dispatcher.update.middleware(concurrency)
+    dispatcher.update.middleware(
+        LoggingMiddleware(
+            logger,
+            sample_rate=logger_config.sample_rate,
+            slow_threshold=logger_config.slow_threshold,
+            tracer=tracer,
+            query_budget=query_budget,
+        ),
+    )
+    # Inside the logging context, so user lookups count towards the update's statements
     dispatcher.update.middleware(CurrentUserMiddleware(user_service=user_service))
-    dispatcher.update.middleware(LoggingMiddleware(logger))
+    handler_name = HandlerNameMiddleware()
+    dispatcher.message.middleware(handler_name)
+    dispatcher.callback_query.middleware(handler_name)
 
 
-__all__ = ["setup"]
+__all__ = [
+    "setup",
+    "ChatOrderMiddleware",
+    "ConcurrencyMiddleware",
+    "ConcurrencyStats",
+    "OrderingStats",
+    "ThrottlingMiddleware",
+    "ThrottlingStats",
+]
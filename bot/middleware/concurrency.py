@@ -0,0 +1,93 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, cast, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from utils import is_expensive
+
+
+@dataclass
+class LaneStats:
+    limit: int
+    active: int
+    waiting: int
+
+
+@dataclass
+class ConcurrencyStats:
+    cheap: LaneStats
+    expensive: LaneStats
+    rejected: int
+
+    @property
+    def queue_depth(self) -> int:
+        return self.cheap.waiting + self.expensive.waiting
+
+
+class _Lane:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+
+    async def run(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            return await call()
+        finally:
+            self.active -= 1
+            self.semaphore.release()
+
+    def stats(self) -> LaneStats:
+        return LaneStats(limit=self.limit, active=self.active, waiting=self.waiting)
+
+
+class ConcurrencyMiddleware(BaseMiddleware):
+    """Limits concurrently handled updates separately for cheap and expensive ones.
+
+    Image generation can't starve menus and profile. Expensive updates beyond `expensive_queue_size` waiting
+    ones are rejected right away instead of holding a polling slot.
+    """
+
+    def __init__(self, cheap_limit: int, expensive_limit: int, expensive_queue_size: int):
+        self.cheap = _Lane(cheap_limit)
+        self.expensive = _Lane(expensive_limit)
+        self.expensive_queue_size = expensive_queue_size
+        self.rejected = 0
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        update: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        update = cast(Update, update)
+
+        if not is_expensive(update):
+            return await self.cheap.run(lambda: handler(update, data))
+
+        if self.expensive.waiting >= self.expensive_queue_size:
+            self.rejected += 1
+            await update.callback_query.answer(  # type: ignore
+                "⏳ Сейчас слишком много запросов на генерацию, попробуйте через минуту",
+                show_alert=True,
+            )
+            return None
+
+        return await self.expensive.run(lambda: handler(update, data))
+
+    def stats(self) -> ConcurrencyStats:
+        return ConcurrencyStats(cheap=self.cheap.stats(), expensive=self.expensive.stats(), rejected=self.rejected)
+
+
+__all__ = ["ConcurrencyMiddleware", "ConcurrencyStats", "LaneStats"]
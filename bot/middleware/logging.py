@@ -1,15 +1,41 @@
 import asyncio
+from contextlib import nullcontext
 from logging import Logger
+import random
+import time
 from typing import Any, Awaitable, Callable, cast, Dict, Optional
 
 from aiogram import BaseMiddleware
 from aiogram.dispatcher.event.bases import UNHANDLED
-from aiogram.types import TelegramObject, Update, User
+from aiogram.types import TelegramObject, Update
+
+from monitoring import current_update, Tracer, update_context, UPDATE_FAILED, UpdateContext
+from utils import get_user_id
 
 
 class LoggingMiddleware(BaseMiddleware):
-    def __init__(self, logger: Logger):
+    """Logs handled updates with what they cost.
+
+    A random `sample_rate` share of updates is picked when they arrive; updates slower than `slow_threshold`
+    seconds and failed ones are logged whether picked or not. Structured fields go to `extra` for the JSON format.
+    A handler exception is not passed on, outer middlewares get UPDATE_FAILED instead.
+    With a tracer every update gets a root span. Updates running more than `query_budget` SQL statements
+    are logged with the statement list.
+    """
+
+    def __init__(
+        self,
+        logger: Logger,
+        sample_rate: float = 1.0,
+        slow_threshold: float = 1.0,
+        tracer: Optional[Tracer] = None,
+        query_budget: int = 0,
+    ):
         self.logger = logger
+        self.tracer = tracer
+        self.query_budget = query_budget
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold * 1000
         super().__init__()
 
     async def __call__(
@@ -20,52 +46,112 @@ class LoggingMiddleware(BaseMiddleware):
     ) -> Any:
         update = cast(Update, update)
 
+        sampled = random.random() < self.sample_rate
         loop = asyncio.get_running_loop()
         start_time = loop.time()
-        handled = False
-        try:
-            result = await handler(update, data)
-            handled = result is not UNHANDLED
-            return result
+        # Telegram dates have a one second resolution and only messages carry one
+        delivery = (time.time() - update.message.date.timestamp()) * 1000 if update.message else None
+        outcome = "unhandled"
+        root = self.tracer.trace("update", update_id=update.update_id, type=update.event_type) if self.tracer else None
+        with update_context(update.update_id, get_user_id(update)) as context, root or nullcontext() as span:
+            try:
+                result = await handler(update, data)
+                outcome = "handled" if result is not UNHANDLED else "unhandled"
+                return result
+
+            except Exception as e:
+                outcome = "error"
+                fields = self._fields(update, context, outcome, (loop.time() - start_time) * 1000, delivery, sampled)
+                self.logger.error("<%d> %-7s: %s", update.update_id, "error", str(e), extra={"fields": fields})
+                return UPDATE_FAILED
 
-        except Exception as e:
-            self.logger.error("<%d> %-7s: %s", update.update_id, "error", str(e))
+            finally:
+                if span:
+                    span.attributes.update(user_id=context.user_id, handler=context.handler, outcome=outcome)
+                self._log(update, context, outcome, (loop.time() - start_time) * 1000, delivery, sampled)
+                if self.query_budget and context.db_queries > self.query_budget:
+                    self._log_queries(context)
 
-        finally:
-            duration = (loop.time() - start_time) * 1000
+    @staticmethod
+    def _fields(
+        update: Update,
+        context: UpdateContext,
+        outcome: str,
+        duration: float,
+        delivery: Optional[float],
+        sampled: bool,
+    ) -> Dict[str, Any]:
+        return {
+            **context.fields(),
+            "type": update.event_type,
+            "outcome": outcome,
+            "duration_ms": round(duration, 1),
+            "delivery_ms": round(delivery) if delivery is not None else None,
+            "sampled": sampled,
+        }
+
+    def _log(
+        self,
+        update: Update,
+        context: UpdateContext,
+        outcome: str,
+        duration: float,
+        delivery: Optional[float],
+        sampled: bool,
+    ) -> None:
+        text = ""
+        if update.message:
+            text = update.message.text
+        elif update.callback_query:
+            text = update.callback_query.data
+        user_id = context.user_id or 0
+
+        if outcome == "handled":
+            if not sampled and duration < self.slow_threshold:
+                return
             format_string = '<%d> %-7s: "%s" from user %s. Duration %d ms'
-            text = ""
-            user_id = 0
-
-            def get_user(obj: Any) -> Optional[User]:
-                return getattr(obj, "from_user", None)
-
-            if update.message:
-                user = get_user(update.message)
-                user_id = user.id if user else 0
-                text = update.message.text
-            elif update.callback_query:
-                text = update.callback_query.data
-                user_id = update.callback_query.from_user.id
-
-            if handled:
-                self.logger.info(
-                    format_string,
-                    update.update_id,
-                    "request",
-                    text,
-                    user_id,
-                    duration,
-                )
-            else:
-                format_string = '<%d> %-7s: "%s" from user %s. NOT HANDLED'
-                self.logger.debug(
-                    format_string,
-                    update.update_id,
-                    "request",
-                    text,
-                    user_id,
-                )
-
-
-__all__ = ["LoggingMiddleware"]
+            args = [update.update_id, "request", text, user_id, duration]
+            if delivery is not None:
+                format_string += ", delivery %d ms"
+                args.append(delivery)
+            fields = self._fields(update, context, outcome, duration, delivery, sampled)
+            self.logger.info(format_string, *args, extra={"fields": fields})
+        else:
+            format_string = '<%d> %-7s: "%s" from user %s. NOT HANDLED'
+            self.logger.debug(format_string, update.update_id, "request", text, user_id)
+
+    def _log_queries(self, context: UpdateContext) -> None:
+        statements = "\n".join(
+            f"{elapsed * 1000:8.1f} ms  {' '.join(statement.split())[:300]}"
+            for statement, elapsed in context.statements
+        )
+        self.logger.warning(
+            "<%d> %-7s: %d SQL statements (%.1f ms) in %s, the budget is %d:\n%s",
+            context.update_id,
+            "queries",
+            context.db_queries,
+            context.db_time * 1000,
+            context.handler,
+            self.query_budget,
+            statements,
+            extra={"fields": {**context.fields(), "statements": [statement for statement, _ in context.statements]}},
+        )
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Records the name of the matched handler in the update context."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        context = current_update()
+        handler_object = data.get("handler")
+        if context and handler_object:
+            context.handler = getattr(handler_object.callback, "__name__", None)
+        return await handler(event, data)
+
+
+__all__ = ["LoggingMiddleware", "HandlerNameMiddleware"]
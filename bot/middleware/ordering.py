@@ -0,0 +1,53 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, cast, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from utils import answer_dropped, get_chat_id, KeyedLock
+
+
+@dataclass
+class OrderingStats:
+    busy_chats: int
+    waiting: int
+    dropped: int
+
+
+class ChatOrderMiddleware(BaseMiddleware):
+    """Handles updates of one chat one at a time and in arrival order, different chats run in parallel.
+
+    Prevents e.g. a style selection racing a "new photo" callback that clears the FSM state. Waiting updates
+    still hold a polling slot, so a chat gets at most `max_waiting` of them; later ones are dropped and dropped
+    callbacks are answered so the button stops spinning.
+    """
+
+    def __init__(self, max_waiting: int = 3):
+        self.locks = KeyedLock()
+        self.max_waiting = max_waiting
+        self.dropped = 0
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        update: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        chat_id = get_chat_id(cast(Update, update))
+        if chat_id is None:
+            return await handler(update, data)
+
+        if self.locks.waiting_for(chat_id) >= self.max_waiting:
+            self.dropped += 1
+            await answer_dropped(cast(Update, update))
+            return None
+
+        async with self.locks.hold(chat_id):
+            return await handler(update, data)
+
+    def stats(self) -> OrderingStats:
+        return OrderingStats(busy_chats=len(self.locks), waiting=self.locks.waiting(), dropped=self.dropped)
+
+
+__all__ = ["ChatOrderMiddleware", "OrderingStats"]
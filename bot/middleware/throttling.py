@@ -0,0 +1,114 @@
+import asyncio
+from dataclasses import dataclass
+import math
+from typing import Any, Awaitable, Callable, cast, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from redis.asyncio.client import Redis
+
+from utils import get_user_id, is_expensive
+
+# Token bucket shared by all bot processes. Tokens may go below zero to reserve a slot in the near future;
+# returns the wait in milliseconds or -1 if the wait would exceed the allowed delay.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local max_delay = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate / 1000)
+
+local wait = 0
+if tokens < 1 then
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+    if wait > max_delay then
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+        redis.call('PEXPIRE', KEYS[1], ttl)
+        return -1
+    end
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], ttl)
+return wait
+"""
+
+
+@dataclass
+class Bucket:
+    rate: float
+    capacity: float
+
+
+@dataclass
+class ThrottlingStats:
+    allowed: int
+    deferred: int
+    dropped: int
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Per-user rate limits kept in Redis, separate for cheap and expensive updates.
+
+    An update over the limit waits for a token if it comes within `max_delay` seconds, otherwise it is dropped
+    before any database or Gemini work. Dropped callbacks are answered so the button stops spinning.
+    """
+
+    def __init__(self, redis: Redis, cheap: Bucket, expensive: Bucket, max_delay: float = 2.0):
+        self.redis = redis
+        self.buckets = {"cheap": cheap, "expensive": expensive}
+        self.max_delay = max_delay
+        self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self.allowed = 0
+        self.deferred = 0
+        self.dropped = 0
+        super().__init__()
+
+    async def _reserve(self, kind: str, user_id: int) -> float:
+        """Seconds to wait for a token, -1 if the update should be dropped."""
+        bucket = self.buckets[kind]
+        # After this time the bucket is full again, even if tokens were reserved ahead, and can be forgotten
+        ttl = math.ceil((bucket.capacity / bucket.rate + self.max_delay) * 1000)
+        wait = await self._script(
+            keys=[f"throttle:{kind}:{user_id}"],
+            args=[bucket.rate, bucket.capacity, int(self.max_delay * 1000), ttl],
+        )
+        return wait / 1000 if wait >= 0 else -1
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        update: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        update = cast(Update, update)
+        user_id = get_user_id(update)
+        if user_id is None:
+            return await handler(update, data)
+
+        wait = await self._reserve("expensive" if is_expensive(update) else "cheap", user_id)
+        if wait < 0:
+            self.dropped += 1
+            if update.callback_query:
+                await update.callback_query.answer("⏳ Слишком много запросов, подождите немного")
+            return None
+
+        if wait > 0:
+            self.deferred += 1
+            await asyncio.sleep(wait)
+        else:
+            self.allowed += 1
+        return await handler(update, data)
+
+    def stats(self) -> ThrottlingStats:
+        return ThrottlingStats(allowed=self.allowed, deferred=self.deferred, dropped=self.dropped)
+
+
+__all__ = ["ThrottlingMiddleware", "ThrottlingStats", "Bucket"]
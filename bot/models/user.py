@@ -10,12 +10,12 @@ class User(Base):
     __tablename__ = "users"
 
     id: Mapped[str] = mapped_column(String(20), primary_key=True)
-    username: Mapped[str] = mapped_column(String(32), nullable=False)
+    username: Mapped[str] = mapped_column(String(32), nullable=False, index=True)
     phone_number: Mapped[str] = mapped_column(String(32), nullable=True)
     token_count: Mapped[int] = mapped_column(Integer, default=5)
     is_staff: Mapped[bool] = mapped_column(Boolean, default=False)
     is_superuser: Mapped[bool] = mapped_column(Boolean, default=False)
-    date_joined: Mapped[datetime] = mapped_column(DateTime, default=datetime.now())
+    date_joined: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(), index=True)
 
     def __repr__(self):
         return f"<User(id={self.id}, username={self.username}, is_staff={self.is_staff})>"
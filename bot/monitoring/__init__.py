@@ -0,0 +1,88 @@
+from logging import Logger
+
+from aiogram import Dispatcher
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest, REGISTRY
+from redis.asyncio.client import Redis
+
+from monitoring.collector import StatsCollector
+from monitoring.context import current_update, update_context, UPDATE_FAILED, UpdateContext
+from monitoring.database import instrument_database, QUERY_STATS
+from monitoring.fsm import FsmStateSampler
+from monitoring.loop import LoopLagMonitor
+from monitoring.metrics import GEMINI_DURATION
+from monitoring.middleware import HandlerMetricsMiddleware, UpdateMetricsMiddleware, UpdateRateMiddleware
+from monitoring.profiling import Profiler
+from monitoring.tracing import (
+    FileSpanExporter,
+    format_trace,
+    OtlpSpanExporter,
+    span,
+    start_span,
+    Tracer,
+    TracingRequestMiddleware,
+)
+from states import ImageProcessing, UserProfile
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(body=generate_latest(REGISTRY), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+def setup(
+    dispatcher: Dispatcher,
+    redis: Redis,
+    logger: Logger,
+    loop_lag_interval: float = 0.5,
+    loop_stall_threshold: float = 0.0,
+    fsm_sample_interval: float = 60.0,
+    sample_fsm: bool = True,
+) -> None:
+    """Record metrics of updates, handlers and the event loop; `metrics_handler` serves them.
+
+    Statements are timed once `instrument_database` is called.
+    """
+    dispatcher.update.outer_middleware(UpdateMetricsMiddleware())
+    # Handler middlewares of the dispatcher apply to the handlers of all included routers
+    handler_metrics = HandlerMetricsMiddleware()
+    dispatcher.message.middleware(handler_metrics)
+    dispatcher.callback_query.middleware(handler_metrics)
+
+    loop_monitor = LoopLagMonitor(loop_lag_interval, stall_threshold=loop_stall_threshold, logger=logger)
+    dispatcher["loop_monitor"] = loop_monitor
+    dispatcher.startup.register(loop_monitor.start)
+    dispatcher.shutdown.register(loop_monitor.stop)
+
+    if sample_fsm:
+        known_states = [*ImageProcessing.__all_states_names__, *UserProfile.__all_states_names__]
+        fsm_sampler = FsmStateSampler(redis, known_states, logger, interval=fsm_sample_interval)
+        dispatcher["fsm_sampler"] = fsm_sampler
+        dispatcher.startup.register(fsm_sampler.start)
+        dispatcher.shutdown.register(fsm_sampler.stop)
+
+    REGISTRY.register(StatsCollector(dispatcher.workflow_data))
+
+
+__all__ = [
+    "setup",
+    "metrics_handler",
+    "instrument_database",
+    "QUERY_STATS",
+    "current_update",
+    "update_context",
+    "UpdateContext",
+    "UPDATE_FAILED",
+    "GEMINI_DURATION",
+    "LoopLagMonitor",
+    "FsmStateSampler",
+    "StatsCollector",
+    "UpdateRateMiddleware",
+    "Profiler",
+    "Tracer",
+    "TracingRequestMiddleware",
+    "FileSpanExporter",
+    "OtlpSpanExporter",
+    "format_trace",
+    "span",
+    "start_span",
+]
@@ -0,0 +1,110 @@
+from typing import Any, Iterator, Mapping
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+
+class StatsCollector(Collector):
+    """Exposes the stats the services already keep, read at scrape time so the update path pays nothing.
+
+    Services are looked up in `sources` (the dispatcher workflow data) on every scrape; missing ones are skipped.
+    """
+
+    def __init__(self, sources: Mapping[str, Any]):
+        self.sources = sources
+
+    def collect(self) -> Iterator[Metric]:
+        for name in ("payment_poller", "payment_service", "database", "send_queue", "stream_worker"):
+            source = self.sources.get(name)
+            if source is not None:
+                yield from getattr(self, f"_{name}")(source)
+        for name in ("concurrency", "ordering", "throttling"):
+            source = self.sources.get(name)
+            if source is not None:
+                yield from getattr(self, f"_{name}")(source.stats())
+        sampler = self.sources.get("fsm_sampler")
+        if sampler is not None:
+            states = GaugeMetricFamily("bot_fsm_states", "Users per FSM state at the last sample", labels=["state"])
+            for state, count in sampler.counts.items():
+                states.add_metric([state], count)
+            yield states
+
+    @staticmethod
+    def _payment_poller(poller: Any) -> Iterator[Metric]:
+        stats = poller.stats()
+        yield GaugeMetricFamily("bot_payments_pending", "Payments polled for a final status", value=stats.pending)
+        yield CounterMetricFamily("bot_payment_checks", "Payment status checks", value=stats.api_calls)
+        yield GaugeMetricFamily(
+            "bot_payment_poller_tasks",
+            "Poller loop and status checks in flight",
+            value=stats.open_tasks,
+        )
+
+    @staticmethod
+    def _stream_worker(worker: Any) -> Iterator[Metric]:
+        yield GaugeMetricFamily("bot_worker_waiting", "Stream updates waiting for their chat", value=worker.waiting)
+        yield CounterMetricFamily("bot_worker_dropped", "Stream updates over the chat limit", value=worker.dropped)
+
+    @staticmethod
+    def _payment_service(service: Any) -> Iterator[Metric]:
+        calls = CounterMetricFamily("bot_yookassa_requests", "YooKassa API requests", labels=["method"])
+        errors = CounterMetricFamily("bot_yookassa_errors", "Failed YooKassa API requests", labels=["method"])
+        latency = CounterMetricFamily("bot_yookassa_latency_seconds", "YooKassa API time spent", labels=["method"])
+        for method, stats in service.stats.items():
+            calls.add_metric([method], stats.calls)
+            errors.add_metric([method], stats.errors)
+            latency.add_metric([method], stats.latency_total)
+        yield from (calls, errors, latency)
+
+    @staticmethod
+    def _database(database: Any) -> Iterator[Metric]:
+        stats = database.get_pool_stats()
+        connections = GaugeMetricFamily("bot_db_pool_connections", "Pool connections", labels=["state"])
+        connections.add_metric(["checked_in"], stats.checked_in)
+        connections.add_metric(["checked_out"], stats.checked_out)
+        connections.add_metric(["overflow"], max(stats.overflow, 0))
+        yield connections
+        yield CounterMetricFamily("bot_db_pool_acquired", "Connections taken from the pool", value=stats.acquired)
+        yield CounterMetricFamily(
+            "bot_db_pool_wait_seconds",
+            "Time spent waiting for a pool connection",
+            value=stats.wait_time_total,
+        )
+
+    @staticmethod
+    def _send_queue(queue: Any) -> Iterator[Metric]:
+        stats = queue.stats()
+        yield GaugeMetricFamily("bot_send_queue_waiting", "Outgoing requests waiting", value=stats.waiting)
+        requests = CounterMetricFamily("bot_send_queue_requests", "Outgoing requests", labels=["outcome"])
+        requests.add_metric(["sent"], stats.sent)
+        requests.add_metric(["retried"], stats.retried)
+        requests.add_metric(["coalesced"], stats.coalesced)
+        yield requests
+        yield GaugeMetricFamily("bot_send_queue_wait_max_seconds", "Longest queue wait", value=stats.wait_max)
+
+    @staticmethod
+    def _concurrency(stats: Any) -> Iterator[Metric]:
+        active = GaugeMetricFamily("bot_dispatch_active", "Updates being handled", labels=["lane"])
+        waiting = GaugeMetricFamily("bot_dispatch_waiting", "Updates waiting for a slot", labels=["lane"])
+        for lane in ("cheap", "expensive"):
+            active.add_metric([lane], getattr(stats, lane).active)
+            waiting.add_metric([lane], getattr(stats, lane).waiting)
+        yield from (active, waiting)
+        yield CounterMetricFamily("bot_dispatch_rejected", "Expensive updates rejected", value=stats.rejected)
+
+    @staticmethod
+    def _ordering(stats: Any) -> Iterator[Metric]:
+        yield GaugeMetricFamily("bot_ordering_busy_chats", "Chats with an update in progress", value=stats.busy_chats)
+        yield GaugeMetricFamily("bot_ordering_waiting", "Updates waiting for their chat", value=stats.waiting)
+        yield CounterMetricFamily("bot_ordering_dropped", "Updates dropped over the chat limit", value=stats.dropped)
+
+    @staticmethod
+    def _throttling(stats: Any) -> Iterator[Metric]:
+        throttled = CounterMetricFamily("bot_throttling_updates", "Updates by throttling result", labels=["result"])
+        throttled.add_metric(["allowed"], stats.allowed)
+        throttled.add_metric(["deferred"], stats.deferred)
+        throttled.add_metric(["dropped"], stats.dropped)
+        yield throttled
+
+
+__all__ = ["StatsCollector"]
@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Statements kept per update for the query budget warning
+MAX_STATEMENTS = 100
+
+# Returned for an update whose handler raised: LoggingMiddleware logs the exception instead of passing it on
+UPDATE_FAILED: Any = object()
+
+
+@dataclass
+class UpdateContext:
+    """What handling of one update cost, filled in by instrumented code along the way."""
+
+    update_id: int
+    user_id: Optional[int] = None
+    handler: Optional[str] = None
+    db_queries: int = 0
+    db_time: float = 0.0
+    gemini_time: float = 0.0
+    statements: List[Tuple[str, float]] = field(default_factory=list)
+
+    def add_query(self, statement: str, elapsed: float) -> None:
+        self.db_queries += 1
+        self.db_time += elapsed
+        if len(self.statements) < MAX_STATEMENTS:
+            self.statements.append((statement, elapsed))
+
+    def fields(self) -> Dict[str, Any]:
+        return {
+            "update_id": self.update_id,
+            "user_id": self.user_id,
+            "handler": self.handler,
+            "db_queries": self.db_queries,
+            "db_ms": round(self.db_time * 1000, 1),
+            "gemini_ms": round(self.gemini_time * 1000, 1),
+        }
+
+
+_current: ContextVar[Optional[UpdateContext]] = ContextVar("update_context", default=None)
+
+
+def current_update() -> Optional[UpdateContext]:
+    """Context of the update being handled, None outside of update handling."""
+    return _current.get()
+
+
+@contextmanager
+def update_context(update_id: int, user_id: Optional[int] = None) -> Iterator[UpdateContext]:
+    context = UpdateContext(update_id=update_id, user_id=user_id)
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+__all__ = ["UpdateContext", "current_update", "update_context", "UPDATE_FAILED"]
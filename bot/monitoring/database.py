@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from functools import lru_cache
+import re
+import time
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from monitoring.context import current_update
+from monitoring.metrics import DB_QUERY_DURATION
+from monitoring.tracing import start_span
+
+OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\$\d+|%\(\w+\)s|(?<![:\w]):\w+|\?")
+_LISTS = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(statement: str) -> str:
+    """The statement with literals and parameters replaced by `?`, so repeats of one query group together."""
+    normalized = _LITERALS.sub("?", _SPACES.sub(" ", statement).strip())
+    return _LISTS.sub("(...)", normalized)
+
+
+@dataclass
+class StatementStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class QueryStats:
+    """Count and time of statements per fingerprint since the start or the last reset."""
+
+    def __init__(self, max_fingerprints: int = 500):
+        self.max_fingerprints = max_fingerprints
+        self.statements: Dict[str, StatementStats] = {}
+
+    def record(self, statement: str, elapsed: float) -> None:
+        key = fingerprint(statement)
+        stats = self.statements.get(key)
+        if stats is None:
+            # Statements built from user input would otherwise grow the table without bound
+            if len(self.statements) >= self.max_fingerprints:
+                key = "<other>"
+            stats = self.statements.setdefault(key, StatementStats())
+        stats.count += 1
+        stats.total += elapsed
+        stats.max = max(stats.max, elapsed)
+
+    def top(self, limit: int = 20) -> List[Tuple[str, StatementStats]]:
+        """Fingerprints taking the most time in total."""
+        return sorted(self.statements.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+
+    def reset(self) -> None:
+        self.statements.clear()
+
+
+QUERY_STATS = QueryStats()
+
+
+def _operation(statement: str) -> str:
+    operation = statement.lstrip()[:6].upper()
+    return operation if operation in OPERATIONS else "OTHER"
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+    conn.info.setdefault("query_spans", []).append(start_span("db." + _operation(statement), statement=statement[:200]))
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    query_span = conn.info["query_spans"].pop()
+    if query_span:
+        query_span.end()
+    DB_QUERY_DURATION.labels(_operation(statement)).observe(elapsed)
+    QUERY_STATS.record(statement, elapsed)
+    context = current_update()
+    if context:
+        context.add_query(statement, elapsed)
+
+
+def _handle_error(context: Any) -> None:
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+        query_span = context.connection.info["query_spans"].pop()
+        if query_span:
+            query_span.end(error=type(context.original_exception).__name__)
+
+
+def instrument_database() -> None:
+    """Times statements of every SQLAlchemy engine, async engines included.
+
+    Statements are counted per fingerprint in `QUERY_STATS` and attributed to the update being handled.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+
+__all__ = ["instrument_database", "fingerprint", "QueryStats", "StatementStats", "QUERY_STATS"]
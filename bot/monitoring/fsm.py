@@ -0,0 +1,75 @@
+import asyncio
+from collections import Counter
+from contextlib import suppress
+import logging
+from typing import Dict, Iterable, Optional
+
+from redis.asyncio.client import Redis
+
+
+class FsmStateSampler:
+    """Periodically counts users per FSM state stored by RedisStorage.
+
+    Keys are scanned in small batches off the update path; states outside `known_states` are counted as "other"
+    so label values stay bounded.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        known_states: Iterable[str],
+        logger: logging.Logger,
+        interval: float = 60.0,
+        pattern: str = "fsm:*:state",
+        batch_size: int = 500,
+    ):
+        self.redis = redis
+        self.known_states = set(known_states)
+        self.logger = logger
+        self.interval = interval
+        self.pattern = pattern
+        self.batch_size = batch_size
+        self.counts: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+
+    async def sample(self) -> Dict[str, int]:
+        counts: Counter = Counter(dict.fromkeys(self.known_states, 0))
+        batch = []
+        async for key in self.redis.scan_iter(match=self.pattern, count=self.batch_size):
+            batch.append(key)
+            if len(batch) >= self.batch_size:
+                self._count(counts, await self.redis.mget(batch))
+                batch = []
+        if batch:
+            self._count(counts, await self.redis.mget(batch))
+        return dict(counts)
+
+    def _count(self, counts: Counter, values: list) -> None:
+        for value in values:
+            if value is None:
+                continue
+            state = value.decode()
+            counts[state if state in self.known_states else "other"] += 1
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.counts = await self.sample()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error("Failed to sample FSM states: %s", e)
+            await asyncio.sleep(self.interval)
+
+
+__all__ = ["FsmStateSampler"]
@@ -0,0 +1,87 @@
+import asyncio
+from contextlib import suppress
+from logging import Logger
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from monitoring.metrics import LOOP_LAG, LOOP_STALLS
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop runs a callback scheduled `interval` seconds ahead.
+
+    With a `stall_threshold` a watchdog thread checks that the loop keeps running; when it is blocked longer
+    than the threshold, the stack of the loop thread at that moment is logged, pointing at the blocking call.
+    """
+
+    def __init__(self, interval: float = 0.5, stall_threshold: float = 0.0, logger: Optional[Logger] = None):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.logger = logger
+        self.last_lag = 0.0
+        self.stalls = 0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread = 0
+        self._beat = 0.0
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    async def start(self) -> None:
+        if not self._task or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread = threading.get_ident()
+            self._beat = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+        if self.stall_threshold > 0 and self.logger and not self._watchdog:
+            self._stopped.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._watchdog:
+            self._stopped.set()
+            self._watchdog.join()
+            self._watchdog = None
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, time.perf_counter() - expected)
+            LOOP_LAG.observe(self.last_lag)
+
+    def _watch(self) -> None:
+        # The loop beats every `interval` seconds, a stall is a beat overdue by more than the threshold
+        check_every = max(0.01, min(self.interval, self.stall_threshold) / 4)
+        reported = 0.0
+        while not self._stopped.wait(check_every):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked > self.stall_threshold and beat != reported:
+                reported = beat
+                self._report(blocked)
+
+    def _report(self, blocked: float) -> None:
+        self.stalls += 1
+        LOOP_STALLS.inc()
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = "".join(traceback.format_stack(frame, limit=25)) if frame else "unavailable\n"
+        task = asyncio.current_task(self._loop) if self._loop else None
+        self.logger.warning(  # type: ignore
+            "Event loop blocked for %.2f s in task %s, stack of the loop thread:\n%s",
+            blocked,
+            task.get_name() if task else None,
+            stack.rstrip(),
+        )
+
+
+__all__ = ["LoopLagMonitor"]
@@ -0,0 +1,34 @@
+from prometheus_client import Counter, Histogram
+
+# Buckets in seconds. Handlers and queries are fast, image generation takes tens of seconds
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.5, 1.0, 2.5, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 120.0)
+
+UPDATES = Counter("bot_updates_total", "Updates received by the dispatcher", ["type", "outcome"])
+HANDLER_DURATION = Histogram(
+    "bot_handler_duration_seconds",
+    "Handler run time including inner middlewares",
+    ["router", "handler"],
+    buckets=FAST_BUCKETS,
+)
+GEMINI_DURATION = Histogram(
+    "bot_gemini_duration_seconds",
+    "Image transformation time",
+    ["style", "outcome"],
+    buckets=SLOW_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    "bot_db_query_duration_seconds",
+    "Database statement execution time",
+    ["operation"],
+    buckets=FAST_BUCKETS,
+)
+LOOP_LAG = Histogram(
+    "bot_event_loop_lag_seconds",
+    "Delay of a scheduled event loop callback",
+    buckets=FAST_BUCKETS,
+)
+LOOP_STALLS = Counter("bot_event_loop_stalls_total", "Times the event loop was blocked longer than the stall threshold")
+
+
+__all__ = ["UPDATES", "HANDLER_DURATION", "GEMINI_DURATION", "DB_QUERY_DURATION", "LOOP_LAG", "LOOP_STALLS"]
@@ -0,0 +1,87 @@
+import time
+from typing import Any, Awaitable, Callable, cast, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject, Update
+
+from monitoring.context import UPDATE_FAILED
+from monitoring.metrics import HANDLER_DURATION, UPDATES
+from utils import SlidingCounter
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Counts updates by type and outcome, failed ones are marked by LoggingMiddleware with UPDATE_FAILED."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        update: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        event_type = cast(Update, update).event_type
+        try:
+            result = await handler(update, data)
+        except Exception:
+            UPDATES.labels(event_type, "error").inc()
+            raise
+        if result is UPDATE_FAILED:
+            outcome = "error"
+        else:
+            outcome = "unhandled" if result is UNHANDLED else "handled"
+        UPDATES.labels(event_type, outcome).inc()
+        return result
+
+
+class UpdateRateMiddleware(BaseMiddleware):
+    """Counts received updates over the last `window` seconds."""
+
+    def __init__(self, window: int = 60):
+        self.updates = SlidingCounter(window)
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        update: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        self.updates.add()
+        return await handler(update, data)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Measures handler run time, labelled by the handler function and its router module."""
+
+    def __init__(self):
+        # Labelled children are resolved once per handler, label values come from code and stay bounded
+        self._histograms: Dict[Callable, Any] = {}
+        super().__init__()
+
+    def _histogram(self, handler_object: HandlerObject) -> Any:
+        callback = handler_object.callback
+        histogram = self._histograms.get(callback)
+        if histogram is None:
+            router = getattr(callback, "__module__", "").rpartition(".")[2] or "unknown"
+            name = getattr(callback, "__name__", "unknown")
+            histogram = HANDLER_DURATION.labels(router, name)
+            self._histograms[callback] = histogram
+        return histogram
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            handler_object = data.get("handler")
+            if handler_object is not None:
+                self._histogram(handler_object).observe(time.perf_counter() - started)
+
+
+__all__ = ["UpdateMetricsMiddleware", "UpdateRateMiddleware", "HandlerMetricsMiddleware"]
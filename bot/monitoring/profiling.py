@@ -0,0 +1,114 @@
+import asyncio
+from collections import Counter
+from functools import lru_cache
+from logging import Logger
+from pathlib import Path
+import sys
+import threading
+import time
+import tracemalloc
+from types import FrameType
+from typing import Optional
+
+# Frames of the profiling machinery itself, left out of the allocation report
+_IGNORED_FILES = (tracemalloc.__file__, threading.__file__, "<frozen importlib._bootstrap>")
+
+
+@lru_cache(maxsize=4096)
+def _file_name(path: str) -> str:
+    return Path(path).name
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({_file_name(code.co_filename)}:{frame.f_lineno})"
+
+
+def _collapse(frame: FrameType, thread_name: str, max_depth: int) -> str:
+    names = []
+    current: Optional[FrameType] = frame
+    while current is not None and len(names) < max_depth:
+        names.append(_frame_name(current))
+        current = current.f_back
+    names.append(thread_name)
+    # Semicolons separate frames in the collapsed format
+    return ";".join(name.replace(";", ":") for name in reversed(names))
+
+
+class Profiler:
+    """Profiles the running process on demand, one profile at a time.
+
+    Nothing is hooked in between profiles: the CPU profile is a thread sampling the stacks of all threads,
+    the memory profile turns tracemalloc on for its duration only.
+    """
+
+    def __init__(self, logger: Logger, max_depth: int = 64):
+        self.logger = logger
+        self.max_depth = max_depth
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._lock.locked()
+
+    def _sample(self, duration: float, interval: float) -> Counter:
+        own_thread = threading.get_ident()
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own_thread:
+                    stacks[_collapse(frame, names.get(ident, str(ident)), self.max_depth)] += 1
+            time.sleep(interval)
+        return stacks
+
+    async def cpu(self, duration: float, interval: float = 0.01) -> str:
+        """Samples stacks every `interval` seconds for `duration` seconds.
+
+        Returns collapsed stacks, one `thread;outer;...;inner count` line per stack, as flamegraph.pl and
+        speedscope read them. An idle event loop shows up waiting in select.
+        """
+        async with self._lock:
+            self.logger.info("CPU profiling for %.0f s", duration)
+            stacks = await asyncio.to_thread(self._sample, duration, interval)
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+    async def memory(self, duration: float, limit: int = 30, frames: int = 10) -> str:
+        """Compares allocations at the start and at the end of `duration` seconds.
+
+        Returns the `limit` source lines whose allocated memory grew the most, with the traceback of the
+        largest one.
+        """
+        async with self._lock:
+            started_here = not tracemalloc.is_tracing()
+            if started_here:
+                tracemalloc.start(frames)
+            self.logger.info("Memory profiling for %.0f s", duration)
+            try:
+                before = tracemalloc.take_snapshot()
+                await asyncio.sleep(duration)
+                after = tracemalloc.take_snapshot()
+            finally:
+                if started_here:
+                    tracemalloc.stop()
+        return await asyncio.to_thread(self._format_memory, before, after, limit)
+
+    @staticmethod
+    def _format_memory(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, limit: int) -> str:
+        filters = [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES]
+        before, after = before.filter_traces(filters), after.filter_traces(filters)
+        diff = after.compare_to(before, "lineno")
+        total = sum(stat.size for stat in after.statistics("filename"))
+
+        lines = [f"Allocated while profiling and still held: {total / 1024 / 1024:.1f} MiB", ""]
+        lines.append("Top allocation sites:")
+        lines.extend(str(stat) for stat in diff[:limit])
+        growth = after.compare_to(before, "traceback")
+        if growth:
+            lines += ["", f"Traceback of the largest growth, {growth[0].size_diff / 1024:+.1f} KiB:"]
+            lines.extend(growth[0].traceback.format())
+        return "\n".join(lines)
+
+
+__all__ = ["Profiler"]
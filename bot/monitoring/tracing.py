@@ -0,0 +1,328 @@
+import asyncio
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import heapq
+import itertools
+import json
+from logging import Logger
+import os
+from pathlib import Path
+import time
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Protocol, Sequence, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+import aiohttp
+
+
+@dataclass
+class Span:
+    trace: "Trace"
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    attributes: Dict[str, Any]
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    _started: float = field(default_factory=time.perf_counter)
+
+    def end(self, error: Optional[str] = None) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        self.error = error or self.error
+        if self.parent_id is None:
+            self.trace.tracer._finish(self.trace)
+
+
+class Trace:
+    def __init__(self, tracer: "Tracer", max_spans: int):
+        self.tracer = tracer
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.max_spans = max_spans
+        self.dropped = 0
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    @property
+    def finished(self) -> bool:
+        return bool(self.spans) and self.root.duration is not None
+
+    def start_span(self, name: str, parent: Optional[Span], attributes: Dict[str, Any]) -> Optional[Span]:
+        # Tasks spawned by a handler inherit its trace and may outlive it or create spans endlessly
+        if self.finished or len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return None
+        span = Span(
+            trace=self,
+            name=name,
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent else None,
+            start=time.time(),
+            attributes=attributes,
+        )
+        self.spans.append(span)
+        return span
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def start_span(name: str, **attributes: Any) -> Optional[Span]:
+    """Starts a child of the current span without making it current, None outside of a trace."""
+    parent = _current.get()
+    if parent is None:
+        return None
+    return parent.trace.start_span(name, parent, attributes)
+
+
+@contextmanager
+def _activate(current: Optional[Span]) -> Iterator[Optional[Span]]:
+    if current is None:
+        yield None
+        return
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def span(name: str, **attributes: Any) -> ContextManager[Optional[Span]]:
+    """Child span of the current one for the block; does nothing outside of a trace."""
+    return _activate(start_span(name, **attributes))
+
+
+class SpanExporter(Protocol):
+    async def export(self, traces: Sequence[Trace]) -> None: ...
+
+
+class FileSpanExporter:
+    """Appends finished spans to a file as JSON lines."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def export(self, traces: Sequence[Trace]) -> None:
+        lines = [
+            json.dumps(
+                {
+                    "trace_id": trace.trace_id,
+                    "span_id": s.span_id,
+                    "parent_id": s.parent_id,
+                    "name": s.name,
+                    "start": s.start,
+                    "duration_ms": round((s.duration or 0) * 1000, 3),
+                    "error": s.error,
+                    "attributes": s.attributes,
+                },
+                ensure_ascii=False,
+                default=str,
+            )
+            for trace in traces
+            for s in trace.spans
+            if s.duration is not None
+        ]
+        await asyncio.to_thread(self._write, lines)
+
+    def _write(self, lines: List[str]) -> None:
+        with Path(self.path).open("a", encoding="utf-8") as file:
+            file.write("".join(line + "\n" for line in lines))
+
+
+class OtlpSpanExporter:
+    """Sends spans to an OpenTelemetry collector with OTLP/HTTP in JSON encoding."""
+
+    def __init__(self, endpoint: str, service_name: str = "bot", timeout: float = 10.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _span(self, trace: Trace, s: Span) -> Dict[str, Any]:
+        start = int(s.start * 1e9)
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(start),
+            "endTimeUnixNano": str(start + int((s.duration or 0) * 1e9)),
+            "attributes": [self._attribute(key, value) for key, value in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            otlp_span["parentSpanId"] = s.parent_id
+        return otlp_span
+
+    async def export(self, traces: Sequence[Trace]) -> None:
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "bot"},
+                            "spans": [
+                                self._span(trace, s) for trace in traces for s in trace.spans if s.duration is not None
+                            ],
+                        },
+                    ],
+                },
+            ],
+        }
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout, raise_for_status=True)
+        async with self._session.post(self.url, json=body):
+            pass
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+
+class Tracer:
+    """Collects spans of updates and exports finished traces in batches.
+
+    A trace starts with `trace` around handling of an update; instrumented code adds children with `span`
+    and `start_span`, which cost nothing outside of a trace. The `slowest` traces are kept in memory.
+    """
+
+    def __init__(
+        self,
+        exporters: Sequence[SpanExporter],
+        logger: Logger,
+        slowest: int = 20,
+        flush_interval: float = 5.0,
+        max_spans: int = 256,
+        max_pending: int = 5000,
+    ):
+        self.exporters = list(exporters)
+        self.logger = logger
+        self.slowest_size = slowest
+        self.flush_interval = flush_interval
+        self.max_spans = max_spans
+        self.max_pending = max_pending
+        self._pending: List[Trace] = []
+        self._slowest: List[Tuple[float, int, Trace]] = []
+        self._order = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    @contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        root = Trace(self, self.max_spans).start_span(name, None, attributes)
+        with _activate(root) as current:
+            yield current
+
+    def _finish(self, trace: Trace) -> None:
+        if self.exporters and len(self._pending) < self.max_pending:
+            self._pending.append(trace)
+        item = (trace.root.duration or 0.0, next(self._order), trace)
+        if len(self._slowest) < self.slowest_size:
+            heapq.heappush(self._slowest, item)
+        elif item[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def slowest(self) -> List[Trace]:
+        return [trace for _, _, trace in sorted(self._slowest, reverse=True)]
+
+    async def flush(self) -> None:
+        traces, self._pending = self._pending, []
+        if not traces:
+            return
+        for exporter in self.exporters:
+            try:
+                await exporter.export(traces)
+            except Exception as e:
+                self.logger.warning("Span export with %s failed: %s", type(exporter).__name__, e)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self) -> None:
+        if self.exporters and (not self._task or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+        await self.flush()
+        for exporter in self.exporters:
+            close = getattr(exporter, "close", None)
+            if close:
+                await close()
+
+
+def format_trace(trace: Trace) -> str:
+    """Span tree of the trace with offsets from its start and durations in milliseconds."""
+    children: Dict[Optional[str], List[Span]] = {}
+    for s in trace.spans:
+        children.setdefault(s.parent_id, []).append(s)
+
+    root = trace.root
+    lines = [f"trace {trace.trace_id} {root.name} {(root.duration or 0) * 1000:.0f} ms {root.attributes}"]
+
+    def walk(parent: Span, depth: int) -> None:
+        for child in children.get(parent.span_id, []):
+            offset = (child.start - root.start) * 1000
+            duration = f"{child.duration * 1000:.1f} ms" if child.duration is not None else "unfinished"
+            error = f" !{child.error}" if child.error else ""
+            attributes = f" {child.attributes}" if child.attributes else ""
+            lines.append(f"{'  ' * depth}+{offset:.0f} ms {child.name} {duration}{error}{attributes}")
+            walk(child, depth + 1)
+
+    walk(root, 1)
+    if trace.dropped:
+        lines.append(f"  ... {trace.dropped} spans dropped")
+    return "\n".join(lines)
+
+
+class TracingRequestMiddleware(BaseRequestMiddleware):
+    """Bot session middleware adding a span per Telegram API call, queueing time included."""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with span(f"telegram.{type(method).__name__}"):
+            return await make_request(bot, method)
+
+
+__all__ = [
+    "Tracer",
+    "Trace",
+    "Span",
+    "span",
+    "start_span",
+    "format_trace",
+    "FileSpanExporter",
+    "OtlpSpanExporter",
+    "TracingRequestMiddleware",
+]
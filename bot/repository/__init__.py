@@ -1,4 +1,5 @@
+from repository.payment import PaymentRepository
 from repository.user import UserRepository
 
 
-__all__ = ["UserRepository"]
+__all__ = ["UserRepository", "PaymentRepository"]
@@ -0,0 +1,116 @@
+import time
+from typing import List, Optional
+
+from redis.asyncio.client import Redis
+
+# Moves the payment to a new status only if it still has the expected one
+TRANSITION_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'status') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'status', ARGV[2])
+if ARGV[2] == 'pending' then
+    redis.call('ZADD', KEYS[2], redis.call('HGET', KEYS[1], 'created_at'), ARGV[3])
+else
+    redis.call('ZREM', KEYS[2], ARGV[3])
+end
+return 1
+"""
+
+
+class PaymentRepository:
+    """Active payments stored in Redis.
+
+    Every payment is a hash that expires on its own; payments of a user are indexed by a set with the same TTL,
+    pending ones are also kept in a sorted set by creation time.
+    """
+
+    pending_key = "payments:pending"
+
+    def __init__(self, redis: Redis, ttl: int = 90 * 60):
+        self.redis = redis
+        self.ttl = ttl
+        self._transition = redis.register_script(TRANSITION_SCRIPT)
+
+    @staticmethod
+    def _payment_key(payment_id: str) -> str:
+        return f"payment:{payment_id}"
+
+    @staticmethod
+    def _user_key(user_id: str) -> str:
+        return f"user_payments:{user_id}"
+
+    async def create(
+        self,
+        payment_id: str,
+        user_id: str,
+        tokens: int,
+        amount: int,
+        confirmation_url: str = "",
+    ) -> None:
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                self._payment_key(payment_id),
+                mapping={
+                    "user_id": user_id,
+                    "tokens": tokens,
+                    "amount": amount,
+                    "created_at": now,
+                    "status": "pending",
+                    "confirmation_url": confirmation_url,
+                },
+            )
+            pipe.expire(self._payment_key(payment_id), self.ttl)
+            pipe.sadd(self._user_key(user_id), payment_id)
+            pipe.expire(self._user_key(user_id), self.ttl)
+            pipe.zadd(self.pending_key, {payment_id: now})
+            pipe.zremrangebyscore(self.pending_key, "-inf", now - self.ttl)
+            await pipe.execute()
+
+    async def get(self, payment_id: str) -> Optional[dict]:
+        data = await self.redis.hgetall(self._payment_key(payment_id))  # type: ignore
+        if not data:
+            return None
+
+        payment = {key.decode(): value.decode() for key, value in data.items()}
+        return {
+            "payment_id": payment_id,
+            "user_id": payment["user_id"],
+            "tokens": int(payment["tokens"]),
+            "amount": int(payment["amount"]),
+            "created_at": float(payment["created_at"]),
+            "status": payment["status"],
+            "confirmation_url": payment.get("confirmation_url", ""),
+        }
+
+    async def transition(self, payment_id: str, from_status: str, to_status: str) -> bool:
+        """Atomically changes the status. Returns False if the payment does not have `from_status`."""
+        result = await self._transition(
+            keys=[self._payment_key(payment_id), self.pending_key],
+            args=[from_status, to_status, payment_id],
+        )
+        return bool(result)
+
+    async def get_user_pending(self, user_id: str) -> List[dict]:
+        """Pending payments of the user, ids of expired ones are dropped from the index."""
+        payment_ids = [payment_id.decode() for payment_id in await self.redis.smembers(self._user_key(user_id))]
+        payments = []
+        for payment_id in payment_ids:
+            payment = await self.get(payment_id)
+            if not payment:
+                await self.redis.srem(self._user_key(user_id), payment_id)  # type: ignore
+            elif payment["status"] == "pending":
+                payments.append(payment)
+        return payments
+
+    async def get_pending(self) -> List[tuple[str, float]]:
+        """Pending payment ids with their creation time."""
+        entries = await self.redis.zrangebyscore(self.pending_key, time.time() - self.ttl, "+inf", withscores=True)
+        return [(payment_id.decode(), created_at) for payment_id, created_at in entries]
+
+    async def count_pending(self) -> int:
+        return await self.redis.zcount(self.pending_key, time.time() - self.ttl, "+inf")
+
+
+__all__ = ["PaymentRepository"]
@@ -1,6 +1,6 @@
-from typing import List
+from typing import AsyncIterator, List, Optional, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, select, update
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -26,6 +26,7 @@ class UserRepository:
             session.add(user)
             try:
                 await session.commit()
+                self.db.mark_written(user.id)
                 return user.id
 
             except IntegrityError as e:
@@ -41,7 +42,7 @@ class UserRepository:
                 raise e
 
     async def get_one(self, id: str) -> User:
-        async with self.db.get_session() as session:
+        async with self.db.get_session(read_only=True, key=id) as session:
             session: AsyncSession
             try:
                 user = await session.get(User, id)
@@ -52,7 +53,7 @@ class UserRepository:
                 raise e
 
     async def get_by_username(self, username: str) -> User:
-        async with self.db.get_session() as session:
+        async with self.db.get_session(read_only=True) as session:
             session: AsyncSession
             try:
                 user = (await session.execute(select(User).filter(User.username == username))).scalar_one()
@@ -63,7 +64,7 @@ class UserRepository:
                 raise e
 
     async def get(self) -> List[User]:
-        async with self.db.get_session() as session:
+        async with self.db.get_session(read_only=True) as session:
             session: AsyncSession
             try:
                 result = (await session.execute(select(User).order_by(User.id))).scalars().all()
@@ -71,6 +72,35 @@ class UserRepository:
             except Exception as e:
                 raise e
 
+    async def iter_users(
+        self,
+        batch_size: int = 500,
+        filters: Optional[Sequence[ColumnElement[bool]]] = None,
+        after_id: Optional[str] = None,
+    ) -> AsyncIterator[User]:
+        """Iterate over users ordered by id using keyset pagination.
+
+        Only one batch is held in memory and every batch uses its own short-lived session.
+        """
+        last_id = after_id
+        while True:
+            query = select(User).order_by(User.id).limit(batch_size)
+            if filters:
+                query = query.where(*filters)
+            if last_id is not None:
+                query = query.where(User.id > last_id)
+
+            async with self.db.get_session(read_only=True) as session:
+                session: AsyncSession
+                batch = list((await session.execute(query)).scalars().all())
+
+            for user in batch:
+                yield user
+
+            if len(batch) < batch_size:
+                return
+            last_id = batch[-1].id
+
     async def update_username(self, id: str, username: str) -> User:
         async with self.db.get_session() as session:
             session: AsyncSession
@@ -80,6 +110,7 @@ class UserRepository:
                     raise NoResultFound(f"User with id={id} does not exist")
                 user.username = username
                 await session.commit()
+                self.db.mark_written(id)
                 await session.refresh(user)
                 return user
 
@@ -96,6 +127,7 @@ class UserRepository:
                     raise NoResultFound(f"User with id={id} does not exist")
                 user.is_staff = is_staff
                 await session.commit()
+                self.db.mark_written(id)
                 await session.refresh(user)
                 return user
 
@@ -112,6 +144,7 @@ class UserRepository:
                     raise NoResultFound(f"User with id={id} does not exist")
                 user.phone_number = phone_number
                 await session.commit()
+                self.db.mark_written(id)
                 await session.refresh(user)
                 return user
 
@@ -128,11 +161,38 @@ class UserRepository:
                     raise NoResultFound(f"User with id={id} does not exist")
                 user.token_count = token_count
                 await session.commit()
+                self.db.mark_written(id)
                 await session.refresh(user)
                 return user
             except Exception as e:
                 await session.rollback()
                 raise e
 
+    async def add_tokens(self, id: str, delta: int) -> User:
+        """Atomically change the balance by `delta` on the primary.
+
+        A debit that would make the balance negative changes nothing and raises NoResultFound, as does an unknown
+        user, so concurrent updates from other processes can't be lost.
+        """
+        async with self.db.get_session() as session:
+            session: AsyncSession
+            try:
+                query = (
+                    update(User)
+                    .where(User.id == id, User.token_count + delta >= 0)
+                    .values(token_count=User.token_count + delta)
+                    .returning(User)
+                    .execution_options(synchronize_session=False)
+                )
+                user = (await session.execute(query)).scalar_one_or_none()
+                if user is None:
+                    raise NoResultFound(f"User with id={id} does not exist or has not enough tokens")
+                await session.commit()
+                self.db.mark_written(id)
+                return user
+            except Exception as e:
+                await session.rollback()
+                raise e
+
 
 __all__ = ["UserRepository"]
@@ -0,0 +1,5 @@
+from runtime.stream import StreamPublisherMiddleware, UpdateStream
+from runtime.worker import StreamWorker
+
+
+__all__ = ["UpdateStream", "StreamPublisherMiddleware", "StreamWorker"]
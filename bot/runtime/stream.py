@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, cast, Dict, List
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from redis.asyncio.client import Redis
+from redis.exceptions import ResponseError
+
+from utils import get_chat_id
+
+
+class UpdateStream:
+    """Raw Telegram updates in Redis streams partitioned by chat id.
+
+    All updates of a chat land in the same partition, so a single consumer of the partition sees them in order.
+    """
+
+    def __init__(self, redis: Redis, partitions: int, prefix: str = "updates", maxlen: int = 100_000):
+        self.redis = redis
+        self.partitions = partitions
+        self.prefix = prefix
+        self.maxlen = maxlen
+
+    def key(self, partition: int) -> str:
+        return f"{self.prefix}:{partition}"
+
+    def partition(self, update: Update) -> int:
+        chat_id = get_chat_id(update)
+        return (chat_id if chat_id is not None else update.update_id) % self.partitions
+
+    async def publish(self, update: Update) -> None:
+        await self.redis.xadd(
+            self.key(self.partition(update)),
+            {"update": update.model_dump_json(exclude_unset=True)},
+            maxlen=self.maxlen,
+            approximate=True,
+        )
+
+    async def ensure_group(self, group: str, partitions: List[int]) -> None:
+        for partition in partitions:
+            try:
+                await self.redis.xgroup_create(self.key(partition), group, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+
+class StreamPublisherMiddleware(BaseMiddleware):
+    """Outer update middleware of the receiver: appends updates to the stream instead of handling them.
+
+    With `retry` a failed append is repeated until it succeeds. Polling handles updates one by one, so it
+    confirms no later update to Telegram meanwhile. Without it the error goes to the caller, e.g. the
+    webhook answers 500 and Telegram repeats the update.
+    """
+
+    def __init__(
+        self,
+        stream: UpdateStream,
+        logger: logging.Logger,
+        retry: bool = False,
+        max_retry_delay: float = 30.0,
+    ):
+        self.stream = stream
+        self.logger = logger
+        self.retry = retry
+        self.max_retry_delay = max_retry_delay
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        update: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        event = cast(Update, update)
+        delay = 1.0
+        while True:
+            try:
+                await self.stream.publish(event)
+                return
+            except Exception as e:
+                if not self.retry:
+                    raise
+                self.logger.error("Failed to publish update %d, retrying in %.0f s: %s", event.update_id, delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+
+__all__ = ["UpdateStream", "StreamPublisherMiddleware"]
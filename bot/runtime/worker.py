@@ -0,0 +1,152 @@
+import asyncio
+from contextlib import suppress
+import logging
+from typing import Dict, List, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from runtime.stream import UpdateStream
+from utils import answer_dropped, get_chat_id, KeyedLock
+
+
+class StreamWorker:
+    """Handles the updates of its partitions with the dispatcher.
+
+    Partitions are split between workers statically: worker `index` of `workers` takes every partition with
+    `partition % workers == index`. Entries are handled concurrently, up to `max_concurrent` at a time for the
+    whole worker, while updates of one chat wait for each other in arrival order. An update takes a slot only
+    once it holds its chat, so a busy chat doesn't occupy the slots; a chat gets at most `max_chat_waiting`
+    waiting updates, later ones are dropped like in ChatOrderMiddleware. Reading pauses while `max_buffered`
+    entries are in progress. An entry is acknowledged when its own update is handled; entries left
+    unacknowledged by a crashed worker are claimed back after `claim_idle` seconds.
+    """
+
+    group = "workers"
+
+    def __init__(
+        self,
+        stream: UpdateStream,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        logger: logging.Logger,
+        index: int = 0,
+        workers: int = 1,
+        max_concurrent: int = 100,
+        max_chat_waiting: int = 3,
+        max_buffered: int = 1000,
+        batch_size: int = 10,
+        block: float = 2.0,
+        claim_idle: float = 60.0,
+    ):
+        if not 0 <= index < workers:
+            raise ValueError(f"Worker index {index} is out of range for {workers} workers")
+        self.stream = stream
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.logger = logger
+        self.consumer = f"worker-{index}"
+        self.partitions = [partition for partition in range(stream.partitions) if partition % workers == index]
+        self.batch_size = batch_size
+        self.block = block
+        self.claim_idle = claim_idle
+        self.max_chat_waiting = max_chat_waiting
+        self.handled = 0
+        self.dropped = 0
+        self.chat_locks = KeyedLock()
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._buffered = asyncio.Semaphore(max_buffered)
+        self._stopping = False
+        self._tasks: List[asyncio.Task] = []
+        self._inflight: Set[asyncio.Task] = set()
+
+    @property
+    def waiting(self) -> int:
+        return self.chat_locks.waiting()
+
+    async def run(self) -> None:
+        await self.stream.ensure_group(self.group, self.partitions)
+        self.logger.info("Worker %s consumes partitions %s", self.consumer, self.partitions)
+        self._tasks = [asyncio.create_task(self._consume(partition)) for partition in self.partitions]
+        await asyncio.gather(*self._tasks)
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Stops reading and lets updates in progress finish, unfinished ones are redelivered on the next start."""
+        self._stopping = True
+        deadline = asyncio.get_running_loop().time() + timeout
+        for tasks in (self._tasks, self._inflight):
+            if not tasks:
+                continue
+            _, pending = await asyncio.wait(list(tasks), timeout=max(deadline - asyncio.get_running_loop().time(), 0))
+            for task in pending:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+
+    async def _consume(self, partition: int) -> None:
+        key = self.stream.key(partition)
+        redis = self.stream.redis
+        # Entries of a worker that no longer runs, e.g. after the number of workers changed
+        await redis.xautoclaim(key, self.group, self.consumer, min_idle_time=int(self.claim_idle * 1000))
+
+        # Own pending entries first, then new ones
+        last_id = "0"
+        while not self._stopping:
+            try:
+                response = await redis.xreadgroup(
+                    self.group,
+                    self.consumer,
+                    {key: last_id},
+                    count=self.batch_size,
+                    block=int(self.block * 1000),
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error("Failed to read partition %d: %s", partition, e)
+                await asyncio.sleep(1)
+                continue
+
+            entries = response[0][1] if response else []
+            if last_id != ">":
+                # Pending entries are read past the last one, those in progress are not acknowledged yet
+                last_id = entries[-1][0] if entries else ">"
+            for entry_id, fields in entries:
+                await self._buffered.acquire()
+                task = asyncio.create_task(self._process(key, entry_id, fields))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+    async def _process(self, key: str, entry_id: bytes, fields: Dict[bytes, bytes]) -> None:
+        try:
+            # Fields are empty if the entry was trimmed from the stream before it was handled
+            if fields:
+                await self._handle(fields[b"update"])
+            await self.stream.redis.xack(key, self.group, entry_id)
+        except Exception as e:
+            # Not acknowledged, the entry is handled again after a restart
+            self.logger.error("Failed to acknowledge stream entry %s: %s", entry_id, e)
+        finally:
+            self._buffered.release()
+
+    async def _handle(self, raw: bytes) -> None:
+        try:
+            update = Update.model_validate_json(raw, context={"bot": self.bot})
+            chat_id = get_chat_id(update)
+            if chat_id is None:
+                async with self._slots:
+                    await self.dispatcher.feed_update(self.bot, update)
+            elif self.chat_locks.waiting_for(chat_id) >= self.max_chat_waiting:
+                self.dropped += 1
+                await answer_dropped(update)
+            else:
+                # Tasks start in entry order, so they queue for the chat lock in that order too
+                async with self.chat_locks.hold(chat_id), self._slots:
+                    await self.dispatcher.feed_update(self.bot, update)
+        except Exception as e:
+            # Acknowledged anyway: redelivering an update that fails every time would block its chat
+            self.logger.error("Error handling update from stream: %s", e)
+        self.handled += 1
+
+
+__all__ = ["StreamWorker"]
@@ -1,7 +1,7 @@
 import asyncio
 
 from config import Config, load_config
-from database import PostgresDatabase
+from database import create_database
 from logger import get_logger
 from repository import UserRepository
 from service import UserService
@@ -11,7 +11,7 @@ async def make_user_admin(username: str, make_admin: bool = True) -> None:
     config: Config = load_config()
     logger = get_logger("main", config.logger)
 
-    db = PostgresDatabase(config=config.postgres)
+    db = create_database(config.database, config.postgres, config.sqlite)
     user_service = UserService(UserRepository(db), logger=logger)
     user = await user_service.get_by_username(username=username)
     if not user:
@@ -1,5 +1,17 @@
-from service.image import GeminiImageService
+from service.broadcast import BroadcastService
+from service.image import decode_image, GeminiImageService, GenerationStats
+from service.payment_poller import PaymentPoller, POLL_SCHEDULE, RECONCILE_SCHEDULE
 from service.payment_service import PaymentService
 from service.user import UserService
 
-__all__ = ["UserService", "PaymentService", "GeminiImageService"]
+__all__ = [
+    "UserService",
+    "PaymentService",
+    "GeminiImageService",
+    "GenerationStats",
+    "decode_image",
+    "BroadcastService",
+    "PaymentPoller",
+    "POLL_SCHEDULE",
+    "RECONCILE_SCHEDULE",
+]
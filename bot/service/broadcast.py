@@ -0,0 +1,258 @@
+import asyncio
+from contextlib import suppress
+from dataclasses import asdict, dataclass, fields
+import logging
+import time
+from typing import Optional
+from uuid import uuid4
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from redis.asyncio.client import Redis
+
+from service.user import UserService
+from utils import PRIORITY_LOW, send_priority
+
+# Extends or deletes the lease only while it is still held by the given owner
+RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+return redis.call('DEL', KEYS[1])
+"""
+
+
+@dataclass
+class BroadcastProgress:
+    admin_chat_id: int
+    from_chat_id: int
+    message_id: int
+    started_at: float
+    last_user_id: str = ""
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.blocked + self.failed
+
+    @property
+    def throughput(self) -> float:
+        elapsed = time.time() - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def to_redis(self) -> dict:
+        return {key: str(value) for key, value in asdict(self).items()}
+
+    @classmethod
+    def from_redis(cls, data: dict) -> "BroadcastProgress":
+        values = {key.decode(): value.decode() for key, value in data.items()}
+        return cls(**{field.name: field.type(values[field.name]) for field in fields(cls) if field.name in values})
+
+
+class BroadcastService:
+    """Sends a message to every user through the bot's send queue with the lowest priority.
+
+    Progress is checkpointed in Redis after every recipient, so a restarted bot resumes the broadcast. The process
+    sending it holds a lease in Redis, renewed while it runs, so other processes don't send the same broadcast.
+    """
+
+    checkpoint_key = "broadcast:current"
+    lease_key = "broadcast:lease"
+
+    def __init__(
+        self,
+        bot: Bot,
+        user_service: UserService,
+        redis: Redis,
+        logger: logging.Logger,
+        batch_size: int = 500,
+        lease_ttl: float = 30.0,
+    ):
+        self.bot = bot
+        self.user_service = user_service
+        self.redis = redis
+        self.logger = logger
+        self.batch_size = batch_size
+        self.lease_ttl = lease_ttl
+        self._lease_owner = uuid4().hex
+        self._renew_lease = redis.register_script(RENEW_LEASE_SCRIPT)
+        self._release_lease = redis.register_script(RELEASE_LEASE_SCRIPT)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, admin_chat_id: int, from_chat_id: int, message_id: int) -> bool:
+        """Starts a new broadcast of the given message. Returns False if another one is not finished."""
+        if self.is_running or await self.redis.exists(self.checkpoint_key):
+            return False
+        if not await self._acquire_lease():
+            return False
+
+        progress = BroadcastProgress(
+            admin_chat_id=admin_chat_id,
+            from_chat_id=from_chat_id,
+            message_id=message_id,
+            started_at=time.time(),
+        )
+        await self.redis.hset(self.checkpoint_key, mapping=progress.to_redis())  # type: ignore
+        self._task = asyncio.create_task(self._run(progress))
+        return True
+
+    async def resume(self) -> bool:
+        """Resumes an interrupted broadcast. Returns False if there is nothing to resume or another process sends it."""
+        if self.is_running or not await self._acquire_lease():
+            return False
+        data = await self.redis.hgetall(self.checkpoint_key)  # type: ignore
+        if not data:
+            await self._release_lease(keys=[self.lease_key], args=[self._lease_owner])
+            return False
+
+        progress = BroadcastProgress.from_redis(data)
+        self.logger.info("Resuming broadcast after user %s (%d processed)", progress.last_user_id, progress.processed)
+        self._task = asyncio.create_task(self._run(progress))
+        return True
+
+    async def get_progress(self) -> Optional[BroadcastProgress]:
+        data = await self.redis.hgetall(self.checkpoint_key)  # type: ignore
+        return BroadcastProgress.from_redis(data) if data else None
+
+    async def cancel(self) -> bool:
+        """Drops the unfinished broadcast. Returns False if another process is sending it."""
+        if await self.is_sent_elsewhere():
+            return False
+        if self.is_running:
+            self._task.cancel()  # type: ignore
+            with suppress(asyncio.CancelledError):
+                await self._task  # type: ignore
+        await self.redis.delete(self.checkpoint_key)
+        return True
+
+    async def stop(self) -> None:
+        """Stops the broadcast task, keeping the checkpoint for the next start."""
+        if self.is_running:
+            self._task.cancel()  # type: ignore
+
+    async def is_sent_elsewhere(self) -> bool:
+        """Another process holds the lease and sends the broadcast."""
+        return not self.is_running and bool(await self.redis.exists(self.lease_key))
+
+    async def _acquire_lease(self) -> bool:
+        ttl = int(self.lease_ttl * 1000)
+        return bool(await self.redis.set(self.lease_key, self._lease_owner, nx=True, px=ttl))
+
+    async def _keep_lease(self, broadcast: asyncio.Task) -> None:
+        ttl = int(self.lease_ttl * 1000)
+        while not broadcast.done():
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                renewed = await self._renew_lease(keys=[self.lease_key], args=[self._lease_owner, ttl])
+            except Exception as e:
+                # The lease outlives a few failed renewals
+                self.logger.warning("Failed to renew broadcast lease: %s", e)
+                continue
+            if not renewed:
+                self.logger.error("Broadcast lease lost, stopping so another process doesn't send twice")
+                broadcast.cancel()
+
+    async def _run(self, progress: BroadcastProgress) -> None:
+        keeper = asyncio.create_task(self._keep_lease(asyncio.current_task()))  # type: ignore
+        try:
+            # Broadcast messages give way to replies to users in the send queue
+            with send_priority(PRIORITY_LOW):
+                await self._broadcast(progress)
+        finally:
+            keeper.cancel()
+            try:
+                await self._release_lease(keys=[self.lease_key], args=[self._lease_owner])
+            except Exception as e:
+                self.logger.warning("Failed to release broadcast lease: %s", e)
+
+    async def _broadcast(self, progress: BroadcastProgress) -> None:
+        try:
+            async for user in self.user_service.iter_users(
+                batch_size=self.batch_size,
+                after_id=progress.last_user_id or None,
+            ):
+                outcome = await self._send(int(user.id), progress)
+                setattr(progress, outcome, getattr(progress, outcome) + 1)
+                progress.last_user_id = user.id
+                await self.redis.hset(  # type: ignore
+                    self.checkpoint_key,
+                    mapping={"last_user_id": user.id, outcome: str(getattr(progress, outcome))},
+                )
+
+        except asyncio.CancelledError:
+            self.logger.info("Broadcast interrupted after user %s", progress.last_user_id)
+            raise
+
+        except Exception as e:
+            # The checkpoint is kept so the broadcast can be resumed
+            self.logger.error("Broadcast failed after user %s: %s", progress.last_user_id, e)
+            await self._notify(
+                progress.admin_chat_id,
+                f"⚠️ <b>Рассылка остановлена из-за ошибки</b>\n\nОбработано получателей: {progress.processed}.\n"
+                "Продолжить ее: /broadcast_resume\nОтменить: /broadcast_cancel",
+            )
+            return
+
+        await self.redis.delete(self.checkpoint_key)
+        self.logger.info(
+            "Broadcast finished: sent %d, blocked %d, failed %d, %.1f msg/s",
+            progress.sent,
+            progress.blocked,
+            progress.failed,
+            progress.throughput,
+        )
+        await self._report(progress)
+
+    async def _send(self, chat_id: int, progress: BroadcastProgress) -> str:
+        # Flood limits and retries are handled by the bot's send queue
+        try:
+            await self.bot.copy_message(
+                chat_id=chat_id,
+                from_chat_id=progress.from_chat_id,
+                message_id=progress.message_id,
+            )
+            return "sent"
+
+        except TelegramForbiddenError:
+            return "blocked"
+
+        except TelegramBadRequest as e:
+            self.logger.debug("Broadcast to %s failed: %s", chat_id, e)
+            return "failed"
+
+        except Exception as e:
+            self.logger.error("Broadcast to %s failed: %s", chat_id, e)
+            return "failed"
+
+    async def _report(self, progress: BroadcastProgress) -> None:
+        elapsed = time.time() - progress.started_at
+        text = (
+            "📣 <b>Рассылка завершена</b>\n\n"
+            f"✅ Доставлено: {progress.sent}\n"
+            f"🚫 Заблокировали бота: {progress.blocked}\n"
+            f"❌ Ошибки: {progress.failed}\n"
+            f"⏱ Время: {elapsed:.0f} с ({progress.throughput:.1f} сообщ./с)"
+        )
+        await self._notify(progress.admin_chat_id, text)
+
+    async def _notify(self, chat_id: int, text: str) -> None:
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text)
+        except Exception as e:
+            self.logger.error("Failed to send broadcast report: %s", e)
+
+
+__all__ = ["BroadcastService", "BroadcastProgress"]
@@ -1,11 +1,17 @@
 from io import BytesIO
 import logging
-from typing import Optional
+import time
+from typing import Dict, Optional
 
 from google import genai
 from google.genai.types import GenerateContentConfig
 from PIL import Image
 
+from monitoring.context import current_update
+from monitoring.metrics import GEMINI_DURATION
+from monitoring.tracing import span
+from utils import SlidingCounter, SlidingSample
+
 STYLE_PROMPTS = {
     "anime": "Repaint this image in a highly detailed anime style with flat colors, clean outlines, and vibrant tones.",
     "manga": "Convert this image into black-and-white manga art with high contrast, screentone textures,"
@@ -30,11 +36,44 @@ STYLE_PROMPTS = {
 }
 
 
+def decode_image(image_bytes: bytes) -> Image.Image:
+    """Decodes the photo the user sent into the RGB image passed to Gemini."""
+    return Image.open(BytesIO(image_bytes)).convert("RGB")
+
+
+class GenerationStats:
+    """Generations in progress and over the last `window` seconds: requests, errors and durations per style.
+
+    Memory stays constant: durations are kept in a ring buffer of `capacity` values per style.
+    """
+
+    def __init__(self, window: int = 600, capacity: int = 256):
+        self.window = window
+        self.active = 0
+        self.requests = SlidingCounter(window)
+        self.errors = SlidingCounter(window)
+        self.durations: Dict[str, SlidingSample] = {
+            style: SlidingSample(window, capacity) for style in (*STYLE_PROMPTS, "other")
+        }
+
+    def record(self, style: str, ok: bool, elapsed: float) -> None:
+        self.requests.add()
+        if not ok:
+            self.errors.add()
+        self.durations[style].add(elapsed)
+
+    @property
+    def error_rate(self) -> float:
+        requests = self.requests.total()
+        return self.errors.total() / requests if requests else 0.0
+
+
 class GeminiImageService:
     def __init__(self, api_key: str, logger: logging.Logger, model: str = "gemini-2.0-flash-preview-image-generation"):
         self.model = model
         self.client = genai.Client(api_key=api_key)
         self.logger = logger
+        self.stats = GenerationStats()
         self.base_prompt = (
             "Keep the subject, composition, proportions, and perspective exactly the same as the input image. "
             "Do not add, remove, or move any elements. Maintain the original resolution and framing. "
@@ -48,16 +87,20 @@ class GeminiImageService:
         custom_prompt: Optional[str] = None,
     ) -> Optional[bytes]:
         """Преобразует изображение в указанный стиль и возвращает сгенерированное изображение (bytes)"""
-
+        started = time.perf_counter()
+        outcome = "error"
+        self.stats.active += 1
         try:
-            image = Image.open(BytesIO(image_bytes)).convert("RGB")
+            with span("image.decode", size=len(image_bytes)):
+                image = decode_image(image_bytes)
             prompt = self._get_style_prompt(style=style, custom_prompt=custom_prompt)
 
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=[prompt, image],
-                config=GenerateContentConfig(response_modalities=["TEXT", "IMAGE"]),
-            )
+            with span("gemini.generate_content", model=self.model):
+                response = self.client.models.generate_content(
+                    model=self.model,
+                    contents=[prompt, image],
+                    config=GenerateContentConfig(response_modalities=["TEXT", "IMAGE"]),
+                )
 
             candidates = response.candidates or []
 
@@ -68,15 +111,28 @@ class GeminiImageService:
                 for part in parts:
                     if part.inline_data:
                         self.logger.debug("Received image: %d bytes", len(part.inline_data.data or []))
+                        outcome = "ok"
                         return part.inline_data.data
 
             self.logger.error("No image data in response. Candidates: %d", len(candidates))
+            outcome = "empty"
             return None
 
         except Exception as e:
             self.logger.error("Ошибка при генерации изображения [style=%s]: %s (%s)", style, e, type(e))
             return None
 
+        finally:
+            # Unknown styles share one label so user input can't grow the series count
+            label = style if style in STYLE_PROMPTS and not custom_prompt else "other"
+            elapsed = time.perf_counter() - started
+            GEMINI_DURATION.labels(label, outcome).observe(elapsed)
+            self.stats.active -= 1
+            self.stats.record(label, outcome == "ok", elapsed)
+            context = current_update()
+            if context:
+                context.gemini_time += elapsed
+
     def _get_style_prompt(self, style: str, custom_prompt: Optional[str] = None) -> str:
         parts = [self.base_prompt]
 
@@ -92,4 +148,4 @@ class GeminiImageService:
         return "\n\n".join(parts)
 
 
-__all__ = ["GeminiImageService"]
+__all__ = ["GeminiImageService", "GenerationStats", "decode_image"]
@@ -0,0 +1,206 @@
+import asyncio
+from contextlib import suppress
+from dataclasses import dataclass
+import heapq
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from service.payment_service import PaymentService
+
+# (payment age limit, polling interval) in seconds: dense right after checkout, sparse later
+POLL_SCHEDULE: Tuple[Tuple[float, float], ...] = (
+    (2 * 60, 5),
+    (10 * 60, 15),
+    (30 * 60, 60),
+    (61 * 60, 180),
+)
+
+# Used when YooKassa notifications deliver statuses and polling only catches missed ones
+RECONCILE_SCHEDULE: Tuple[Tuple[float, float], ...] = ((61 * 60, 300),)
+
+FINAL_STATUSES = ("succeeded", "canceled", "cancelled")
+
+
+def is_final(status: Optional[dict]) -> bool:
+    return bool(status) and (bool(status.get("paid")) or status.get("status") in FINAL_STATUSES)  # type: ignore
+
+
+@dataclass
+class PollerStats:
+    pending: int
+    tracked_total: int
+    api_calls: int
+    open_tasks: int
+
+    @property
+    def api_calls_per_payment(self) -> float:
+        return self.api_calls / self.tracked_total if self.tracked_total else 0.0
+
+
+class PaymentPoller:
+    """Polls all pending payments from a single task.
+
+    Payments are kept in a heap ordered by the next check time and are checked in batches.
+    Checks of the same payment within `dedup_window` seconds share one API call.
+    """
+
+    def __init__(
+        self,
+        payment_service: PaymentService,
+        on_status: Callable[[str, dict], Awaitable[None]],
+        logger: logging.Logger,
+        batch_size: int = 20,
+        schedule: Tuple[Tuple[float, float], ...] = POLL_SCHEDULE,
+        dedup_window: float = 3.0,
+    ):
+        self.payment_service = payment_service
+        self.on_status = on_status
+        self.logger = logger
+        self.batch_size = batch_size
+        self.schedule = schedule
+        self.dedup_window = dedup_window
+
+        self._queue: List[Tuple[float, str]] = []
+        self._created: Dict[str, float] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._recent: Dict[str, Tuple[float, Optional[dict]]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._tracked_total = 0
+        self._api_calls = 0
+
+    def track(self, payment_id: str, created_at: Optional[float] = None) -> None:
+        """Starts polling the payment.
+
+        Args:
+            payment_id (str): YooKassa payment id
+            created_at (float | None, optional): Unix time the payment was created at. Defaults to now.
+        """
+        if payment_id in self._created:
+            return
+        now = time.monotonic()
+        age = time.time() - created_at if created_at else 0.0
+        interval = self._interval(age)
+        if interval is None:
+            return
+        self._created[payment_id] = now - age
+        self._tracked_total += 1
+        heapq.heappush(self._queue, (now + interval, payment_id))
+        self._wakeup.set()
+
+    def untrack(self, payment_id: str) -> None:
+        # The heap entry is skipped lazily when it comes up
+        self._created.pop(payment_id, None)
+        self._recent.pop(payment_id, None)
+
+    def is_tracked(self, payment_id: str) -> bool:
+        return payment_id in self._created
+
+    async def check_now(self, payment_id: str) -> Optional[dict]:
+        """Checks the payment immediately, sharing the API call with a concurrent or recent check."""
+        return await self._check(payment_id)
+
+    def stats(self) -> PollerStats:
+        return PollerStats(
+            pending=len(self._created),
+            tracked_total=self._tracked_total,
+            api_calls=self._api_calls,
+            open_tasks=len(self._inflight) + (1 if self._task and not self._task.done() else 0),
+        )
+
+    def start(self) -> None:
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+
+    def _interval(self, age: float) -> Optional[float]:
+        for age_limit, interval in self.schedule:
+            if age < age_limit:
+                return interval
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._wait_for_due()
+                await self._poll_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error("Error in payment poller: %s", e)
+                await asyncio.sleep(1)
+
+    async def _wait_for_due(self) -> None:
+        self._wakeup.clear()
+        if not self._queue:
+            await self._wakeup.wait()
+            return
+        delay = self._queue[0][0] - time.monotonic()
+        if delay > 0:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+
+    async def _poll_due(self) -> None:
+        now = time.monotonic()
+        batch: List[str] = []
+        while self._queue and self._queue[0][0] <= now and len(batch) < self.batch_size:
+            _, payment_id = heapq.heappop(self._queue)
+            if payment_id in self._created and payment_id not in batch:
+                batch.append(payment_id)
+        if not batch:
+            return
+
+        await asyncio.gather(*(self._check(payment_id) for payment_id in batch))
+
+        now = time.monotonic()
+        for payment_id in batch:
+            created = self._created.get(payment_id)
+            if created is None:
+                continue
+            interval = self._interval(now - created)
+            if interval is None:
+                self.logger.info("Payment %s expired without a final status", payment_id)
+                self.untrack(payment_id)
+            else:
+                heapq.heappush(self._queue, (now + interval, payment_id))
+
+    async def _check(self, payment_id: str) -> Optional[dict]:
+        recent = self._recent.get(payment_id)
+        if recent and time.monotonic() - recent[0] < self.dedup_window:
+            return recent[1]
+
+        inflight = self._inflight.get(payment_id)
+        if inflight:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[payment_id] = future
+        status = None
+        try:
+            self._api_calls += 1
+            status = await self.payment_service.check_payment(payment_id)
+            if self.is_tracked(payment_id):
+                self._recent[payment_id] = (time.monotonic(), status)
+            if is_final(status):
+                try:
+                    await self.on_status(payment_id, status)  # type: ignore
+                except Exception:
+                    # Polling goes on until the final status is processed, including a payment checked on request
+                    self.track(payment_id)
+                    raise
+                self.untrack(payment_id)
+        except Exception as e:
+            self.logger.error("Error checking payment %s: %s", payment_id, e)
+        finally:
+            del self._inflight[payment_id]
+            future.set_result(status)
+        return status
+
+
+__all__ = ["PaymentPoller", "PollerStats", "is_final", "POLL_SCHEDULE", "RECONCILE_SCHEDULE"]
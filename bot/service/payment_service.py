@@ -1,21 +1,87 @@
+import asyncio
+from dataclasses import dataclass
 import logging
-from typing import Optional
+import time
+from typing import Dict, Optional
 import uuid
 
-from yookassa import Configuration, Payment
+import aiohttp
+
+YOOKASSA_API_URL = "https://api.yookassa.ru/v3"
+
+
+@dataclass
+class RequestStats:
+    calls: int = 0
+    errors: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_total / self.calls if self.calls else 0.0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.calls += 1
+        self.errors += 0 if ok else 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
 
 
 class PaymentService:
-    def __init__(self, shop_id: str, secret_key: str, logger: logging.Logger):
-        Configuration.account_id = shop_id
-        Configuration.secret_key = secret_key
+    """Asynchronous YooKassa API client.
+
+    Requests share one keep-alive session, so checks of many pending payments don't block the event loop
+    and don't open a new connection each time.
+    """
+
+    def __init__(
+        self,
+        shop_id: str,
+        secret_key: str,
+        logger: logging.Logger,
+        api_url: str = YOOKASSA_API_URL,
+        timeout: float = 10.0,
+        max_connections: int = 20,
+    ):
+        self.shop_id = shop_id
+        self.secret_key = secret_key
         self.logger = logger
+        self.api_url = api_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_connections = max_connections
+        self.stats: Dict[str, RequestStats] = {"create_payment": RequestStats(), "check_payment": RequestStats()}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                auth=aiohttp.BasicAuth(self.shop_id, self.secret_key),
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                timeout=self.timeout,
+                raise_for_status=True,
+            )
+        return self._session
+
+    async def _request(self, name: str, method: str, path: str, **kwargs) -> dict:
+        started = time.monotonic()
+        ok = False
+        try:
+            async with self._get_session().request(method, self.api_url + path, **kwargs) as response:
+                data = await response.json()
+            ok = True
+            return data
+        finally:
+            self.stats[name].record(time.monotonic() - started, ok)
 
     async def create_payment(self, amount: int, description: str, user_id: str, phone_number: str) -> Optional[dict]:
         """Создает платеж в ЮKassa"""
         try:
-            payment = Payment.create(
-                {
+            payment = await self._request(
+                "create_payment",
+                "POST",
+                "/payments",
+                json={
                     "amount": {"value": str(amount), "currency": "RUB"},
                     "payment_method_data": {"type": "bank_card"},
                     "confirmation": {"type": "redirect", "return_url": "https://t.me/change_my_image_bot"},
@@ -36,33 +102,38 @@ class PaymentService:
                         ],
                     },
                 },
-                uuid.uuid4(),
+                # ЮKassa требует ключ идемпотентности для создания платежа
+                headers={"Idempotence-Key": str(uuid.uuid4())},
             )
 
             return {
-                "payment_id": payment.id,
-                "confirmation_url": payment.confirmation.confirmation_url,  # type: ignore
-                "status": payment.status,
+                "payment_id": payment["id"],
+                "confirmation_url": payment["confirmation"]["confirmation_url"],
+                "status": payment["status"],
             }
 
-        except Exception as e:
-            self.logger.error(f"Error creating payment: {e}")
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, TypeError, ValueError) as e:
+            self.logger.error(f"Error creating payment: {type(e).__name__} {e}")
             return None
 
     async def check_payment(self, payment_id: str) -> Optional[dict]:
         """Проверяет статус платежа"""
         try:
-            payment = Payment.find_one(payment_id)
+            payment = await self._request("check_payment", "GET", f"/payments/{payment_id}")
             return {
-                "status": payment.status,
-                "paid": payment.paid,
-                "amount": payment.amount.value,  # type: ignore
-                "metadata": payment.metadata,
+                "status": payment["status"],
+                "paid": payment["paid"],
+                "amount": payment["amount"]["value"],
+                "metadata": payment.get("metadata", {}),
             }
 
-        except Exception as e:
-            self.logger.error(f"Error checking payment: {e}")
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, TypeError, ValueError) as e:
+            self.logger.error(f"Error checking payment: {type(e).__name__} {e}")
             return None
 
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+
 
-__all__ = ["PaymentService"]
+__all__ = ["PaymentService", "RequestStats", "YOOKASSA_API_URL"]
@@ -1,6 +1,7 @@
 from logging import Logger
-from typing import Optional
+from typing import AsyncIterator, Optional, Sequence
 
+from sqlalchemy import ColumnElement
 from sqlalchemy.exc import IntegrityError, NoResultFound
 
 from models import User
@@ -81,6 +82,21 @@ class UserService:
 
         return []
 
+    async def iter_users(
+        self,
+        batch_size: int = 500,
+        filters: Optional[Sequence[ColumnElement[bool]]] = None,
+        after_id: Optional[str] = None,
+    ) -> AsyncIterator[User]:
+        """Errors are logged and raised: a caller must not take a failed batch for the end of the users"""
+        try:
+            async for user in self.repo.iter_users(batch_size=batch_size, filters=filters, after_id=after_id):
+                yield user
+
+        except Exception as e:
+            self.log.error("UserRepository: %s" % e)
+            raise
+
     async def update_username(self, id: str, username: str) -> Optional[User]:
         try:
             return await self.repo.update_username(id, username)
@@ -122,6 +138,17 @@ class UserService:
         except Exception as e:
             self.log.error("UserRepository: %s" % e)
 
+    async def add_tokens(self, id: str, delta: int) -> Optional[User]:
+        """Credits or debits tokens atomically, None if the user is missing or a debit exceeds the balance"""
+        try:
+            return await self.repo.add_tokens(id, delta)
+        except NoResultFound as e:
+            self.log.warning("UserRepository: %s" % e)
+        except Exception as e:
+            self.log.error("UserRepository: %s" % e)
+
+        return None
+
     async def is_admin(self, id: str) -> bool:
         try:
             user = await self.repo.get_one(id)
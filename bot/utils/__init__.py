@@ -0,0 +1,32 @@
+from utils.locks import KeyedLock
+from utils.rate_limit import KeyedRateLimiter, TokenBucket
+from utils.send_queue import (
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    PRIORITY_NORMAL,
+    send_priority,
+    SendQueueMiddleware,
+    SendQueueStats,
+)
+from utils.updates import answer_dropped, get_chat_id, get_user_id, is_expensive
+from utils.windows import RingBuffer, SlidingCounter, SlidingSample
+
+
+__all__ = [
+    "KeyedLock",
+    "KeyedRateLimiter",
+    "TokenBucket",
+    "SendQueueMiddleware",
+    "SendQueueStats",
+    "send_priority",
+    "PRIORITY_HIGH",
+    "PRIORITY_NORMAL",
+    "PRIORITY_LOW",
+    "answer_dropped",
+    "get_chat_id",
+    "get_user_id",
+    "is_expensive",
+    "RingBuffer",
+    "SlidingCounter",
+    "SlidingSample",
+]
@@ -0,0 +1,51 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable
+
+
+class _Entry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class KeyedLock:
+    """One asyncio lock per key, waiters of a key are served in arrival order.
+
+    A key's lock exists only while somebody holds or waits for it, so memory is bounded by the number of
+    keys in use rather than by all keys ever seen.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, _Entry] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._entries[key]
+
+    def waiting_for(self, key: Hashable) -> int:
+        """Number of callers waiting for the key."""
+        entry = self._entries.get(key)
+        return entry.users - 1 if entry else 0
+
+    def waiting(self) -> int:
+        """Number of callers waiting for a busy key."""
+        return sum(entry.users - 1 for entry in self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+__all__ = ["KeyedLock"]
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from typing import Dict, Hashable, Optional
+
+
+class TokenBucket:
+    """Asyncio token bucket: `rate` tokens per second with bursts up to `capacity`.
+
+    Waiters are served in FIFO order.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for the given time, e.g. after a flood-wait error."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+
+class KeyedRateLimiter:
+    """Minimum interval between events of the same key.
+
+    Keys whose interval has passed are dropped, so memory is bounded by the number of recently active keys.
+    """
+
+    def __init__(self, interval: float, prune_threshold: int = 10_000):
+        self.interval = interval
+        self.prune_threshold = prune_threshold
+        self._next_allowed: Dict[Hashable, float] = {}
+
+    def reserve(self, key: Hashable) -> float:
+        """Reserve the next slot for the key and return how long to wait for it."""
+        now = time.monotonic()
+        if len(self._next_allowed) >= self.prune_threshold:
+            self._next_allowed = {k: t for k, t in self._next_allowed.items() if t > now}
+
+        slot = max(now, self._next_allowed.get(key, now))
+        self._next_allowed[key] = slot + self.interval
+        return slot - now
+
+    async def wait(self, key: Hashable) -> None:
+        delay = self.reserve(key)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, key: Hashable, seconds: float) -> None:
+        self._next_allowed[key] = max(self._next_allowed.get(key, 0.0), time.monotonic() + seconds)
+
+    def __len__(self) -> int:
+        return len(self._next_allowed)
+
+
+__all__ = ["TokenBucket", "KeyedRateLimiter"]
@@ -0,0 +1,232 @@
+import asyncio
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass
+import itertools
+import time
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+
+from utils.rate_limit import KeyedRateLimiter, TokenBucket
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+_priority: ContextVar[int] = ContextVar("send_priority", default=PRIORITY_NORMAL)
+
+
+@contextmanager
+def send_priority(priority: int) -> Iterator[None]:
+    """Requests made inside the block are sent with the given priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@dataclass
+class SendQueueStats:
+    waiting: int
+    sent: int
+    retried: int
+    coalesced: int
+    wait_avg: float
+    wait_max: float
+
+
+class _Edit:
+    __slots__ = ("future", "newer")
+
+    def __init__(self):
+        self.newer: Optional[_Edit] = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # The result of the latest edit may have no other waiters
+        self.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+
+class SendQueueMiddleware(BaseRequestMiddleware):
+    """Bot session middleware queueing requests addressed to chats.
+
+    Requests get tokens of the process-wide limit in priority order and respect a minimum interval per chat.
+    Flood-wait errors pause the limits and the request is retried. An edit of a message that is superseded
+    by a newer edit of the same message while waiting is not sent and returns the result of the newer one.
+    """
+
+    def __init__(self, rate: float = 25.0, chat_interval: float = 0.25, max_retries: int = 3):
+        self.global_limit = TokenBucket(rate)
+        self.chat_limit = KeyedRateLimiter(chat_interval)
+        self.max_retries = max_retries
+        self._queue: "asyncio.PriorityQueue[Tuple[int, int, asyncio.Future]]" = asyncio.PriorityQueue()
+        self._order = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+        self._edits: Dict[Hashable, _Edit] = {}
+        self._waiting = 0
+        self._sent = 0
+        self._retried = 0
+        self._coalesced = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        edit_key = self._edit_key(method)
+        edit = None
+        if edit_key:
+            edit = _Edit()
+            previous = self._edits.get(edit_key)
+            if previous:
+                previous.newer = edit
+            self._edits[edit_key] = edit
+
+        try:
+            return await self._send(make_request, bot, method, chat_id, edit)
+        finally:
+            if edit_key and self._edits.get(edit_key) is edit:
+                del self._edits[edit_key]
+            if edit and not edit.future.done():
+                # Cancelled before it was sent, an older edit waiting for it is sent instead
+                edit.future.cancel()
+
+    async def _send(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        chat_id: Any,
+        edit: Optional[_Edit],
+    ) -> Response[TelegramType]:
+        priority = _priority.get()
+        attempt = 1
+        while True:
+            started = time.monotonic()
+            self._waiting += 1
+            try:
+                await self.chat_limit.wait(chat_id)
+                if not (edit and edit.newer):
+                    await self._turn(priority)
+            finally:
+                self._waiting -= 1
+                self._record_wait(time.monotonic() - started)
+
+            if edit and edit.newer:
+                if await self._coalesce(edit):
+                    self._coalesced += 1
+                    return edit.future.result()
+                # Newer edits were cancelled unsent, this one takes its turn after all
+                continue
+
+            try:
+                result = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries:
+                    self._fail(edit, e)
+                    raise
+                attempt += 1
+                self._retried += 1
+                self.global_limit.pause(e.retry_after)
+                self.chat_limit.pause(chat_id, e.retry_after)
+                continue
+            except Exception as e:
+                self._fail(edit, e)
+                raise
+
+            self._sent += 1
+            if edit:
+                edit.future.set_result(result)
+            return result
+
+    @staticmethod
+    def _edit_key(method: TelegramMethod) -> Optional[Hashable]:
+        message_id = getattr(method, "message_id", None)
+        if not type(method).__name__.startswith("Edit") or message_id is None:
+            return None
+        return type(method).__name__, method.chat_id, message_id  # type: ignore
+
+    @staticmethod
+    async def _coalesce(edit: _Edit) -> bool:
+        """Takes the result of the newest edit of the message, False if newer ones were all cancelled unsent."""
+        while edit.newer:
+            newer = edit.newer
+            try:
+                edit.future.set_result(await asyncio.shield(newer.future))
+                return True
+            except asyncio.CancelledError:
+                if not newer.future.cancelled():
+                    raise
+                edit.newer = newer.newer
+            except Exception as e:
+                edit.future.set_exception(e)
+                raise
+        return False
+
+    @staticmethod
+    def _fail(edit: Optional[_Edit], error: Exception) -> None:
+        if edit and not edit.future.done():
+            edit.future.set_exception(error)
+
+    async def _turn(self, priority: int) -> None:
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((priority, next(self._order), future))
+        await future
+
+    async def _run_pump(self) -> None:
+        while True:
+            # The token is taken first, so the request picked for it is the most urgent one at that moment
+            await self.global_limit.acquire()
+            future = None
+            while future is None or future.done():
+                _, _, future = await self._queue.get()
+            future.set_result(None)
+
+    async def close(self) -> None:
+        """Stops the pump, requests still waiting for their turn are cancelled."""
+        if self._pump:
+            self._pump.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._pump
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            future.cancel()
+
+    def _record_wait(self, wait: float) -> None:
+        self._waits += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+
+    def stats(self) -> SendQueueStats:
+        return SendQueueStats(
+            waiting=self._waiting,
+            sent=self._sent,
+            retried=self._retried,
+            coalesced=self._coalesced,
+            wait_avg=self._wait_total / self._waits if self._waits else 0.0,
+            wait_max=self._wait_max,
+        )
+
+
+__all__ = [
+    "SendQueueMiddleware",
+    "SendQueueStats",
+    "send_priority",
+    "PRIORITY_HIGH",
+    "PRIORITY_NORMAL",
+    "PRIORITY_LOW",
+]
@@ -0,0 +1,38 @@
+from typing import Optional
+
+from aiogram.types import Update
+
+# Callbacks that start image generation: a Gemini call and a large upload
+EXPENSIVE_CALLBACK_PREFIXES = ("style_",)
+
+
+def is_expensive(update: Update) -> bool:
+    """Whether handling the update calls slow external services."""
+    callback = update.callback_query
+    return bool(callback and callback.data and callback.data.startswith(EXPENSIVE_CALLBACK_PREFIXES))
+
+
+def get_user_id(update: Update) -> Optional[int]:
+    if update.message and update.message.from_user:
+        return update.message.from_user.id
+    if update.callback_query:
+        return update.callback_query.from_user.id
+    return None
+
+
+def get_chat_id(update: Update) -> Optional[int]:
+    if update.message:
+        return update.message.chat.id
+    if update.callback_query:
+        message = update.callback_query.message
+        return message.chat.id if message else update.callback_query.from_user.id
+    return None
+
+
+async def answer_dropped(update: Update) -> None:
+    """Answers a dropped callback so its button stops spinning."""
+    if update.callback_query:
+        await update.callback_query.answer("⏳ Предыдущий запрос еще обрабатывается, подождите немного")
+
+
+__all__ = ["answer_dropped", "is_expensive", "get_chat_id", "get_user_id", "EXPENSIVE_CALLBACK_PREFIXES"]
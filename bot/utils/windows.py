@@ -0,0 +1,83 @@
+import statistics
+import time
+from typing import Generic, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class RingBuffer(Generic[T]):
+    """Keeps the last `capacity` items, the oldest one is overwritten when full."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._items: List[Optional[T]] = [None] * capacity
+        self._next = 0
+        self._size = 0
+
+    def append(self, item: T) -> None:
+        self._items[self._next] = item
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[T]:
+        """Items from the oldest to the newest."""
+        start = (self._next - self._size) % self.capacity
+        for i in range(self._size):
+            yield self._items[(start + i) % self.capacity]  # type: ignore
+
+
+class SlidingCounter:
+    """Counts events over the last `window` seconds in one-second buckets."""
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self._counts = [0] * window
+        self._seconds = [0] * window
+
+    def add(self, count: int = 1) -> None:
+        second = int(time.monotonic())
+        i = second % self.window
+        if self._seconds[i] != second:
+            # The bucket still holds a second that left the window
+            self._seconds[i] = second
+            self._counts[i] = 0
+        self._counts[i] += count
+
+    def total(self) -> int:
+        oldest = int(time.monotonic()) - self.window
+        return sum(count for count, second in zip(self._counts, self._seconds) if second > oldest)
+
+    def rate(self) -> float:
+        """Events per second over the window."""
+        return self.total() / self.window
+
+
+class SlidingSample:
+    """The last `capacity` values observed within `window` seconds, for percentiles."""
+
+    def __init__(self, window: float = 600.0, capacity: int = 256):
+        self.window = window
+        self._values: RingBuffer[Tuple[float, float]] = RingBuffer(capacity)
+
+    def add(self, value: float) -> None:
+        self._values.append((time.monotonic(), value))
+
+    def values(self) -> List[float]:
+        oldest = time.monotonic() - self.window
+        return [value for observed, value in self._values if observed > oldest]
+
+    def percentiles(self, *qs: int) -> Optional[List[float]]:
+        """Percentiles of the values in the window, None without values."""
+        values = self.values()
+        if not values:
+            return None
+        if len(values) == 1:
+            return [values[0]] * len(qs)
+        quantiles = statistics.quantiles(values, n=100, method="inclusive")
+        return [quantiles[q - 1] for q in qs]
+
+
+__all__ = ["RingBuffer", "SlidingCounter", "SlidingSample"]
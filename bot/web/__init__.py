@@ -0,0 +1,6 @@
+from web.server import WebServer
+from web.telegram import TelegramWebhook
+from web.yookassa import YooKassaWebhook
+
+
+__all__ = ["WebServer", "TelegramWebhook", "YooKassaWebhook"]
@@ -0,0 +1,94 @@
+"""Local stand-in for the YooKassa API.
+
+Usage (from the bot directory):
+    python -m web.fake_yookassa --port 8081 --latency 0.2
+
+Then start the bot with YOOKASSA_API_URL=http://localhost:8081/v3. Payments are created as pending and can be
+finished with `POST /fake/payments/{id}/succeeded` or `POST /fake/payments/{id}/canceled`; with --notify-url the
+matching notification is also sent to the bot webhook.
+"""
+
+import argparse
+import asyncio
+from typing import Dict, Optional
+import uuid
+
+from aiohttp import ClientSession, web
+
+
+class FakeYooKassa:
+    """In-memory payments with the subset of the API the bot uses."""
+
+    def __init__(self, latency: float = 0.0, notify_url: Optional[str] = None):
+        self.latency = latency
+        self.notify_url = notify_url
+        self.payments: Dict[str, dict] = {}
+        self.requests = 0
+
+        self.app = web.Application()
+        self.app.router.add_post("/v3/payments", self.create_payment)
+        self.app.router.add_get("/v3/payments/{payment_id}", self.get_payment)
+        self.app.router.add_post("/fake/payments/{payment_id}/{status}", self.set_status)
+
+    async def _delay(self) -> None:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def create_payment(self, request: web.Request) -> web.Response:
+        await self._delay()
+        if not request.headers.get("Idempotence-Key"):
+            return web.json_response({"type": "error", "code": "invalid_request"}, status=400)
+
+        body = await request.json()
+        payment_id = str(uuid.uuid4())
+        self.payments[payment_id] = {
+            "id": payment_id,
+            "status": "pending",
+            "paid": False,
+            "amount": body["amount"],
+            "description": body.get("description"),
+            "metadata": body.get("metadata", {}),
+            "confirmation": {"type": "redirect", "confirmation_url": f"https://yoomoney.ru/checkout/{payment_id}"},
+        }
+        return web.json_response(self.payments[payment_id])
+
+    async def get_payment(self, request: web.Request) -> web.Response:
+        await self._delay()
+        payment = self.payments.get(request.match_info["payment_id"])
+        if payment is None:
+            return web.json_response({"type": "error", "code": "not_found"}, status=404)
+        return web.json_response(payment)
+
+    async def set_status(self, request: web.Request) -> web.Response:
+        payment = self.payments.get(request.match_info["payment_id"])
+        status = request.match_info["status"]
+        if payment is None or status not in ("succeeded", "canceled"):
+            return web.Response(status=404)
+
+        payment["status"] = status
+        payment["paid"] = status == "succeeded"
+        if self.notify_url:
+            async with ClientSession() as session:
+                notification = {"type": "notification", "event": f"payment.{status}", "object": payment}
+                async with session.post(self.notify_url, json=notification) as response:
+                    return web.json_response(payment, status=200 if response.status == 200 else 502)
+        return web.json_response(payment)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a fake YooKassa API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay of every API response, seconds")
+    parser.add_argument("--notify-url", default=None, help="Bot webhook to notify about finished payments")
+    args = parser.parse_args()
+
+    web.run_app(FakeYooKassa(args.latency, args.notify_url).app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
+
+
+__all__ = ["FakeYooKassa"]
@@ -0,0 +1,43 @@
+"""Replays recorded YooKassa notifications against a local webhook.
+
+Usage (from the bot directory):
+    python -m web.replay web/fixtures/yookassa_notifications.jsonl --url http://localhost:8080/yookassa/webhook
+
+Every line of the file is one notification body as YooKassa sends it. For local runs, start the bot with
+YOOKASSA_WEBHOOK_TRUSTED_IPS=127.0.0.1 and YOOKASSA_WEBHOOK_VERIFY=false.
+"""
+
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+from aiohttp import ClientSession
+
+
+async def replay(path: Path, url: str, delay: float) -> None:
+    async with ClientSession() as session:
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if not line.strip():
+                continue
+            notification = json.loads(line)
+            async with session.post(url, json=notification) as response:
+                print(f"{notification['event']} {notification['object']['id']}: {response.status}")  # noqa: T201
+            await asyncio.sleep(delay)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded YooKassa notifications")
+    parser.add_argument("path", type=Path, help="JSON lines file with notification bodies")
+    parser.add_argument("--url", default="http://localhost:8080/yookassa/webhook")
+    parser.add_argument("--delay", type=float, default=0.0, help="Pause between notifications, seconds")
+    args = parser.parse_args()
+
+    asyncio.run(replay(args.path, args.url, args.delay))
+
+
+if __name__ == "__main__":
+    main()
+
+
+__all__ = []
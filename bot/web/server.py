@@ -0,0 +1,38 @@
+import logging
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+
+
+class WebServer:
+    """aiohttp server hosting the HTTP endpoints of the bot"""
+
+    def __init__(self, host: str, port: int, logger: logging.Logger):
+        self.host = host
+        self.port = port
+        self.logger = logger
+        self.app = web.Application()
+        self._runner: Optional[web.AppRunner] = None
+
+    def add_route(self, method: str, path: str, handler: Callable[[web.Request], Awaitable[web.StreamResponse]]):
+        self.app.router.add_route(method, path, handler)
+
+    @property
+    def has_routes(self) -> bool:
+        return len(self.app.router.routes()) > 0
+
+    async def start(self) -> None:
+        if not self.has_routes or self._runner:
+            return
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.logger.info("HTTP server listening on %s:%d", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+__all__ = ["WebServer"]
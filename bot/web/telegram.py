@@ -0,0 +1,89 @@
+import asyncio
+import hmac
+import logging
+from typing import Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from pydantic import ValidationError
+
+
+class TelegramWebhook:
+    """Receives Telegram updates and feeds them to the dispatcher.
+
+    Telegram gets 200 as soon as the update is accepted; handlers run in background tasks. While
+    `max_concurrent_updates` updates are being handled the response is delayed, so Telegram slows down delivery.
+    Without `handle_in_background` the response waits for the dispatcher, so a failed update is redelivered.
+    Replicas behind a load balancer need the same secret token and shared Redis storage.
+    """
+
+    header = "X-Telegram-Bot-Api-Secret-Token"
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        secret_token: str,
+        logger: logging.Logger,
+        max_concurrent_updates: int = 100,
+        handle_in_background: bool = True,
+    ):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret_token = secret_token
+        self.logger = logger
+        self.handle_in_background = handle_in_background
+        self._semaphore = asyncio.Semaphore(max_concurrent_updates)
+        self._tasks: Set[asyncio.Task] = set()
+        self._draining = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(self.header, ""), self.secret_token):
+            return web.Response(status=401)
+        if self._draining:
+            # Telegram retries the update, possibly on another replica
+            return web.Response(status=503)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except (ValueError, ValidationError):
+            return web.Response(status=400)
+
+        await self._semaphore.acquire()
+        if not self.handle_in_background:
+            return web.Response(status=200 if await self._process(update) else 500)
+
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response(status=200)
+
+    async def _process(self, update: Update) -> bool:
+        try:
+            await self.dispatcher.feed_update(self.bot, update)
+            return True
+        except Exception as e:
+            self.logger.error("Error processing update %d: %s", update.update_id, e)
+            return False
+        finally:
+            self._semaphore.release()
+
+    async def drain(self, timeout: float = 30.0) -> None:
+        """Stops accepting updates and waits for the ones being handled."""
+        self._draining = True
+        if not self._tasks:
+            return
+        self.logger.info("Waiting for %d updates to finish...", len(self._tasks))
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.logger.warning("Cancelled %d updates that did not finish in %.0f s", len(pending), timeout)
+
+
+__all__ = ["TelegramWebhook"]
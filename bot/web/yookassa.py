@@ -0,0 +1,110 @@
+from ipaddress import ip_address, ip_network
+import json
+import logging
+from typing import Awaitable, Callable, Optional, Sequence
+
+from aiohttp import web
+
+from config import YOOKASSA_NETWORKS
+from service import PaymentPoller, PaymentService
+
+EVENTS = ("payment.succeeded", "payment.canceled")
+
+
+class YooKassaWebhook:
+    """Receives YooKassa payment notifications.
+
+    A notification is trusted only if it comes from a trusted address, YooKassa ones by default, and, when
+    `verify_with_api` is set, the payment status fetched from the API is final.
+    """
+
+    def __init__(
+        self,
+        payment_service: PaymentService,
+        payment_poller: PaymentPoller,
+        on_status: Callable[[str, dict], Awaitable[None]],
+        logger: logging.Logger,
+        trusted_networks: Sequence[str] = YOOKASSA_NETWORKS,
+        trust_forwarded: bool = False,
+        trusted_proxies: int = 1,
+        verify_with_api: bool = True,
+    ):
+        self.payment_service = payment_service
+        self.payment_poller = payment_poller
+        self.on_status = on_status
+        self.logger = logger
+        if not trusted_networks:
+            # Without an allow-list anyone could post a notification
+            raise ValueError("YooKassa webhook needs trusted networks, set YOOKASSA_WEBHOOK_TRUSTED_IPS or unset it")
+        self.trusted_networks = [ip_network(network) for network in trusted_networks]
+        self.trust_forwarded = trust_forwarded
+        self.trusted_proxies = max(trusted_proxies, 1)
+        self.verify_with_api = verify_with_api
+
+    def _forwarded_for(self, request: web.Request) -> Optional[str]:
+        """The address the outermost of our proxies saw.
+
+        Every proxy appends the address it got the request from, so entries left of our `trusted_proxies` ones
+        come from the client and can be forged.
+        """
+        hops = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+        return hops[-self.trusted_proxies] if len(hops) >= self.trusted_proxies else None
+
+    def _is_trusted(self, request: web.Request) -> bool:
+        remote = request.remote
+        if self.trust_forwarded:
+            remote = self._forwarded_for(request)
+        try:
+            address = ip_address(remote or "")
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_networks)
+
+    async def _get_status(self, payment: dict) -> Optional[dict]:
+        if self.verify_with_api:
+            return await self.payment_service.check_payment(payment["id"])
+        return {
+            "status": payment.get("status"),
+            "paid": payment.get("paid", False),
+            "amount": payment.get("amount", {}).get("value"),
+            "metadata": payment.get("metadata", {}),
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not self._is_trusted(request):
+            self.logger.warning("Rejected YooKassa notification from %s", request.remote)
+            return web.Response(status=403)
+
+        try:
+            notification = await request.json()
+            event = notification["event"]
+            payment = notification["object"]
+            payment_id = payment["id"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return web.Response(status=400)
+
+        if event not in EVENTS:
+            return web.Response(status=200)
+
+        status = await self._get_status(payment)
+        if not status:
+            # YooKassa repeats the notification until it gets 200
+            return web.Response(status=503)
+
+        if (event == "payment.succeeded") != bool(status.get("paid")):
+            self.logger.warning("YooKassa notification %s for %s does not match its status", event, payment_id)
+            return web.Response(status=200)
+
+        self.logger.info("YooKassa notification %s for payment %s", event, payment_id)
+        try:
+            await self.on_status(payment_id, status)
+        except Exception as e:
+            # YooKassa repeats the notification and polling goes on until the status is processed
+            self.logger.error("Error processing YooKassa notification for %s: %s", payment_id, e)
+            return web.Response(status=500)
+
+        self.payment_poller.untrack(payment_id)
+        return web.Response(status=200)
+
+
+__all__ = ["YooKassaWebhook"]
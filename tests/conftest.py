@@ -0,0 +1,13 @@
+"""Regression tests for the bot.
+
+Run from the repository root:
+    pytest tests
+"""
+
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+
+__all__ = []
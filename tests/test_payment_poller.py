@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+from typing import Optional
+from unittest.mock import AsyncMock
+
+from handlers.payments import handle_payment_status
+from service import PaymentPoller
+
+PAID = {"status": "succeeded", "paid": True, "amount": "990.00", "metadata": {}}
+
+
+class MemoryPaymentRepository:
+    """PaymentRepository keeping payments in a dict."""
+
+    def __init__(self):
+        self.payments = {}
+
+    async def create(self, payment_id: str, user_id: str, tokens: int, amount: int) -> None:
+        self.payments[payment_id] = {"user_id": user_id, "tokens": tokens, "amount": amount, "status": "pending"}
+
+    async def get(self, payment_id: str) -> Optional[dict]:
+        return self.payments.get(payment_id)
+
+    async def transition(self, payment_id: str, from_status: str, to_status: str) -> bool:
+        payment = self.payments.get(payment_id)
+        if not payment or payment["status"] != from_status:
+            return False
+        payment["status"] = to_status
+        return True
+
+
+class FlakyUserService:
+    """UserService whose first `failures` credits fail the way a lost database connection does."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.balance = 0
+
+    async def add_tokens(self, id: str, delta: int):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection was closed in the middle of operation")
+        self.balance += delta
+        return SimpleNamespace(id=id, token_count=self.balance)
+
+
+def test_failed_credit_is_retried_on_the_next_poll():
+    async def scenario():
+        repository = MemoryPaymentRepository()
+        user_service = FlakyUserService(failures=1)
+        payment_service = SimpleNamespace(check_payment=AsyncMock(return_value=PAID))
+        logger = logging.getLogger("tests")
+
+        async def on_status(payment_id: str, status: dict) -> None:
+            await handle_payment_status(
+                payment_id,
+                status,
+                bot=SimpleNamespace(send_message=AsyncMock()),
+                logger=logger,
+                user_service=user_service,
+                payment_repository=repository,
+            )
+
+        poller = PaymentPoller(payment_service, on_status, logger, schedule=((60, 0.01),), dedup_window=0)
+        await repository.create("p1", user_id="1", tokens=30, amount=990)
+        poller.track("p1")
+        poller.start()
+        try:
+            for _ in range(100):
+                if not poller.is_tracked("p1"):
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await poller.stop()
+
+        assert payment_service.check_payment.await_count == 2
+        assert user_service.balance == 30
+        assert repository.payments["p1"]["status"] == "completed"
+        assert not poller.is_tracked("p1")
+
+    asyncio.run(scenario())
+
+
+def test_failed_credit_after_a_check_on_request_is_polled_again():
+    async def scenario():
+        repository = MemoryPaymentRepository()
+        user_service = FlakyUserService(failures=1)
+        payment_service = SimpleNamespace(check_payment=AsyncMock(return_value=PAID))
+        logger = logging.getLogger("tests")
+
+        async def on_status(payment_id: str, status: dict) -> None:
+            await handle_payment_status(
+                payment_id,
+                status,
+                bot=SimpleNamespace(send_message=AsyncMock()),
+                logger=logger,
+                user_service=user_service,
+                payment_repository=repository,
+            )
+
+        poller = PaymentPoller(payment_service, on_status, logger, schedule=((60, 0.01),), dedup_window=0)
+        await repository.create("p1", user_id="1", tokens=30, amount=990)
+        await poller.check_now("p1")
+
+        assert user_service.balance == 0
+        assert repository.payments["p1"]["status"] == "pending"
+        assert poller.is_tracked("p1")
+
+    asyncio.run(scenario())
+
+
+__all__ = []
@@ -0,0 +1,56 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+from aiogram.methods import EditMessageText, SendMessage
+
+from utils import SendQueueMiddleware
+
+
+def edit(text: str) -> EditMessageText:
+    return EditMessageText(chat_id=1, message_id=10, text=text)
+
+
+def test_edit_superseded_by_a_cancelled_edit_is_sent():
+    async def scenario():
+        queue = SendQueueMiddleware(rate=100, chat_interval=0.05)
+        make_request = AsyncMock(side_effect=lambda bot, method: method.text)
+        try:
+            # Keeps the chat busy, so both edits wait for their interval
+            await queue(make_request, None, SendMessage(chat_id=1, text="photo"))
+            older = asyncio.create_task(queue(make_request, None, edit("older")))
+            await asyncio.sleep(0)
+            newer = asyncio.create_task(queue(make_request, None, edit("newer")))
+            await asyncio.sleep(0)
+            newer.cancel()
+
+            assert await asyncio.wait_for(older, 1) == "older"
+        finally:
+            await queue.close()
+
+        assert [call.args[1].text for call in make_request.call_args_list] == ["photo", "older"]
+        assert queue.stats().coalesced == 0
+
+    asyncio.run(scenario())
+
+
+def test_edit_superseded_by_a_sent_edit_takes_its_result():
+    async def scenario():
+        queue = SendQueueMiddleware(rate=100, chat_interval=0.05)
+        make_request = AsyncMock(side_effect=lambda bot, method: method.text)
+        try:
+            await queue(make_request, None, SendMessage(chat_id=1, text="photo"))
+            older = asyncio.create_task(queue(make_request, None, edit("older")))
+            await asyncio.sleep(0)
+            newer = asyncio.create_task(queue(make_request, None, edit("newer")))
+
+            assert await asyncio.wait_for(asyncio.gather(older, newer), 1) == ["newer", "newer"]
+        finally:
+            await queue.close()
+
+        assert [call.args[1].text for call in make_request.call_args_list] == ["photo", "newer"]
+        assert queue.stats().coalesced == 1
+
+    asyncio.run(scenario())
+
+
+__all__ = []